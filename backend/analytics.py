@@ -0,0 +1,192 @@
+import numpy as np
+from functools import lru_cache
+from .db_conn import get_db_connection
+from .db_prices import lookup_asset, get_last_price_date, get_cache_generation
+from .price_matrix import load_price_matrix
+from . import metrics
+
+
+def _ledger_version(cur, portfolio_id: int):
+    """
+    (session_id, version) of the portfolio's active session. The version
+    changes whenever an advance writes equity rows or the ledger grows,
+    which is all that can change the analytics.
+    """
+    cur.execute("""
+        SELECT s.id, (SELECT COALESCE(MAX(id), 0) FROM portfolio_ledger(%s)),
+               COUNT(e.date), MAX(e.date)
+        FROM game_sessions s
+        LEFT JOIN session_equity e ON e.session_id = s.id
+        WHERE s.portfolio_id = %s AND s.is_active = TRUE
+        GROUP BY s.id
+    """, (portfolio_id, portfolio_id))
+    row = cur.fetchone()
+    return (row[0], (row[1], row[2], str(row[3]))) if row else (None, None)
+
+
+def performance(dates, values, flows, risk_free: float = 0.0):
+    """
+    Performance of a daily equity series that receives external flows
+    (flows[t] is already included in values[t]; flows[0] is ignored).
+    TWR chains flow-adjusted daily returns; IRR treats the starting value and
+    every flow as contributions and the ending value as the payoff.
+    """
+    index, returns = metrics.flow_adjusted_index(values, flows)
+    stats = metrics.summary_stats(index, dates, returns=returns, risk_free=risk_free)
+
+    years = (dates - dates[0]).astype("timedelta64[D]").astype(float) / 365.25
+    amounts = -np.asarray(flows, dtype=float)
+    amounts[0] = -values[0]
+    amounts[-1] += values[-1]
+    money_weighted = metrics.irr(years, amounts) if years[-1] > 0 else None
+
+    return {
+        "start_value": float(values[0]),
+        "end_value": float(values[-1]),
+        "net_flows": float(np.sum(flows[1:])),
+        "twr": stats["total_return"],
+        "twr_annualized": stats["cagr"],
+        "irr": money_weighted,
+        "volatility": stats["volatility"],
+        "sharpe": stats["sharpe"],
+        "sortino": stats["sortino"],
+        "max_drawdown": stats["max_drawdown"],
+    }
+
+
+def relative_performance(dates, index, bench_dates, bench_prices, risk_free: float = 0.0):
+    """
+    Alpha, beta, tracking error and excess return of a growth index against
+    benchmark price columns. The benchmarks are taken as-of each index date
+    and stacked with the index into one (dates x 1 + benchmarks) matrix, so
+    every return series comes from a single simple_returns call.
+    bench_prices: (bench_dates x benchmarks), forward-filled.
+    Returns one dict per benchmark column.
+    """
+    rows = np.searchsorted(bench_dates, dates, side="right") - 1
+    bench = np.where(rows[:, None] >= 0, bench_prices[np.maximum(rows, 0)], np.nan)
+    matrix = np.column_stack([index, bench])
+    returns = metrics.simple_returns(matrix)
+    ppy = metrics.periods_per_year(dates)
+    rf = risk_free / ppy
+
+    results = []
+    for j in range(1, matrix.shape[1]):
+        pair = returns[:, [0, j]]
+        pair = pair[np.isfinite(pair).all(axis=1)]
+        if len(pair) < 2:
+            results.append(None)
+            continue
+        rp, rb = pair[:, 0] - rf, pair[:, 1] - rf
+        var_b = np.var(rb, ddof=1)
+        beta = float(np.cov(rp, rb, ddof=1)[0, 1] / var_b) if var_b > 0 else 0.0
+        active = pair[:, 0] - pair[:, 1]
+        te = float(np.std(active, ddof=1) * np.sqrt(ppy))
+        growth = np.prod(1.0 + pair, axis=0)
+        results.append({
+            "alpha": float((np.mean(rp) - beta * np.mean(rb)) * ppy),
+            "beta": beta,
+            "correlation": float(np.corrcoef(rp, rb)[0, 1]) if var_b > 0 and np.var(rp) > 0 else 0.0,
+            "tracking_error": te,
+            "information_ratio": float(np.mean(active) * ppy / te) if te > 0 else 0.0,
+            "benchmark_return": float(growth[1] - 1.0),
+            "excess_return": float(growth[0] - growth[1]),
+        })
+    return results
+
+
+@lru_cache(maxsize=32)
+def benchmark_series(asset_id: int, last_date: str, generation: int):
+    """
+    Full daily close history of a benchmark, shared by every portfolio's
+    analytics. last_date and generation are part of the key only.
+    """
+    dates, matrix = load_price_matrix([asset_id], None, last_date)
+    matrix.flags.writeable = False
+    return dates, matrix[:, 0]
+
+
+@lru_cache(maxsize=256)
+def _equity_series(session_id: int, version, start: str, end: str, generation: int):
+    # version and generation are part of the cache key only: /reset restarts
+    # session and ledger ids, so (session_id, version) alone can repeat
+    with get_db_connection() as conn:
+        cur = conn.cursor()
+        cur.execute("""
+            SELECT date, total_value, flow
+            FROM session_equity
+            WHERE session_id = %s
+              AND (%s::date IS NULL OR date >= %s::date)
+              AND (%s::date IS NULL OR date <= %s::date)
+            ORDER BY date
+        """, (session_id, start, start, end, end))
+        rows = cur.fetchall()
+    dates = np.array([r[0] for r in rows], dtype="datetime64[D]")
+    values = np.array([r[1] for r in rows], dtype=float)
+    flows = np.array([r[2] for r in rows], dtype=float)
+    for a in (dates, values, flows):
+        a.flags.writeable = False
+    return dates, values, flows
+
+
+@lru_cache(maxsize=256)
+def _cached_analytics(session_id: int, version, start: str, end: str, risk_free: float, generation: int):
+    dates, values, flows = _equity_series(session_id, version, start, end, generation)
+    if len(dates) < 2:
+        return None
+    return {
+        "start": str(dates[0]),
+        "end": str(dates[-1]),
+        "days": len(dates),
+        **performance(dates, values, flows, risk_free)
+    }
+
+
+def _benchmarks(symbols, dates, values, flows, risk_free):
+    resolved = []
+    for symbol in symbols:
+        asset = lookup_asset(symbol)
+        last_date = get_last_price_date(asset["id"]) if asset else None
+        if not last_date:
+            return {"error": f"Unknown benchmark {symbol}"}
+        resolved.append((asset["symbol"], benchmark_series(asset["id"], last_date, get_cache_generation())))
+
+    # One (dates x benchmarks) matrix on the union of the benchmarks' own dates
+    bench_dates = np.unique(np.concatenate([d for _, (d, _) in resolved]))
+    columns = []
+    for _, (d, p) in resolved:
+        rows = np.searchsorted(d, bench_dates, side="right") - 1
+        columns.append(np.where(rows >= 0, p[np.maximum(rows, 0)], np.nan))
+    index, _ = metrics.flow_adjusted_index(values, flows)
+    stats = relative_performance(dates, index, bench_dates, np.column_stack(columns), risk_free)
+    return {symbol: s for (symbol, _), s in zip(resolved, stats)}
+
+
+def portfolio_analytics(portfolio_id: int, start: str = None, end: str = None, risk_free: float = 0.0,
+                        benchmarks=None):
+    """
+    Performance of the active session over [start, end], read from the
+    daily equity recorded by advance_time. Cached per (session, ledger
+    version, window). benchmarks: symbols (e.g. ["SPY", "VOO"]) to compare
+    against; their price series are cached and shared across portfolios.
+    """
+    try:
+        with get_db_connection() as conn:
+            session_id, version = _ledger_version(conn.cursor(), portfolio_id)
+        if session_id is None:
+            return {"error": "No active session found"}
+        generation = get_cache_generation()
+        result = _cached_analytics(session_id, version, start, end, risk_free, generation)
+        if result is None:
+            return {"error": "Not enough equity history in this window; advance the simulation first"}
+        result = {"portfolio_id": portfolio_id, **result}
+        if benchmarks:
+            dates, values, flows = _equity_series(session_id, version, start, end, generation)
+            relative = _benchmarks(benchmarks, dates, values, flows, risk_free)
+            if "error" in relative:
+                return relative
+            result["benchmarks"] = relative
+        return result
+    except Exception as e:
+        print(f"Error computing analytics: {e}")
+        return {"error": "Failed to compute analytics"}
@@ -0,0 +1,163 @@
+from datetime import date
+from psycopg2.extras import execute_values
+from .db_conn import get_db_connection
+from .db_prices import lookup_asset, get_asset_id
+from .price_archive import PRICE_ARCHIVE_ENABLED
+
+
+def crossed_month_starts(current: date, target: date):
+    """
+    First day of every month boundary crossed when moving from current to
+    target: the dates advance_time credits salary for.
+    """
+    months = (target.year - current.year) * 12 + (target.month - current.month)
+    starts = []
+    y, m = current.year, current.month
+    for _ in range(max(0, months)):
+        y, m = (y + 1, 1) if m == 12 else (y, m + 1)
+        starts.append(date(y, m, 1))
+    return starts
+
+
+def set_plan(portfolio_id: int, allocations: dict):
+    """
+    Replaces the auto-invest plan of the portfolio's active session.
+    allocations: { "SPY": 0.6, "BTC": 0.2 } - share of each month's net income
+    to invest; weights may sum to less than 1, the rest stays in cash.
+    """
+    if not allocations:
+        return {"error": "Plan needs at least one symbol"}
+    rows = {}
+    for raw_symbol, weight in allocations.items():
+        weight = float(weight)
+        if weight <= 0:
+            return {"error": f"Weight for {raw_symbol} must be positive"}
+        asset = lookup_asset(raw_symbol)
+        asset_id = asset["id"] if asset else get_asset_id(raw_symbol)
+        if not asset_id:
+            return {"error": f"Asset {raw_symbol} not found"}
+        # "BTC" and "BTC-USD" are the same asset: merge their weights
+        symbol = asset["symbol"] if asset else raw_symbol.upper()
+        rows[asset_id] = (symbol, rows.get(asset_id, (symbol, 0.0))[1] + weight)
+    total = sum(w for _, w in rows.values())
+    if total > 1.0 + 1e-9:
+        return {"error": f"Weights sum to {total:.4f}; they must not exceed 1"}
+
+    try:
+        with get_db_connection() as conn:
+            cur = conn.cursor()
+            cur.execute("SELECT id FROM game_sessions WHERE portfolio_id = %s AND is_active = TRUE", (portfolio_id,))
+            row = cur.fetchone()
+            if not row:
+                return {"error": "No active session found for this portfolio"}
+            session_id = row[0]
+
+            cur.execute("DELETE FROM auto_invest_plans WHERE session_id = %s", (session_id,))
+            execute_values(cur, """
+                INSERT INTO auto_invest_plans (session_id, asset_id, symbol, weight) VALUES %s
+            """, [(session_id, aid, sym, w) for aid, (sym, w) in rows.items()])
+            conn.commit()
+            return {"status": "success", "session_id": session_id, "plan": {sym: w for sym, w in rows.values()}}
+    except Exception as e:
+        return {"error": str(e)}
+
+
+def get_plan(portfolio_id: int):
+    try:
+        with get_db_connection() as conn:
+            cur = conn.cursor()
+            cur.execute("""
+                SELECT a.symbol, a.weight
+                FROM auto_invest_plans a
+                JOIN game_sessions s ON s.id = a.session_id
+                WHERE s.portfolio_id = %s AND s.is_active = TRUE
+                ORDER BY a.weight DESC
+            """, (portfolio_id,))
+            return {sym: float(w) for sym, w in cur.fetchall()}
+    except Exception:
+        return {}
+
+
+def clear_plan(portfolio_id: int):
+    try:
+        with get_db_connection() as conn:
+            cur = conn.cursor()
+            cur.execute("""
+                DELETE FROM auto_invest_plans
+                WHERE session_id IN (SELECT id FROM game_sessions WHERE portfolio_id = %s AND is_active = TRUE)
+            """, (portfolio_id,))
+            conn.commit()
+            return {"status": "success", "removed": cur.rowcount}
+    except Exception as e:
+        return {"error": str(e)}
+
+
+def execute_plans(cur, sessions, month_starts):
+    """
+    Runs the auto-invest plans of several sessions inside the caller's
+    transaction: for every month start, each session buys weight * its
+    monthly amount of each plan symbol at the as-of price.
+    sessions: [(session_id, portfolio_id, monthly_amount)].
+    One query prices every month x symbol pair (across all sessions) and
+    one INSERT records all buys. Months where a symbol has no price yet
+    leave that money in cash.
+    Returns { portfolio_id: (amount_spent, buys_recorded) }.
+    """
+    investing = {sid: (pid, amount) for sid, pid, amount in sessions if amount > 0}
+    if not month_starts or not investing:
+        return {}
+
+    cur.execute("""
+        SELECT session_id, asset_id, symbol, weight
+        FROM auto_invest_plans
+        WHERE session_id = ANY(%s)
+    """, (list(investing),))
+    plans = cur.fetchall()
+    if not plans:
+        return {}
+
+    # As-of price of every month x symbol pair; pairs that miss the live
+    # table are retried on the archive view (same as get_prices)
+    asset_ids = sorted({aid for _, aid, _, _ in plans})
+    pairs = [(d, aid) for d in month_starts for aid in asset_ids]
+    query = """
+        SELECT t.d, t.asset_id, p.adj_close
+        FROM unnest(%s::date[], %s::int[]) AS t(d, asset_id)
+        CROSS JOIN LATERAL (
+            SELECT adj_close
+            FROM prices
+            WHERE asset_id = t.asset_id AND date <= t.d
+            ORDER BY date DESC
+            LIMIT 1
+        ) p
+    """
+    cur.execute(query, ([d for d, _ in pairs], [aid for _, aid in pairs]))
+    found = {(d, aid): price for d, aid, price in cur.fetchall()}
+    missing = [pair for pair in pairs if pair not in found]
+    if missing and PRICE_ARCHIVE_ENABLED:
+        cur.execute(query.replace("FROM prices", "FROM prices_all"), ([d for d, _ in missing], [aid for _, aid in missing]))
+        found.update({(d, aid): price for d, aid, price in cur.fetchall()})
+    prices = {}
+    for d, aid in pairs:
+        price = found.get((d, aid))
+        if price is not None and float(price) > 0:
+            prices.setdefault(aid, []).append((d, float(price)))
+
+    buys = []
+    results = {}
+    for sid, aid, sym, weight in plans:
+        pid, monthly_amount = investing[sid]
+        amount = monthly_amount * float(weight)
+        spent, count = results.get(pid, (0.0, 0))
+        for d, price in prices.get(aid, []):
+            buys.append((pid, aid, "BUY", sym, amount / price, price, d))
+            spent += amount
+            count += 1
+        results[pid] = (spent, count)
+
+    if buys:
+        execute_values(cur, """
+            INSERT INTO transactions (portfolio_id, asset_id, type, symbol, quantity, price_per_unit, date)
+            VALUES %s
+        """, buys, page_size=1000)
+    return results
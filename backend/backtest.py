@@ -0,0 +1,211 @@
+import numpy as np
+from . import price_matrix
+from .metrics import summary_stats, flow_adjusted_index, rolling_mean, simple_returns
+
+STRATEGIES = ("dca", "rebalance", "ma_crossover")
+FREQUENCIES = ("weekly", "monthly", "quarterly", "yearly")
+
+
+def period_starts(dates, frequency: str):
+    """
+    Boolean mask marking the first axis date of every week / month / quarter / year.
+    The first row is always a period start.
+    """
+    if len(dates) == 0:
+        return np.zeros(0, dtype=bool)
+    if frequency == "weekly":
+        # Day 0 (1970-01-01) is a Thursday; shift so weeks start on Monday
+        key = (dates.astype("datetime64[D]").astype(np.int64) + 3) // 7
+    elif frequency == "monthly":
+        key = dates.astype("datetime64[M]").astype(np.int64)
+    elif frequency == "quarterly":
+        key = dates.astype("datetime64[M]").astype(np.int64) // 3
+    elif frequency == "yearly":
+        key = dates.astype("datetime64[Y]").astype(np.int64)
+    else:
+        raise ValueError(f"Unknown frequency: {frequency}")
+    return np.concatenate([[True], key[1:] != key[:-1]])
+
+
+def normalize_weights(symbols, weights):
+    """
+    Returns a weight vector aligned with symbols, summing to 1.
+    Missing weights mean equal weighting.
+    """
+    if not weights:
+        return np.full(len(symbols), 1.0 / len(symbols))
+    upper = {k.upper(): float(v) for k, v in weights.items()}
+    w = np.array([max(upper.get(sym, 0.0), 0.0) for sym in symbols])
+    total = w.sum()
+    if total <= 0:
+        raise ValueError("Weights must contain at least one positive value")
+    return w / total
+
+
+def _tradable(prices):
+    return np.isfinite(prices) & (prices > 0)
+
+
+def _safe_prices(prices):
+    return np.where(_tradable(prices), prices, 1.0)
+
+
+def run_dca(prices, weights, schedule, initial_cash: float, contribution: float):
+    """
+    Invests initial_cash on the first row and `contribution` on every scheduled
+    row, split by weights at that row's price. Money for assets that are not
+    listed yet stays in cash.
+    Returns (equity, flows, units_bought) with units_bought a (dates x assets) matrix.
+    """
+    flows = np.where(schedule, contribution, 0.0)
+    flows[0] += initial_cash
+    alloc = flows[:, None] * weights[None, :]
+    tradable = _tradable(prices)
+
+    bought = np.where(tradable, alloc / _safe_prices(prices), 0.0)
+    idle_cash = np.cumsum(np.where(tradable, 0.0, alloc).sum(axis=1))
+    units = np.cumsum(bought, axis=0)
+    equity = np.nansum(units * prices, axis=1) + idle_cash
+    return equity, flows, bought
+
+
+def run_rebalance(prices, weights, schedule, initial_cash: float):
+    """
+    Holds target weights, resetting them on every scheduled row. Between
+    rebalances the holdings drift with prices. The value at each rebalance is
+    a cumulative product of per-segment growth factors, so no date loop.
+    Weights of assets without a price yet are spread over the listed ones.
+    Returns (equity, flows, units_traded).
+    """
+    rb = np.flatnonzero(schedule)
+    p_rb = prices[rb]
+    avail = _tradable(p_rb)
+
+    w = np.where(avail, weights[None, :], 0.0)
+    w_sum = w.sum(axis=1, keepdims=True)
+    w_eff = np.divide(w, w_sum, out=np.zeros_like(w), where=w_sum > 0)
+    all_cash = w_sum[:, 0] <= 0
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        rel = prices[rb[1:]] / p_rb[:-1]
+    growth = np.nansum(w_eff[:-1] * rel, axis=1) + all_cash[:-1]
+    value_rb = initial_cash * np.concatenate([[1.0], np.cumprod(growth)])
+
+    units_rb = value_rb[:, None] * w_eff / _safe_prices(p_rb)
+    segment = np.cumsum(schedule) - 1
+    units = units_rb[segment]
+    cash = np.where(all_cash[segment], value_rb[segment], 0.0)
+    equity = np.nansum(units * prices, axis=1) + cash
+
+    traded = np.zeros_like(prices)
+    traded[rb] = np.diff(units_rb, axis=0, prepend=np.zeros((1, units_rb.shape[1])))
+    flows = np.zeros(len(prices))
+    flows[0] = initial_cash
+    return equity, flows, traded
+
+
+def run_ma_crossover(prices, weights, initial_cash: float, fast: int, slow: int):
+    """
+    Each asset gets a sleeve of initial_cash * weight that is invested while
+    its fast moving average is above the slow one and in cash otherwise.
+    Signals act on the next row, so there is no look-ahead.
+    Returns (equity, flows, units_traded).
+    """
+    signal = rolling_mean(prices, fast) > rolling_mean(prices, slow)
+    position = np.zeros_like(signal)
+    position[1:] = signal[:-1]
+
+    rets = simple_returns(prices)
+    rets = np.where(np.isfinite(rets) & position[1:], rets, 0.0)
+    growth = np.vstack([np.ones((1, prices.shape[1])), np.cumprod(1.0 + rets, axis=0)])
+    sleeves = initial_cash * weights[None, :] * growth
+    equity = sleeves.sum(axis=1)
+
+    units = np.where(position, sleeves / _safe_prices(prices), 0.0)
+    traded = np.diff(units, axis=0, prepend=np.zeros((1, units.shape[1])))
+    flows = np.zeros(len(prices))
+    flows[0] = initial_cash
+    return equity, flows, traded
+
+
+def _trade_list(dates, symbols, prices, traded, limit: int):
+    # np.nonzero walks row-major, so trades come out in date order
+    rows, cols = np.nonzero(np.abs(traded) > 1e-12)
+    trades = []
+    for i, j in zip(rows[:limit], cols[:limit]):
+        qty = float(traded[i, j])
+        trades.append({
+            "date": str(dates[i]),
+            "symbol": symbols[j],
+            "side": "BUY" if qty > 0 else "SELL",
+            "quantity": abs(qty),
+            "price": float(prices[i, j]),
+            "value": abs(qty) * float(prices[i, j]),
+        })
+    return trades, len(rows)
+
+
+def run_strategy(dates, prices, symbols, strategy: str, initial_cash: float = 10000.0,
+                 weights=None, contribution: float = 0.0, frequency: str = "monthly",
+                 fast: int = 50, slow: int = 200, max_trades: int = 5000):
+    """
+    Runs a declarative strategy over an aligned (dates x assets) price matrix.
+    Pure function: no DB access, so sweeps can call it on shared matrices.
+    """
+    if strategy not in STRATEGIES:
+        return {"error": f"Unknown strategy '{strategy}'. Use one of: {', '.join(STRATEGIES)}"}
+    if frequency not in FREQUENCIES:
+        return {"error": f"Unknown frequency '{frequency}'. Use one of: {', '.join(FREQUENCIES)}"}
+    if len(dates) < 2:
+        return {"error": "Not enough price data in the requested window"}
+    try:
+        w = normalize_weights(symbols, weights)
+    except ValueError as e:
+        return {"error": str(e)}
+
+    if strategy == "dca":
+        equity, flows, traded = run_dca(prices, w, period_starts(dates, frequency), initial_cash, contribution)
+    elif strategy == "rebalance":
+        equity, flows, traded = run_rebalance(prices, w, period_starts(dates, frequency), initial_cash)
+    else:
+        if fast <= 0 or slow <= fast:
+            return {"error": "ma_crossover needs 0 < fast < slow"}
+        equity, flows, traded = run_ma_crossover(prices, w, initial_cash, fast, slow)
+
+    index, returns = flow_adjusted_index(equity, flows)
+    stats = summary_stats(index, dates, returns)
+    contributed = float(flows.sum())
+    stats.update({
+        "final_value": float(equity[-1]),
+        "total_contributed": contributed,
+        "profit": float(equity[-1]) - contributed,
+    })
+
+    trades, trade_count = _trade_list(dates, symbols, prices, traded, max_trades)
+    stats["trade_count"] = trade_count
+    return {
+        "dates": [str(d) for d in dates],
+        "equity": equity.tolist(),
+        "trades": trades,
+        "stats": stats,
+    }
+
+
+def run_backtest(symbols, start_date: str, end_date: str, strategy: str, **params):
+    """
+    Loads one aligned price matrix for symbols and runs the strategy on it.
+    """
+    found, missing = price_matrix.resolve_symbols(symbols)
+    if not found:
+        return {"error": "None of the requested symbols were found"}
+
+    try:
+        dates, prices = price_matrix.load_price_matrix([aid for _, aid in found], start_date, end_date)
+    except Exception as e:
+        print(f"Error loading backtest prices: {e}")
+        return {"error": "Failed to load price data"}
+
+    result = run_strategy(dates, prices, [sym for sym, _ in found], strategy, **params)
+    if "error" not in result:
+        result.update({"strategy": strategy, "start": start_date, "end": end_date, "missing": missing})
+    return result
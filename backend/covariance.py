@@ -0,0 +1,256 @@
+import copy
+import threading
+import numpy as np
+from collections import OrderedDict
+from datetime import date, datetime
+from .db_prices import get_assets_metadata, get_cache_generation
+from .price_matrix import forward_fill, load_quote_matrix, resolve_symbols, to_json_column
+
+DEFAULT_WINDOW = 252
+MAX_WINDOW = 2520
+MAX_STATES = 8
+
+_lock = threading.Lock()
+_states = OrderedDict()  # (window, end_date, generation) -> MomentState, LRU order; never mutated once cached
+
+
+def window_start(end, window: int):
+    """
+    First day of a `window`-day lookback ending at end. Windows count
+    weekdays, so they span the same calendar period for every asset: a
+    252-day window is about a year, holding ~252 equity sessions and ~365
+    crypto days.
+    """
+    return np.busday_offset(np.datetime64(end, "D"), -(window - 1), roll="backward")
+
+
+class MomentState:
+    """
+    Pairwise-complete moment sums over the daily returns of a fixed asset
+    universe inside the last `window` weekdays (see window_start). For
+    every pair (i, j), only rows where both assets have a return are
+    counted, so assets with different listing dates or trading calendars
+    are still compared over their common history:
+        count[i, j]  = sum m_i m_j
+        sum_x[i, j]  = sum x_i m_j      (x zero where missing)
+        sum_xx[i, j] = sum x_i^2 m_j
+        sum_xy[i, j] = sum x_i x_j
+    Each is a matmul over the rows, so adding or evicting a day costs
+    O(n^2) instead of a full O(window * n^2) rebuild.
+    """
+
+    def __init__(self, asset_ids, window: int):
+        n = len(asset_ids)
+        self.asset_ids = np.asarray(asset_ids, dtype=np.int64)
+        self.window = window
+        self.last_date = None
+        self.last_price = np.full(n, np.nan)
+        self.dates = np.empty(0, dtype="datetime64[D]")
+        self.x = np.zeros((0, n))
+        self.m = np.zeros((0, n))
+        self._reset_sums()
+
+    def _reset_sums(self):
+        n = len(self.asset_ids)
+        self.count, self.sum_x, self.sum_xx, self.sum_xy = (np.zeros((n, n)) for _ in range(4))
+
+    def _accumulate(self, x, m, sign: float):
+        self.count += sign * (m.T @ m)
+        self.sum_x += sign * (x.T @ m)
+        self.sum_xx += sign * ((x * x).T @ m)
+        self.sum_xy += sign * (x.T @ x)
+
+    def push(self, dates, quotes, end=None):
+        """
+        Appends days of raw closes (dates x assets, NaN where an asset did
+        not trade) and moves the window to end (default: the last date).
+        A return counts only on days the asset traded, measured from its
+        previous quote; rows before the window start are evicted.
+        """
+        dates = np.asarray(dates, dtype="datetime64[D]")
+        if end is None and len(dates) == 0:
+            return
+        first = window_start(end if end is not None else dates[-1], self.window)
+
+        if len(dates):
+            prev = forward_fill(np.vstack([self.last_price, quotes]))
+            self.last_price = prev[-1].copy()
+            prev = prev[:-1]
+            with np.errstate(invalid="ignore", divide="ignore"):
+                returns = quotes / prev - 1.0
+            valid = np.isfinite(returns) & (prev > 0)
+            x = np.where(valid, returns, 0.0)
+            m = valid.astype(float)
+            self.last_date = dates[-1]
+
+            if dates[0] <= first:
+                # The new rows alone cover the window: rebuild from them
+                keep = dates >= first
+                self.dates, self.x, self.m = dates[keep], x[keep], m[keep]
+                self._reset_sums()
+                self._accumulate(self.x, self.m, 1.0)
+                return
+            self._accumulate(x, m, 1.0)
+            self.dates = np.concatenate([self.dates, dates])
+            self.x = np.vstack([self.x, x])
+            self.m = np.vstack([self.m, m])
+
+        drop = int(np.searchsorted(self.dates, first))
+        if drop:
+            self._accumulate(self.x[:drop], self.m[:drop], -1.0)
+            self.dates, self.x, self.m = self.dates[drop:], self.x[drop:], self.m[drop:]
+
+    def means(self, columns):
+        """
+        Mean daily return of each column over its own valid rows.
+        """
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return self.sum_x[columns, columns] / self.count[columns, columns]
+
+    def periods_per_year(self, columns):
+        """
+        Returns per year of each column, from its observations since its first
+        valid row in the window (equities ~252, crypto ~365).
+        """
+        m = self.m[:, columns]
+        first = self.dates[m.argmax(axis=0)]
+        years = (self.dates[-1] - first).astype("timedelta64[D]").astype(float) / 365.25
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return np.where(years > 0, (m.sum(axis=0) - 1) / years, np.nan)
+
+    def matrices(self, columns, min_periods: int):
+        """
+        (covariance, correlation, observations) of the selected columns from
+        the running sums. Pairs with fewer than min_periods common rows are NaN.
+        """
+        ix = np.ix_(columns, columns)
+        n = self.count[ix]
+        sx, sxx, sxy = self.sum_x[ix], self.sum_xx[ix], self.sum_xy[ix]
+        with np.errstate(invalid="ignore", divide="ignore"):
+            # sx[i, j] sums x_i over the pair's rows; sx.T sums x_j over the same rows
+            cov = (sxy - sx * sx.T / n) / (n - 1)
+            var_i = (sxx - sx * sx / n) / (n - 1)
+            corr = cov / np.sqrt(var_i * var_i.T)
+        short = n < max(min_periods, 2)
+        cov[short] = np.nan
+        corr[short] = np.nan
+        return cov, np.clip(corr, -1.0, 1.0), n.astype(int)
+
+
+def _build(asset_ids, window: int, end: str):
+    axis, quotes, before = load_quote_matrix(asset_ids, str(window_start(end, window)), end)
+    state = MomentState(asset_ids, window)
+    state.last_price = before
+    state.push(axis, quotes, end)
+    return state
+
+
+def _roll(state, end: str):
+    """
+    A copy of a cached state moved forward to end; the cached one is shared
+    with readers and stays untouched.
+    """
+    state = copy.deepcopy(state)
+    start = str(state.last_date + np.timedelta64(1, "D")) if state.last_date is not None else end
+    if start <= end:
+        axis, quotes, _ = load_quote_matrix(state.asset_ids.tolist(), start, end)
+    else:
+        axis, quotes = np.empty(0, dtype="datetime64[D]"), np.empty((0, len(state.asset_ids)))
+    state.push(axis, quotes, end)
+    return state
+
+
+def get_state(window: int, end: str):
+    """
+    Moment state for the whole asset universe ending at `end`. Cached per
+    (window, end); a request for a later end rolls the newest earlier state
+    forward by the missing days instead of rebuilding it. The lock only
+    guards the cache: price queries run outside it, and cached states are
+    never modified, so callers may read them without holding it.
+    """
+    generation = get_cache_generation()
+    key = (window, end, generation)
+    asset_ids = sorted(a["id"] for a in get_assets_metadata())
+    with _lock:
+        if key in _states:
+            _states.move_to_end(key)
+            return _states[key]
+        earlier = [k for k in _states if k[0] == window and k[2] == generation and k[1] < end]
+        base = _states[max(earlier, key=lambda k: k[1])] if earlier else None
+
+    if base is not None and base.asset_ids.tolist() == asset_ids:
+        state = _roll(base, end)
+    else:
+        state = _build(asset_ids, window, end)
+
+    with _lock:
+        # A concurrent request may have cached the same key meanwhile
+        state = _states.setdefault(key, state)
+        _states.move_to_end(key)
+        while len(_states) > MAX_STATES:
+            _states.popitem(last=False)
+        return state
+
+
+def split_covered(state, found):
+    """
+    Splits resolved [(symbol, asset_id)] into those the state has a column
+    for and the symbols it lacks: assets added since the asset metadata was
+    cached resolve through the DB but are not in the state yet.
+    """
+    covered = set(state.asset_ids.tolist())
+    return [(sym, aid) for sym, aid in found if aid in covered], [sym for sym, aid in found if aid not in covered]
+
+
+def covariance(asset_ids, window: int = DEFAULT_WINDOW, end: str = None, min_periods: int = None):
+    """
+    Daily-return (covariance, correlation, observations) for asset_ids in
+    the given order, from the shared cached state.
+    """
+    end = end or date.today().isoformat()
+    state = get_state(window, end)
+    index = {aid: j for j, aid in enumerate(state.asset_ids.tolist())}
+    columns = [index[aid] for aid in asset_ids]
+    return state.matrices(columns, min_periods if min_periods is not None else max(20, window // 4))
+
+
+def get_correlation(symbols=None, window: int = DEFAULT_WINDOW, end: str = None, min_periods: int = None):
+    """
+    Pairwise-complete correlation and covariance of daily returns over the
+    last `window` weekdays up to `end` (default: today). All assets when no
+    symbols are given.
+    """
+    if not 2 <= window <= MAX_WINDOW:
+        return {"error": f"window must be between 2 and {MAX_WINDOW}"}
+    if end:
+        try:
+            datetime.strptime(end, "%Y-%m-%d")
+        except ValueError:
+            return {"error": "Invalid date format. Use YYYY-MM-DD"}
+
+    if symbols:
+        found, missing = resolve_symbols(symbols)
+    else:
+        found, missing = [(a["symbol"], a["id"]) for a in sorted(get_assets_metadata(), key=lambda a: a["symbol"])], []
+    if not found:
+        return {"error": "No known symbols given"}
+
+    try:
+        found, absent = split_covered(get_state(window, end or date.today().isoformat()), found)
+        if found:
+            cov, corr, obs = covariance([aid for _, aid in found], window, end, min_periods)
+    except Exception as e:
+        print(f"Error computing correlation: {e}")
+        return {"error": "Failed to compute correlation"}
+    missing = missing + absent
+    if not found:
+        return {"error": f"No price history loaded yet for: {', '.join(missing)}"}
+    return {
+        "symbols": [sym for sym, _ in found],
+        "missing": missing,
+        "window": window,
+        "end": end or date.today().isoformat(),
+        "correlation": [to_json_column(row) for row in corr],
+        "covariance": [to_json_column(row) for row in cov],
+        "observations": obs.tolist()
+    }
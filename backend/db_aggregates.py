@@ -0,0 +1,97 @@
+from datetime import datetime
+from .db_conn import get_db_connection
+from .price_archive import PRICE_SOURCE
+
+# Derived period tables maintained from the daily prices table.
+# resolution -> (table, date_trunc unit)
+AGGREGATE_TABLES = {
+    "weekly": ("prices_weekly", "week"),
+    "monthly": ("prices_monthly", "month"),
+}
+
+# Ranges longer than these (in days) are served from the aggregate tables
+# when callers ask for resolution="auto".
+WEEKLY_AFTER_DAYS = 400
+MONTHLY_AFTER_DAYS = 3650
+
+def pick_resolution(start_date, end_date):
+    """
+    Chooses daily / weekly / monthly resolution for a date range.
+    Accepts date objects or YYYY-MM-DD strings.
+    """
+    if not start_date or not end_date:
+        return "daily"
+    if isinstance(start_date, str):
+        start_date = datetime.strptime(start_date[:10], "%Y-%m-%d").date()
+    if isinstance(end_date, str):
+        end_date = datetime.strptime(end_date[:10], "%Y-%m-%d").date()
+
+    span = (end_date - start_date).days
+    if span > MONTHLY_AFTER_DAYS:
+        return "monthly"
+    if span > WEEKLY_AFTER_DAYS:
+        return "weekly"
+    return "daily"
+
+def refresh_price_aggregates(cur, asset_ids, start_date=None, end_date=None):
+    """
+    Recomputes the weekly and monthly rows of asset_ids for every period that
+    overlaps [start_date, end_date]. Without bounds the full history is rebuilt.
+
+    Runs on the caller's cursor so ingestion scripts can refresh the affected
+    periods inside the same transaction as their price upsert.
+    """
+    if isinstance(asset_ids, int):
+        asset_ids = [asset_ids]
+    if not asset_ids:
+        return
+
+    for table, unit in AGGREGATE_TABLES.values():
+        conditions = ["asset_id = ANY(%s)"]
+        params = [list(asset_ids)]
+        if start_date:
+            # Widen to the start of the period so partial periods are recomputed whole
+            conditions.append(f"date >= date_trunc('{unit}', %s::date)")
+            params.append(start_date)
+        if end_date:
+            conditions.append(f"date < date_trunc('{unit}', %s::date) + interval '1 {unit}'")
+            params.append(end_date)
+
+        cur.execute(f"""
+            INSERT INTO {table} (asset_id, period_start, last_date, open, high, low, close, adj_close, volume)
+            SELECT
+                asset_id,
+                date_trunc('{unit}', date)::date AS period_start,
+                MAX(date),
+                (array_agg(close ORDER BY date ASC))[1],
+                MAX(close),
+                MIN(close),
+                (array_agg(close ORDER BY date DESC))[1],
+                (array_agg(adj_close ORDER BY date DESC))[1],
+                SUM(volume)
+            FROM {PRICE_SOURCE}
+            WHERE {" AND ".join(conditions)}
+            GROUP BY asset_id, period_start
+            ON CONFLICT (asset_id, period_start) DO UPDATE SET
+                last_date = EXCLUDED.last_date,
+                open = EXCLUDED.open,
+                high = EXCLUDED.high,
+                low = EXCLUDED.low,
+                close = EXCLUDED.close,
+                adj_close = EXCLUDED.adj_close,
+                volume = EXCLUDED.volume
+        """, params)
+
+def rebuild_all_aggregates():
+    """
+    Full backfill of both aggregate tables, one asset per transaction.
+    """
+    with get_db_connection() as conn:
+        cur = conn.cursor()
+        cur.execute("SELECT id, symbol FROM assets ORDER BY id")
+        assets = cur.fetchall()
+        for asset_id, symbol in assets:
+            refresh_price_aggregates(cur, [asset_id])
+            conn.commit()
+            print(f"  Aggregated {symbol}")
+    return len(assets)
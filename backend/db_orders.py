@@ -0,0 +1,276 @@
+import numpy as np
+from datetime import timedelta
+from psycopg2.extras import execute_values
+from .db_conn import get_db_connection
+from .db_prices import lookup_asset, get_asset_id
+from .price_archive import PRICE_SOURCE
+
+ORDER_TYPES = ("LIMIT", "STOP", "TAKE_PROFIT")
+SIDES = ("BUY", "SELL")
+
+# Orders that trigger when the price falls to / below the trigger;
+# every other valid combination triggers at / above it.
+_TRIGGERS_BELOW = {("LIMIT", "BUY"), ("STOP", "SELL")}
+
+
+def triggers_below(order_type: str, side: str):
+    return (order_type, side) in _TRIGGERS_BELOW
+
+
+def place_order(portfolio_id: int, symbol: str, side: str, order_type: str, trigger_price: float, quantity: float):
+    """
+    Stores a conditional order for the portfolio's active session. It is
+    evaluated from the day after the current sim_date on every time advance.
+    """
+    side, order_type = side.upper(), order_type.upper()
+    if side not in SIDES:
+        return {"error": f"Invalid side '{side}'. Use BUY or SELL"}
+    if order_type not in ORDER_TYPES:
+        return {"error": f"Invalid order type '{order_type}'. Use one of: {', '.join(ORDER_TYPES)}"}
+    if order_type == "TAKE_PROFIT" and side != "SELL":
+        return {"error": "TAKE_PROFIT orders must be SELL orders"}
+    if trigger_price <= 0 or quantity <= 0:
+        return {"error": "trigger_price and quantity must be positive"}
+
+    asset = lookup_asset(symbol)
+    asset_id = asset["id"] if asset else get_asset_id(symbol)
+    if not asset_id:
+        return {"error": f"Asset {symbol} not found"}
+    symbol = asset["symbol"] if asset else symbol
+
+    try:
+        with get_db_connection() as conn:
+            cur = conn.cursor()
+            cur.execute("SELECT sim_date FROM game_sessions WHERE portfolio_id = %s AND is_active = TRUE", (portfolio_id,))
+            row = cur.fetchone()
+            if not row:
+                return {"error": "No active session found for this portfolio"}
+
+            cur.execute("""
+                INSERT INTO pending_orders (portfolio_id, asset_id, symbol, side, order_type, trigger_price, quantity, created_date)
+                VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+                RETURNING id
+            """, (portfolio_id, asset_id, symbol, side, order_type, trigger_price, quantity, row[0]))
+            order_id = cur.fetchone()[0]
+            conn.commit()
+            return {
+                "status": "success",
+                "order_id": order_id,
+                "symbol": symbol,
+                "side": side,
+                "order_type": order_type,
+                "trigger_price": trigger_price,
+                "quantity": quantity,
+                "created_date": str(row[0])
+            }
+    except Exception as e:
+        return {"error": str(e)}
+
+
+def list_orders(portfolio_id: int, status: str = None):
+    try:
+        with get_db_connection() as conn:
+            cur = conn.cursor()
+            cur.execute("""
+                SELECT id, symbol, side, order_type, trigger_price, quantity, status,
+                       created_date, filled_date, fill_price, note
+                FROM pending_orders
+                WHERE portfolio_id = %s AND (%s::text IS NULL OR status = %s)
+                ORDER BY id
+            """, (portfolio_id, status, status))
+            return [{
+                "id": r[0],
+                "symbol": r[1],
+                "side": r[2],
+                "order_type": r[3],
+                "trigger_price": float(r[4]),
+                "quantity": float(r[5]),
+                "status": r[6],
+                "created_date": str(r[7]),
+                "filled_date": str(r[8]) if r[8] else None,
+                "fill_price": float(r[9]) if r[9] is not None else None,
+                "note": r[10]
+            } for r in cur.fetchall()]
+    except Exception:
+        return []
+
+
+def cancel_order(portfolio_id: int, order_id: int):
+    try:
+        with get_db_connection() as conn:
+            cur = conn.cursor()
+            cur.execute("""
+                UPDATE pending_orders SET status = 'CANCELLED'
+                WHERE id = %s AND portfolio_id = %s AND status = 'OPEN'
+            """, (order_id, portfolio_id))
+            if cur.rowcount == 0:
+                return {"error": "Open order not found"}
+            conn.commit()
+            return {"status": "success", "order_id": order_id}
+    except Exception as e:
+        return {"error": str(e)}
+
+
+def first_trigger(prices, triggers, below):
+    """
+    prices: (dates x orders) price paths (NaN on days without a quote).
+    Returns (triggered, row) per order: whether the trigger was crossed in
+    the window and the first row where it was.
+    """
+    with np.errstate(invalid="ignore"):
+        hit = np.where(below[None, :], prices <= triggers[None, :], prices >= triggers[None, :])
+    return hit.any(axis=0), hit.argmax(axis=0)
+
+
+def _quote_matrix(cur, asset_ids, start_date, end_date):
+    """
+    (dates x assets) closes in [start_date, end_date] without forward
+    filling: an order can only trigger on a day its asset actually traded.
+    Reads on the caller's cursor, so no second pooled connection is taken
+    while its transaction is open.
+    """
+    cur.execute(f"""
+        SELECT asset_id, date, adj_close
+        FROM {PRICE_SOURCE}
+        WHERE asset_id = ANY(%s) AND date >= %s AND date <= %s AND adj_close IS NOT NULL
+    """, (list(asset_ids), start_date, end_date))
+    rows = cur.fetchall()
+    row_assets = np.array([r[0] for r in rows], dtype=np.int64)
+    row_dates = np.array([r[1] for r in rows], dtype="datetime64[D]")
+    row_prices = np.array([r[2] for r in rows], dtype=float)
+
+    axis = np.unique(row_dates)
+    ids = np.asarray(asset_ids, dtype=np.int64)
+    order = np.argsort(ids)
+    cols = order[np.searchsorted(ids, row_assets, sorter=order)]
+    matrix = np.full((len(axis), len(ids)), np.nan)
+    matrix[np.searchsorted(axis, row_dates), cols] = row_prices
+    return axis, matrix
+
+
+def load_order_quotes(cur, portfolio_ids, from_date, to_date):
+    """
+    One quote matrix for the open orders of every portfolio in a batch that
+    moves from from_date to to_date. Returns (portfolio ids with open
+    orders, (asset_ids, dates, quotes)) for execute_triggered_orders.
+    """
+    cur.execute("""
+        SELECT DISTINCT portfolio_id, asset_id FROM pending_orders
+        WHERE portfolio_id = ANY(%s) AND status = 'OPEN'
+    """, (list(portfolio_ids),))
+    pairs = cur.fetchall()
+    asset_ids = sorted({aid for _, aid in pairs})
+    if not asset_ids:
+        return [], None
+    dates, quotes = _quote_matrix(cur, asset_ids, from_date + timedelta(days=1), to_date)
+    return sorted({pid for pid, _ in pairs}), (asset_ids, dates, quotes)
+
+
+def execute_triggered_orders(cur, portfolio_id: int, from_date, to_date, income=(), quotes=None):
+    """
+    Evaluates the portfolio's open orders over (from_date, to_date] inside
+    the caller's transaction. Each referenced asset's path is loaded once
+    and the first crossing of every order is found with one vectorized
+    comparison. Triggered orders then fill at that day's close in date
+    order, each checked against cash and holdings as of its fill date:
+    the cash balance at from_date plus the `income` [(date, amount)]
+    credited up to that day, minus transactions already written inside
+    the window (auto-invest buys) up to that day. Must run before the
+    window's income is added to cash_balance. `quotes` is a batch's shared
+    matrix from load_order_quotes; without it the orders' own assets are
+    loaded. One INSERT and one UPDATE write the fills. Returns a summary dict.
+    """
+    cur.execute("""
+        SELECT id, asset_id, symbol, side, order_type, trigger_price, quantity
+        FROM pending_orders
+        WHERE portfolio_id = %s AND status = 'OPEN'
+        FOR UPDATE
+    """, (portfolio_id,))
+    orders = cur.fetchall()
+    if not orders:
+        return {"filled": 0, "rejected": 0}
+
+    asset_ids = sorted({o[1] for o in orders})
+    if quotes is None:
+        quotes = (asset_ids, *_quote_matrix(cur, asset_ids, from_date + timedelta(days=1), to_date))
+    quote_ids, dates, matrix = quotes
+    if len(dates) == 0:
+        return {"filled": 0, "rejected": 0}
+
+    col = {aid: j for j, aid in enumerate(quote_ids)}
+    paths = matrix[:, [col[o[1]] for o in orders]]
+    triggers = np.array([float(o[5]) for o in orders])
+    below = np.array([triggers_below(o[4], o[3]) for o in orders])
+    triggered, first_row = first_trigger(paths, triggers, below)
+
+    hits = np.flatnonzero(triggered)
+    if len(hits) == 0:
+        return {"filled": 0, "rejected": 0}
+    # Fill in chronological order; same-day ties by order id
+    hits = hits[np.lexsort((np.array([orders[i][0] for i in hits]), first_row[hits]))]
+
+    cur.execute("SELECT cash_balance FROM portfolios WHERE id = %s FOR UPDATE", (portfolio_id,))
+    cash = float(cur.fetchone()[0])
+    cur.execute("""
+        SELECT asset_id, SUM(CASE WHEN type = 'BUY' THEN quantity ELSE -quantity END)
+        FROM portfolio_ledger(%s)
+        WHERE asset_id = ANY(%s) AND date <= %s
+        GROUP BY asset_id
+    """, (portfolio_id, asset_ids, from_date))
+    held = {aid: float(q) for aid, q in cur.fetchall()}
+
+    # Dated cash and holding changes inside the window that are not in cash_balance yet
+    cur.execute("""
+        SELECT date, asset_id, CASE WHEN type = 'BUY' THEN quantity ELSE -quantity END, price_per_unit
+        FROM portfolio_ledger(%s)
+        WHERE date > %s AND date <= %s
+    """, (portfolio_id, from_date, to_date))
+    window = cur.fetchall()
+    flows = [(d, float(amount)) for d, amount in income] + [(d, -float(q) * float(p)) for d, _, q, p in window]
+    flow_dates = np.array([d for d, _ in flows], dtype="datetime64[D]")
+    flow_order = np.argsort(flow_dates, kind="stable")
+    flow_dates = flow_dates[flow_order]
+    flow_cash = np.concatenate([[0.0], np.cumsum(np.array([a for _, a in flows])[flow_order])])
+    bought = {}  # asset_id -> (dates, cumulative quantity)
+    for aid in asset_ids:
+        rows = sorted((np.datetime64(d, "D"), float(q)) for d, a, q, _ in window if a == aid)
+        bought[aid] = (np.array([d for d, _ in rows], dtype="datetime64[D]"), np.concatenate([[0.0], np.cumsum([q for _, q in rows])]))
+
+    spent = 0.0  # net cash of the fills so far
+    txns, updates = [], []
+    for i in hits:
+        order_id, aid, symbol, side, _, _, qty = orders[i]
+        qty = float(qty)
+        fill_day = dates[first_row[i]]
+        fill_date = fill_day.item()
+        price = float(paths[first_row[i], i])
+        total = price * qty
+        available = cash + flow_cash[np.searchsorted(flow_dates, fill_day, side="right")] - spent
+        buy_dates, buy_qty = bought[aid]
+        owned = held.get(aid, 0.0) + buy_qty[np.searchsorted(buy_dates, fill_day, side="right")]
+        if side == "BUY" and total > available + 1e-9:
+            updates.append((order_id, "REJECTED", fill_date, price, f"Insufficient funds: needed {total:.2f}"))
+            continue
+        if side == "SELL" and owned < qty - 1e-9:
+            updates.append((order_id, "REJECTED", fill_date, price, f"Insufficient holdings: owned {owned}"))
+            continue
+        sign = 1.0 if side == "BUY" else -1.0
+        spent += sign * total
+        held[aid] = held.get(aid, 0.0) + sign * qty
+        txns.append((portfolio_id, aid, side, symbol, qty, price, fill_date))
+        updates.append((order_id, "FILLED", fill_date, price, None))
+
+    if txns:
+        execute_values(cur, """
+            INSERT INTO transactions (portfolio_id, asset_id, type, symbol, quantity, price_per_unit, date)
+            VALUES %s
+        """, txns, page_size=1000)
+        cur.execute("UPDATE portfolios SET cash_balance = cash_balance - %s WHERE id = %s", (spent, portfolio_id))
+    execute_values(cur, """
+        UPDATE pending_orders AS o
+        SET status = v.status, filled_date = v.filled_date, fill_price = v.fill_price, note = v.note
+        FROM (VALUES %s) AS v(id, status, filled_date, fill_price, note)
+        WHERE o.id = v.id
+    """, updates, template="(%s, %s, %s::date, %s::double precision, %s::text)", page_size=1000)
+
+    return {"filled": len(txns), "rejected": len(updates) - len(txns)}
@@ -1,7 +1,10 @@
+import numpy as np
 import psycopg2
-from .db_prices import get_asset_id, get_price
+from psycopg2.extras import execute_values
+from .db_prices import get_asset_id, get_price, get_prices, get_symbol_map, lookup_asset
 from .db_conn import get_db_connection
 from .db_currency import get_rate
+from .price_archive import PRICE_ARCHIVE_ENABLED
 from datetime import datetime
 
 def create_user(username: str):
@@ -56,8 +59,7 @@ def get_holdings(portfolio_id: int):
             cur = conn.cursor()
             cur.execute("""
                 SELECT symbol, type, quantity 
-                FROM transactions 
-                WHERE portfolio_id = %s
+                FROM portfolio_ledger(%s)
             """, (portfolio_id,))
             
             holdings = {}
@@ -84,7 +86,13 @@ def add_transaction(portfolio_id: int, symbol: str, txn_type: str, quantity: flo
     3. Updates cash balance.
     4. Records transaction.
     """
-    asset_id = get_asset_id(symbol)
+    asset = lookup_asset(symbol)
+    if asset:
+        # Store the canonical symbol (e.g. "BTC" -> "BTC-USD") so the ledger
+        # stays consistent with the assets table.
+        asset_id, symbol = asset["id"], asset["symbol"]
+    else:
+        asset_id = get_asset_id(symbol)
     if not asset_id:
         return {"error": f"Asset {symbol} not found"}
 
@@ -117,8 +125,8 @@ def add_transaction(portfolio_id: int, symbol: str, txn_type: str, quantity: flo
                 # BUT strict ACID requires checking inside transaction.
                 # Let's quickly re-sum holdings for this asset inside the txn for safety.
                 cur.execute("""
-                    SELECT type, quantity FROM transactions 
-                    WHERE portfolio_id = %s AND symbol = %s
+                    SELECT type, quantity FROM portfolio_ledger(%s)
+                    WHERE symbol = %s
                 """, (portfolio_id, symbol))
                 current_qty = 0.0
                 for t_type, t_qty in cur.fetchall():
@@ -155,6 +163,195 @@ def add_transaction(portfolio_id: int, symbol: str, txn_type: str, quantity: flo
     except Exception as e:
         return {"error": str(e)}
 
+def execute_orders(portfolio_id: int, orders, date: str, dry_run: bool = False):
+    """
+    Executes several orders as one atomic batch at date's prices.
+    orders: [{"symbol", "side": BUY|SELL, "quantity"}].
+    Prices are resolved with one lookup, and the portfolio row is locked
+    once. Sells are applied before buys, so their proceeds fund the buys.
+    Either every order is recorded (one multi-row INSERT, one cash UPDATE)
+    or none is. With dry_run the checks run but nothing is written.
+    """
+    if not orders:
+        return {"error": "No orders given"}
+
+    resolved = []
+    for i, order in enumerate(orders):
+        side = str(order.get("side", "")).upper()
+        quantity = float(order.get("quantity", 0))
+        if side not in ("BUY", "SELL"):
+            return {"error": f"Order {i + 1}: invalid side '{order.get('side')}'. Use BUY or SELL"}
+        if quantity <= 0:
+            return {"error": f"Order {i + 1}: quantity must be positive"}
+        asset = lookup_asset(order.get("symbol"))
+        asset_id = asset["id"] if asset else get_asset_id(order.get("symbol"))
+        if not asset_id:
+            return {"error": f"Order {i + 1}: asset {order.get('symbol')} not found"}
+        symbol = asset["symbol"] if asset else order["symbol"]
+        resolved.append((i, asset_id, symbol, side, quantity))
+
+    prices = get_prices([r[1] for r in resolved], date)
+    for i, asset_id, symbol, _, _ in resolved:
+        if asset_id not in prices:
+            return {"error": f"Order {i + 1}: price not available for {symbol} on {date}"}
+
+    try:
+        with get_db_connection() as conn:
+            cur = conn.cursor()
+            cur.execute("SELECT cash_balance FROM portfolios WHERE id = %s FOR UPDATE", (portfolio_id,))
+            row = cur.fetchone()
+            if not row:
+                return {"error": "Portfolio not found"}
+            cash = float(row[0])
+
+            cur.execute("""
+                SELECT asset_id, SUM(CASE WHEN type = 'BUY' THEN quantity ELSE -quantity END)
+                FROM portfolio_ledger(%s)
+                WHERE asset_id = ANY(%s)
+                GROUP BY asset_id
+            """, (portfolio_id, sorted({r[1] for r in resolved})))
+            held = {aid: float(q) for aid, q in cur.fetchall()}
+
+            results = [None] * len(resolved)
+            txns = []
+            # Sells first (stable within each side), so proceeds can fund the buys
+            for i, asset_id, symbol, side, quantity in sorted(resolved, key=lambda r: r[3] != "SELL"):
+                price = prices[asset_id]
+                total = price * quantity
+                if side == "SELL":
+                    owned = held.get(asset_id, 0.0)
+                    if owned < quantity - 1e-9:
+                        return {"error": f"Order {i + 1}: insufficient holdings of {symbol}. Owned: {owned}, Selling: {quantity}"}
+                    held[asset_id] = owned - quantity
+                    cash += total
+                else:
+                    if cash < total - 1e-9:
+                        return {"error": f"Order {i + 1}: insufficient funds for {symbol}. Required: ${total:.2f}, Available: ${cash:.2f}"}
+                    held[asset_id] = held.get(asset_id, 0.0) + quantity
+                    cash -= total
+                txns.append((portfolio_id, asset_id, side, symbol, quantity, price, date))
+                results[i] = {"symbol": symbol, "type": side, "quantity": quantity, "price": price, "total": total}
+
+            if dry_run:
+                conn.rollback()
+            else:
+                execute_values(cur, """
+                    INSERT INTO transactions (portfolio_id, asset_id, type, symbol, quantity, price_per_unit, date)
+                    VALUES %s
+                """, txns)
+                cur.execute("UPDATE portfolios SET cash_balance = %s WHERE id = %s", (cash, portfolio_id))
+                conn.commit()
+            return {
+                "status": "dry_run" if dry_run else "success",
+                "date": date,
+                "orders": results,
+                "new_balance": cash
+            }
+    except Exception as e:
+        return {"error": str(e)}
+
+def rebalance_trades(units, prices, weights, cash: float, fractional: bool = True, min_trade: float = 0.0):
+    """
+    Signed unit deltas (buy > 0, sell < 0) per asset that move holdings to
+    target weights of total value (cash + units * prices). Whole units only
+    unless fractional: buys round down and sells round up, so the buys stay
+    affordable. Trades worth less than min_trade are dropped. If dropped
+    sells leave too little cash, buys are scaled down to fit.
+    """
+    units = np.asarray(units, dtype=float)
+    prices = np.asarray(prices, dtype=float)
+    total = cash + units @ prices
+    delta = np.asarray(weights, dtype=float) * total / prices - units
+    if not fractional:
+        # Never sell more than is held (fractional leftovers are sold whole)
+        delta = np.where(delta > 0, np.floor(delta + 1e-9), -np.minimum(units, np.ceil(-delta - 1e-9)))
+    delta[np.abs(delta) * prices < max(min_trade, 1e-9)] = 0.0
+
+    buys = delta > 0
+    available = cash - delta[~buys] @ prices[~buys]
+    cost = delta[buys] @ prices[buys]
+    if cost > available:
+        delta[buys] *= max(available, 0.0) / cost
+        if not fractional:
+            delta[buys] = np.floor(delta[buys])
+        delta[buys & (delta * prices < max(min_trade, 1e-9))] = 0.0
+    return delta
+
+
+def rebalance_portfolio(portfolio_id: int, targets: dict, date: str, fractional: bool = True,
+                        min_trade: float = 0.0, dry_run: bool = False):
+    """
+    Trades the portfolio to target weights ({symbol: weight}, summing to at
+    most 1; the rest stays in cash) at date's prices. Held symbols missing
+    from targets are sold. Quantities come from rebalance_trades, and the
+    orders go through execute_orders, so they apply atomically with sells
+    first (or are only checked with dry_run).
+    """
+    weights_by_id = {}
+    symbols = {}
+    for symbol, weight in targets.items():
+        if weight < 0:
+            return {"error": f"Weight for {symbol} must not be negative"}
+        asset = lookup_asset(symbol)
+        asset_id = asset["id"] if asset else get_asset_id(symbol)
+        if not asset_id:
+            return {"error": f"Asset {symbol} not found"}
+        symbols[asset_id] = asset["symbol"] if asset else symbol
+        weights_by_id[asset_id] = weights_by_id.get(asset_id, 0.0) + float(weight)
+    if sum(weights_by_id.values()) > 1.0 + 1e-9:
+        return {"error": f"Weights sum to {sum(weights_by_id.values()):.4f}; they must not exceed 1"}
+
+    try:
+        with get_db_connection() as conn:
+            cur = conn.cursor()
+            cur.execute("SELECT cash_balance FROM portfolios WHERE id = %s", (portfolio_id,))
+            row = cur.fetchone()
+            if not row:
+                return {"error": "Portfolio not found"}
+            cash = float(row[0])
+            cur.execute("""
+                SELECT asset_id, symbol, SUM(CASE WHEN type = 'BUY' THEN quantity ELSE -quantity END)
+                FROM portfolio_ledger(%s)
+                WHERE date <= %s
+                GROUP BY asset_id, symbol
+            """, (portfolio_id, date))
+            held = {}
+            for aid, sym, qty in cur.fetchall():
+                held[aid] = held.get(aid, 0.0) + float(qty)
+                symbols.setdefault(aid, sym)
+    except Exception as e:
+        return {"error": str(e)}
+
+    asset_ids = sorted(set(weights_by_id) | {aid for aid, q in held.items() if q > 1e-12})
+    prices = get_prices(asset_ids, date)
+    missing = [aid for aid in asset_ids if not prices.get(aid)]
+    if missing:
+        return {"error": f"Price not available on {date} for: {', '.join(symbols[aid] for aid in missing)}"}
+
+    units = np.array([max(held.get(aid, 0.0), 0.0) for aid in asset_ids])
+    price_vec = np.array([prices[aid] for aid in asset_ids])
+    weights = np.array([weights_by_id.get(aid, 0.0) for aid in asset_ids])
+    delta = rebalance_trades(units, price_vec, weights, cash, fractional, min_trade)
+
+    total = float(cash + units @ price_vec)
+    orders = [{
+        "symbol": symbols[asset_ids[j]],
+        "side": "BUY" if delta[j] > 0 else "SELL",
+        "quantity": float(abs(delta[j]))
+    } for j in np.flatnonzero(delta)]
+    summary = {
+        "total_value": total,
+        "current_weights": {symbols[aid]: float(v) for aid, v in zip(asset_ids, units * price_vec / total)} if total > 0 else {},
+        "target_weights": {symbols[aid]: float(w) for aid, w in zip(asset_ids, weights)}
+    }
+    if not orders:
+        return {"status": "dry_run" if dry_run else "success", "date": date, "orders": [], "new_balance": cash, **summary}
+
+    result = execute_orders(portfolio_id, orders, date, dry_run=dry_run)
+    if "error" in result:
+        return result
+    return {**result, **summary}
+
 def get_portfolio_value(portfolio_id: int, date: str):
     """
     Computes total portfolio value (Cash + Asset Value) on a specific date.
@@ -178,8 +375,8 @@ def get_portfolio_value(portfolio_id: int, date: str):
             # 2. Get Transactions with asset_id
             cur.execute("""
                 SELECT type, quantity, price_per_unit, symbol, asset_id
-                FROM transactions 
-                WHERE portfolio_id = %s AND date <= %s
+                FROM portfolio_ledger(%s)
+                WHERE date <= %s
                 ORDER BY date ASC, id ASC
             """, (portfolio_id, date))
             
@@ -233,10 +430,12 @@ def get_portfolio_value(portfolio_id: int, date: str):
             total_invested_value_usd = 0.0
             missing_prices = []
             detailed_holdings = []
+            asset_meta = get_symbol_map()
             
             for aid, qty in hist_holdings.items():
                 if qty > 0:
                     sym = symbol_map[aid]
+                    meta = asset_meta.get(sym.upper(), {})
                     
                     # Invested (USD)
                     invested_usd = cost_basis_usd.get(aid, 0.0)
@@ -259,7 +458,9 @@ def get_portfolio_value(portfolio_id: int, date: str):
                             "value": val_usd,
                             "invested": invested_usd,
                             "pnl": val_usd - invested_usd,
-                            "pnl_percent": ((val_usd - invested_usd) / invested_usd * 100) if invested_usd > 0 else 0
+                            "pnl_percent": ((val_usd - invested_usd) / invested_usd * 100) if invested_usd > 0 else 0,
+                            "type": meta.get("type"),
+                            "currency": meta.get("currency")
                         })
                     else:
                         missing_prices.append(sym)
@@ -270,7 +471,9 @@ def get_portfolio_value(portfolio_id: int, date: str):
                             "value": 0.0,
                             "invested": invested_usd,
                             "pnl": -invested_usd,
-                            "pnl_percent": -100.0
+                            "pnl_percent": -100.0,
+                            "type": meta.get("type"),
+                            "currency": meta.get("currency")
                         })
             
             return {
@@ -280,9 +483,117 @@ def get_portfolio_value(portfolio_id: int, date: str):
                 "invested_value": total_invested_value_usd,
                 "total_value": cash_usd + total_assets_value_usd,
                 "holdings": detailed_holdings,
-                "missing_prices": missing_prices
+                "missing_prices": missing_prices,
+                **allocation_breakdown(detailed_holdings, cash_usd)
             }
             
     except Exception as e:
         print(f"Error in get_portfolio_value: {e}")
         return None
+
+def allocation_breakdown(holdings, cash: float):
+    """
+    Groups valued holdings (each tagged with its asset "type" and
+    "currency") by type and by currency in one pass, with cash as its own
+    "cash" type in USD. Percentages are of total value. Concentration is
+    measured on invested value only: HHI (sum of squared weights), the
+    effective number of positions (1 / HHI) and the largest position.
+    """
+    total = cash
+    by_type, by_currency = {}, {}
+    top_symbol, top_value, squares = None, 0.0, 0.0
+    for h in holdings:
+        value = h["value"]
+        total += value
+        for groups, key in ((by_type, h.get("type") or "unknown"), (by_currency, (h.get("currency") or "unknown").upper())):
+            group = groups.setdefault(key, {"value": 0.0, "count": 0})
+            group["value"] += value
+            group["count"] += 1
+        squares += value * value
+        if value > top_value:
+            top_symbol, top_value = h["symbol"], value
+    if cash > 0:
+        by_type["cash"] = {"value": cash, "count": 0}
+        by_currency.setdefault("USD", {"value": 0.0, "count": 0})["value"] += cash
+
+    for groups in (by_type, by_currency):
+        for group in groups.values():
+            group["percent"] = group["value"] / total * 100 if total > 0 else 0.0
+
+    invested = total - cash
+    hhi = squares / (invested * invested) if invested > 0 else 0.0
+    return {
+        "allocation": {"by_type": by_type, "by_currency": by_currency},
+        "concentration": {
+            "hhi": hhi,
+            "effective_positions": 1.0 / hhi if hhi > 0 else 0.0,
+            "top_symbol": top_symbol,
+            "top_percent": top_value / invested * 100 if invested > 0 else 0.0
+        }
+    }
+
+def bulk_portfolio_values(cur, portfolio_ids, date):
+    """
+    Values many portfolios with three queries: cash, net positions per
+    (portfolio, asset), and one as-of price vector for every (asset, date)
+    pair held by any of them. Runs on the caller's cursor.
+    date: one date for all portfolios, or { portfolio_id: date } to value
+    each at its own date (e.g. its session's sim_date).
+    Returns { portfolio_id: {"cash", "assets_value", "total_value"} } in USD.
+    """
+    portfolio_ids = list(portfolio_ids)
+    if not portfolio_ids:
+        return {}
+    dates = [str(date[pid]) for pid in portfolio_ids] if isinstance(date, dict) else [str(date)] * len(portfolio_ids)
+    cur.execute("SELECT id, cash_balance FROM portfolios WHERE id = ANY(%s)", (portfolio_ids,))
+    cash = {pid: float(c) for pid, c in cur.fetchall()}
+
+    cur.execute("""
+        SELECT v.id, t.asset_id, v.d, SUM(CASE WHEN t.type = 'BUY' THEN t.quantity ELSE -t.quantity END)
+        FROM unnest(%s::int[], %s::date[]) AS v(id, d)
+        CROSS JOIN LATERAL portfolio_ledger(v.id) t
+        WHERE t.date <= v.d
+        GROUP BY v.id, t.asset_id, v.d
+        HAVING SUM(CASE WHEN t.type = 'BUY' THEN t.quantity ELSE -t.quantity END) > 0
+    """, (portfolio_ids, dates))
+    positions = cur.fetchall()
+
+    assets_value = {}
+    if positions:
+        pairs = sorted({(aid, d) for _, aid, d, _ in positions})
+        query = """
+            SELECT k.asset_id, k.d, p.adj_close
+            FROM unnest(%s::int[], %s::date[]) AS k(asset_id, d)
+            CROSS JOIN LATERAL (
+                SELECT adj_close
+                FROM prices
+                WHERE asset_id = k.asset_id AND date <= k.d
+                ORDER BY date DESC
+                LIMIT 1
+            ) p
+        """
+        cur.execute(query, ([aid for aid, _ in pairs], [d for _, d in pairs]))
+        price_map = {(aid, d): float(p) for aid, d, p in cur.fetchall()}
+        # Pairs that miss the live table are retried on the archive view (same as get_prices)
+        missing = [pair for pair in pairs if pair not in price_map]
+        if missing and PRICE_ARCHIVE_ENABLED:
+            cur.execute(query.replace("FROM prices", "FROM prices_all"), ([aid for aid, _ in missing], [d for _, d in missing]))
+            price_map.update({(aid, d): float(p) for aid, d, p in cur.fetchall()})
+        price_vec = np.array([price_map.get(pair, 0.0) for pair in pairs])
+
+        index = {pair: i for i, pair in enumerate(pairs)}
+        pids = np.array([pid for pid, _, _, _ in positions])
+        cols = np.array([index[(aid, d)] for _, aid, d, _ in positions])
+        qty = np.array([float(q) for _, _, _, q in positions])
+        owners, inverse = np.unique(pids, return_inverse=True)
+        sums = np.bincount(inverse, weights=qty * price_vec[cols])
+        assets_value = dict(zip(owners.tolist(), sums.tolist()))
+
+    return {
+        pid: {
+            "cash": cash[pid],
+            "assets_value": assets_value.get(pid, 0.0),
+            "total_value": cash[pid] + assets_value.get(pid, 0.0)
+        }
+        for pid in portfolio_ids if pid in cash
+    }
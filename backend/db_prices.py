@@ -1,10 +1,132 @@
+import threading
+import time
 from functools import lru_cache
 from .db_conn import get_db_connection
+from .db_aggregates import AGGREGATE_TABLES, pick_resolution
+from .price_archive import PRICE_ARCHIVE_ENABLED, PRICE_SOURCE
+
+# Cache generation. Bumped by invalidate_caches() on /reset, and by
+# get_cache_generation() when the asset/price tables have been written since
+# the last check: the nightly load (scripts/update_database_stocks.py) runs in
+# another process and cannot call invalidate_caches(). Caches that are not
+# plain lru_caches remember the generation they were built for and rebuild
+# when it moves.
+_cache_generation = 0
+
+# Write counters of the price tables, polled at most every DATA_VERSION_TTL seconds
+DATA_VERSION_TTL = 60
+_data_version = None
+_data_version_checked = None
+_data_version_lock = threading.Lock()
+
+# Process-wide symbol dictionary: { "AAPL": {id, symbol, name, type, currency} }
+_symbol_map = None
+_symbol_map_generation = -1
+_symbol_map_lock = threading.Lock()
+
+def get_data_version():
+    """
+    Cumulative inserts, updates and deletes on the asset and price tables
+    from the statistics views: changes whenever new data is loaded, without
+    scanning the tables. None if the DB is unreachable.
+    """
+    try:
+        with get_db_connection() as conn:
+            cur = conn.cursor()
+            cur.execute("""
+                SELECT COALESCE(SUM(n_tup_ins + n_tup_upd + n_tup_del), 0)
+                FROM pg_stat_user_tables
+                WHERE schemaname = 'public' AND relname IN ('assets', 'prices', 'prices_archive')
+            """)
+            return int(cur.fetchone()[0])
+    except Exception as e:
+        print(f"Error reading data version: {e}")
+        return None
+
+def get_cache_generation():
+    """
+    Current cache generation, first bumping it if the price data changed
+    since the last check (at most one check per DATA_VERSION_TTL seconds;
+    callers never wait on another thread's check).
+    """
+    global _data_version, _data_version_checked
+    now = time.monotonic()
+    due = _data_version_checked is None or now - _data_version_checked >= DATA_VERSION_TTL
+    if due and _data_version_lock.acquire(blocking=False):
+        try:
+            _data_version_checked = now
+            version = get_data_version()
+            if version is not None:
+                if _data_version is not None and version != _data_version:
+                    invalidate_caches()
+                _data_version = version
+        finally:
+            _data_version_lock.release()
+    return _cache_generation
+
+def invalidate_caches():
+    """
+    Drops every cached asset/price lookup and bumps the cache generation.
+    """
+    global _cache_generation
+    _cache_generation += 1
+    get_price.cache_clear()
+    get_asset_start_dates.cache_clear()
+    get_assets_metadata.cache_clear()
+
+def _crypto_alias(symbol: str):
+    """
+    scripts/migrate_crypto.py renames crypto assets to their Yahoo "-USD" form,
+    while older data and clients still use the bare ticker. Map one to the other.
+    """
+    if symbol.endswith("-USD"):
+        return symbol[:-4]
+    return f"{symbol}-USD"
+
+def get_symbol_map():
+    """
+    Returns the symbol dictionary, loading it once per cache generation.
+    Crypto assets are reachable under both "BTC" and "BTC-USD".
+    """
+    global _symbol_map, _symbol_map_generation
+    generation = get_cache_generation()
+    if _symbol_map is not None and _symbol_map_generation == generation:
+        return _symbol_map
+
+    with _symbol_map_lock:
+        if _symbol_map is None or _symbol_map_generation != _cache_generation:
+            generation = _cache_generation
+            assets = get_assets_metadata()
+            symbols = {a["symbol"].upper(): a for a in assets}
+            for a in assets:
+                if a.get("type") == "crypto":
+                    symbols.setdefault(_crypto_alias(a["symbol"].upper()), a)
+            # Don't pin an empty map if the DB was unreachable; retry next call.
+            if assets:
+                _symbol_map = symbols
+                _symbol_map_generation = generation
+            return symbols
+    return _symbol_map
+
+def lookup_asset(symbol: str):
+    """
+    Resolves a symbol (case-insensitive, crypto -USD variants accepted) to its
+    asset row without touching the DB. Returns None if unknown.
+    """
+    if not symbol:
+        return None
+    return get_symbol_map().get(symbol.upper())
 
 def get_asset_id(symbol: str):
     """
     Retrieves the asset ID for a given symbol.
+    Served from the symbol dictionary; falls back to the DB for assets added
+    since the dictionary was loaded.
     """
+    asset = lookup_asset(symbol)
+    if asset:
+        return asset["id"]
+
     try:
         with get_db_connection() as conn:
             cur = conn.cursor()
@@ -23,19 +145,26 @@ def get_price(symbol: str, date: str):
     Finds the latest available price on or before 'date'.
     Cached to make portfolio valuation near-instant.
     """
+    asset_id = get_asset_id(symbol)
+    if not asset_id:
+        return None
+
     try:
         with get_db_connection() as conn:
             cur = conn.cursor()
             query = """
-                SELECT p.adj_close 
-                FROM prices p
-                JOIN assets a ON p.asset_id = a.id
-                WHERE a.symbol = %s AND p.date <= %s
-                ORDER BY p.date DESC
+                SELECT adj_close 
+                FROM prices
+                WHERE asset_id = %s AND date <= %s
+                ORDER BY date DESC
                 LIMIT 1
             """
-            cur.execute(query, (symbol, date))
+            cur.execute(query, (asset_id, date))
             row = cur.fetchone()
+            if not row and PRICE_ARCHIVE_ENABLED:
+                # Date predates the hot table: look it up in the archived years
+                cur.execute(query.replace("FROM prices", "FROM prices_all"), (asset_id, date))
+                row = cur.fetchone()
             if row:
                 return float(row[0])
             return None
@@ -43,6 +172,60 @@ def get_price(symbol: str, date: str):
         print(f"Error fetching price for {symbol} on {date}: {e}")
         return None
 
+def get_prices(asset_ids, date: str):
+    """
+    As-of adjusted closes for several assets on one date with a single
+    LATERAL lookup (same semantics as get_price).
+    Returns { asset_id: price }; assets without a price are left out.
+    """
+    asset_ids = sorted(set(asset_ids))
+    if not asset_ids:
+        return {}
+    query = """
+        SELECT t.asset_id, p.adj_close
+        FROM unnest(%s::int[]) AS t(asset_id)
+        CROSS JOIN LATERAL (
+            SELECT adj_close
+            FROM prices
+            WHERE asset_id = t.asset_id AND date <= %s
+            ORDER BY date DESC
+            LIMIT 1
+        ) p
+    """
+    try:
+        with get_db_connection() as conn:
+            cur = conn.cursor()
+            cur.execute(query, (asset_ids, date))
+            prices = {aid: float(p) for aid, p in cur.fetchall()}
+            missing = [aid for aid in asset_ids if aid not in prices]
+            if missing and PRICE_ARCHIVE_ENABLED:
+                cur.execute(query.replace("FROM prices", "FROM prices_all"), (missing, date))
+                prices.update({aid: float(p) for aid, p in cur.fetchall()})
+            return prices
+    except Exception as e:
+        print(f"Error fetching prices on {date}: {e}")
+        return {}
+
+def get_last_price_date(asset_id: int):
+    """
+    Date of the newest price row for an asset (one backward index probe).
+    Used as a cheap "has new data arrived?" check by derived caches.
+    Assets whose whole history is archived are looked up in prices_all.
+    """
+    try:
+        with get_db_connection() as conn:
+            cur = conn.cursor()
+            query = "SELECT date FROM prices WHERE asset_id = %s ORDER BY date DESC LIMIT 1"
+            cur.execute(query, (asset_id,))
+            row = cur.fetchone()
+            if row is None and PRICE_ARCHIVE_ENABLED:
+                cur.execute(query.replace("FROM prices", "FROM prices_all"), (asset_id,))
+                row = cur.fetchone()
+            return str(row[0]) if row else None
+    except Exception as e:
+        print(f"Error fetching last price date for asset {asset_id}: {e}")
+        return None
+
 @lru_cache(maxsize=1)
 def get_asset_start_dates():
     """
@@ -54,7 +237,17 @@ def get_asset_start_dates():
         with get_db_connection() as conn:
             cur = conn.cursor()
             # Efficiently get the first available date for every asset
-            cur.execute("SELECT asset_id, MIN(date) FROM prices GROUP BY asset_id")
+            if PRICE_ARCHIVE_ENABLED:
+                cur.execute("""
+                    SELECT asset_id, MIN(first_date) FROM (
+                        SELECT asset_id, MIN(date) AS first_date FROM prices GROUP BY asset_id
+                        UNION ALL
+                        SELECT asset_id, MIN(first_date) FROM prices_archive GROUP BY asset_id
+                    ) d
+                    GROUP BY asset_id
+                """)
+            else:
+                cur.execute("SELECT asset_id, MIN(date) FROM prices GROUP BY asset_id")
             return {row[0]: str(row[1]) for row in cur.fetchall()}
     except Exception as e:
         print(f"Error fetching asset start dates: {e}")
@@ -103,6 +296,10 @@ def get_asset_details(symbol: str):
     """
     Returns full details for an asset (name, type, etc.)
     """
+    asset = lookup_asset(symbol)
+    if asset:
+        return {"symbol": asset["symbol"], "name": asset["name"], "type": asset["type"], "currency": asset["currency"]}
+
     try:
         with get_db_connection() as conn:
             cur = conn.cursor()
@@ -115,25 +312,66 @@ def get_asset_details(symbol: str):
         print(f"Error fetching asset details: {e}")
         return None
 
-def get_price_history(symbol: str, end_date: str):
+def get_price_history(symbol: str, end_date: str, start_date: str = None, resolution: str = "auto"):
     """
-    Returns daily price history for a symbol up to end_date.
-    Optimized to use a single query with JOIN.
+    Returns price history for a symbol up to end_date (optionally from start_date).
+
+    resolution is "daily", "weekly", "monthly" or "auto". Auto reads the
+    precomputed prices_weekly / prices_monthly tables for long ranges. Only
+    periods that closed before end_date's period come from the aggregates; the
+    current period is read day by day so nothing after end_date leaks in and
+    the last point is still the as-of price.
     """
+    asset_id = get_asset_id(symbol)
+    if not asset_id:
+        return []
+
+    if resolution == "auto":
+        first_date = start_date or get_asset_start_dates().get(asset_id)
+        resolution = pick_resolution(first_date, end_date)
+
     try:
         with get_db_connection() as conn:
             cur = conn.cursor()
-            query = """
-                SELECT p.date, p.adj_close 
-                FROM prices p
-                JOIN assets a ON p.asset_id = a.id
-                WHERE a.symbol = %s AND p.date <= %s 
-                ORDER BY p.date ASC
-            """
-            cur.execute(query, (symbol, end_date))
-            rows = cur.fetchall()
+            rows = None
+
+            if resolution in AGGREGATE_TABLES:
+                table, unit = AGGREGATE_TABLES[resolution]
+                try:
+                    cur.execute(f"""
+                        SELECT last_date, adj_close, TRUE
+                        FROM {table}
+                        WHERE asset_id = %s
+                          AND period_start >= date_trunc('{unit}', COALESCE(%s::date, '-infinity'::date))
+                          AND period_start < date_trunc('{unit}', %s::date)
+                        UNION ALL
+                        SELECT date, adj_close, FALSE
+                        FROM {PRICE_SOURCE}
+                        WHERE asset_id = %s
+                          AND date >= GREATEST(date_trunc('{unit}', %s::date)::date, COALESCE(%s::date, '-infinity'::date))
+                          AND date <= %s
+                        ORDER BY 1 ASC
+                    """, (asset_id, start_date, end_date, asset_id, end_date, start_date, end_date))
+                    rows = cur.fetchall()
+                    # Aggregates not built for this asset yet: serve daily rows instead
+                    if not any(r[2] for r in rows):
+                        rows = None
+                except Exception as e:
+                    print(f"WARNING: {table} unavailable, falling back to daily history: {e}")
+                    conn.rollback()
+                    rows = None
+
+            if rows is None:
+                cur.execute(f"""
+                    SELECT date, adj_close 
+                    FROM {PRICE_SOURCE}
+                    WHERE asset_id = %s AND date >= COALESCE(%s::date, '-infinity'::date) AND date <= %s 
+                    ORDER BY date ASC
+                """, (asset_id, start_date, end_date))
+                rows = cur.fetchall()
+
             # Return list of { date: "YYYY-MM-DD", price: 123.45 }
-            return [{"date": r[0].isoformat(), "price": float(r[1])} for r in rows]
+            return [{"date": r[0].isoformat(), "price": float(r[1])} for r in rows if r[1] is not None]
     except Exception as e:
         print(f"Error fetching history: {e}")
         return []
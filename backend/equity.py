@@ -0,0 +1,173 @@
+import numpy as np
+from datetime import date
+from .db_conn import get_db_connection
+from .price_matrix import fetch_price_rows, align_prices
+
+
+def _pg_array(values):
+    # One '{a,b,...}' literal parses far faster than psycopg2's ARRAY[x::type, ...]
+    return "{" + ",".join(map(str, values)) + "}"
+
+
+def _rows_for(axis, event_dates):
+    # Events on non-axis days (e.g. a salary on a Sunday) land on the next axis day
+    return np.searchsorted(axis, np.asarray(event_dates, dtype="datetime64[D]"), side="left")
+
+
+def equity_path(axis, price_dates, prices, start_units, trades, cash_start: float, flows):
+    """
+    Daily (total_value, cash, flow) over axis in one vectorized pass.
+
+    price_dates / prices: forward-filled (dates x assets) as-of matrix.
+    start_units: units held per asset column at the start of the window.
+    trades: (dates, columns, unit_deltas, cash_deltas) arrays of window trades.
+    flows: (dates, amounts) of external cash (salary - expenses).
+    """
+    n = len(axis)
+    if len(price_dates):
+        price_rows = np.searchsorted(price_dates, axis, side="right") - 1
+        px = np.where(price_rows[:, None] >= 0, prices[np.maximum(price_rows, 0)], np.nan)
+    else:
+        # Nothing held (or no quotes yet): an all-cash path
+        px = np.full((n, prices.shape[1]), np.nan)
+
+    t_dates, t_cols, t_units, t_cash = trades
+    unit_deltas = np.zeros((n, len(start_units)))
+    cash_deltas = np.zeros(n)
+    flow = np.zeros(n)
+    if len(t_dates):
+        rows = _rows_for(axis, t_dates)
+        np.add.at(unit_deltas, (rows, t_cols), t_units)
+        np.add.at(cash_deltas, rows, t_cash)
+    f_dates, f_amounts = flows
+    if len(f_dates):
+        np.add.at(flow, _rows_for(axis, f_dates), f_amounts)
+
+    units = np.asarray(start_units, dtype=float)[None, :] + np.cumsum(unit_deltas, axis=0)
+    cash = cash_start + np.cumsum(cash_deltas + flow)
+    total = np.nansum(units * px, axis=1) + cash
+    return total, cash, flow
+
+
+def record_equity(cur, sessions, from_date: date, to_date: date, month_starts):
+    """
+    Computes the daily value over [from_date, to_date] of every session's
+    portfolio, after advance_time has written the window's trades and cash,
+    and upserts all paths into session_equity with one INSERT. from_date is
+    re-recorded so trades made on the old sim_date are reflected.
+    sessions: [(session_id, portfolio_id, monthly_flow)]. Positions, window
+    trades and prices are each fetched once for the whole batch.
+    Returns { portfolio_id: rows_written }.
+    """
+    portfolio_ids = [pid for _, pid, _ in sessions]
+    cur.execute("SELECT id, cash_balance FROM portfolios WHERE id = ANY(%s)", (portfolio_ids,))
+    cash_end = {pid: float(c) for pid, c in cur.fetchall()}
+
+    cur.execute("""
+        SELECT v.id, t.asset_id,
+               SUM(CASE WHEN t.date <= %s THEN CASE WHEN t.type = 'BUY' THEN t.quantity ELSE -t.quantity END ELSE 0 END)
+        FROM unnest(%s::int[]) AS v(id)
+        CROSS JOIN LATERAL portfolio_ledger(v.id) t
+        GROUP BY v.id, t.asset_id
+    """, (from_date, portfolio_ids))
+    start_units = {}
+    for pid, aid, q in cur.fetchall():
+        start_units.setdefault(pid, {})[aid] = float(q)
+
+    cur.execute("""
+        SELECT v.id, t.date, t.asset_id, CASE WHEN t.type = 'BUY' THEN t.quantity ELSE -t.quantity END, t.price_per_unit
+        FROM unnest(%s::int[]) AS v(id)
+        CROSS JOIN LATERAL portfolio_ledger(v.id) t
+        WHERE t.date > %s AND t.date <= %s
+    """, (portfolio_ids, from_date, to_date))
+    window = {}
+    for pid, d, aid, q, price in cur.fetchall():
+        window.setdefault(pid, []).append((d, aid, float(q), float(price)))
+
+    start, end = np.datetime64(from_date, "D"), np.datetime64(to_date, "D")
+    all_assets = sorted({aid for units in start_units.values() for aid in units})
+    if all_assets:
+        row_assets, row_dates, row_prices = fetch_price_rows(all_assets, str(from_date), str(to_date))
+        price_dates, prices = align_prices(row_assets, row_dates, row_prices, all_assets)
+    else:
+        row_assets, row_dates = np.empty(0, dtype=np.int64), np.empty(0, dtype="datetime64[D]")
+        price_dates, prices = row_dates, np.empty((0, 0))
+    all_col = {aid: j for j, aid in enumerate(all_assets)}
+    f_dates = np.array(month_starts, dtype="datetime64[D]")
+
+    out_ids, out_dates, out_total, out_cash, out_flow = [], [], [], [], []
+    written = {}
+    for session_id, pid, monthly_flow in sessions:
+        asset_ids = sorted(start_units.get(pid, {}))
+        col = {aid: j for j, aid in enumerate(asset_ids)}
+        trades = window.get(pid, [])
+        t_dates = np.array([t[0] for t in trades], dtype="datetime64[D]")
+        t_cols = np.array([col[t[1]] for t in trades], dtype=np.int64)
+        t_units = np.array([t[2] for t in trades])
+        t_cash = -t_units * np.array([t[3] for t in trades])
+        f_amounts = np.full(len(f_dates), float(monthly_flow))
+        cash_start = cash_end.get(pid, 0.0) - t_cash.sum() - f_amounts.sum()
+
+        # Axis: this portfolio's own trading days, plus both window ends
+        traded = np.isin(row_assets, asset_ids) & (row_dates >= start)
+        axis = np.unique(np.concatenate([[start, end], row_dates[traded]]))
+        cols = [all_col[aid] for aid in asset_ids]
+
+        total, cash, flow = equity_path(
+            axis, price_dates, prices[:, cols],
+            np.array([start_units[pid][aid] for aid in asset_ids]),
+            (t_dates, t_cols, t_units, t_cash),
+            cash_start,
+            (f_dates, f_amounts),
+        )
+        out_ids.append(np.full(len(axis), session_id))
+        out_dates.append(axis)
+        out_total.append(total)
+        out_cash.append(cash)
+        out_flow.append(flow)
+        written[pid] = len(axis)
+
+    if out_ids:
+        # Column arrays through unnest: one statement, no per-row parameter rendering
+        cur.execute("""
+            INSERT INTO session_equity (session_id, date, total_value, cash, flow)
+            SELECT *
+            FROM unnest(%s::int[], %s::date[], %s::float8[], %s::float8[], %s::float8[])
+            ON CONFLICT (session_id, date) DO UPDATE
+            SET total_value = EXCLUDED.total_value, cash = EXCLUDED.cash, flow = session_equity.flow + EXCLUDED.flow
+        """, (
+            _pg_array(np.concatenate(out_ids)),
+            _pg_array(np.concatenate(out_dates)),
+            _pg_array(np.concatenate(out_total).tolist()),
+            _pg_array(np.concatenate(out_cash).tolist()),
+            _pg_array(np.concatenate(out_flow).tolist()),
+        ))
+    return written
+
+
+def get_equity(portfolio_id: int, start_date: str = None, end_date: str = None):
+    """
+    Recorded daily value path of the portfolio's active session.
+    """
+    try:
+        with get_db_connection() as conn:
+            cur = conn.cursor()
+            cur.execute("""
+                SELECT e.date, e.total_value, e.cash, e.flow
+                FROM session_equity e
+                JOIN game_sessions s ON s.id = e.session_id
+                WHERE s.portfolio_id = %s AND s.is_active = TRUE
+                  AND (%s::date IS NULL OR e.date >= %s::date)
+                  AND (%s::date IS NULL OR e.date <= %s::date)
+                ORDER BY e.date
+            """, (portfolio_id, start_date, start_date, end_date, end_date))
+            rows = cur.fetchall()
+            return {
+                "dates": [str(r[0]) for r in rows],
+                "total_value": [r[1] for r in rows],
+                "cash": [r[2] for r in rows],
+                "flow": [r[3] for r in rows]
+            }
+    except Exception as e:
+        print(f"Error fetching session equity: {e}")
+        return None
@@ -0,0 +1,147 @@
+from datetime import datetime
+from .db_conn import get_db_connection
+
+
+def take_snapshots(cur, session_ids, sim_date):
+    """
+    Records cash, contributions and net positions of each session's
+    portfolio at sim_date, inside the caller's transaction, with one
+    INSERT ... SELECT over the sessions' ledgers.
+    """
+    cur.execute("""
+        INSERT INTO session_snapshots (session_id, sim_date, cash, contributed, txn_watermark, asset_ids, quantities)
+        SELECT s.id, %s, p.cash_balance, s.contributed, COALESCE(l.watermark, 0),
+               COALESCE(l.asset_ids, '{}'), COALESCE(l.quantities, '{}')
+        FROM game_sessions s
+        JOIN portfolios p ON p.id = s.portfolio_id
+        LEFT JOIN LATERAL (
+            SELECT MAX(max_id) AS watermark,
+                   array_agg(asset_id ORDER BY asset_id) FILTER (WHERE qty > 0) AS asset_ids,
+                   array_agg(qty ORDER BY asset_id) FILTER (WHERE qty > 0) AS quantities
+            FROM (
+                SELECT asset_id, MAX(id) AS max_id,
+                       SUM(CASE WHEN type = 'BUY' THEN quantity ELSE -quantity END)::float8 AS qty
+                FROM portfolio_ledger(s.portfolio_id)
+                GROUP BY asset_id
+            ) positions
+        ) l ON TRUE
+        WHERE s.id = ANY(%s)
+        ON CONFLICT (session_id, sim_date) DO UPDATE
+        SET cash = EXCLUDED.cash, contributed = EXCLUDED.contributed, txn_watermark = EXCLUDED.txn_watermark,
+            asset_ids = EXCLUDED.asset_ids, quantities = EXCLUDED.quantities
+    """, (sim_date, list(session_ids)))
+
+
+def list_snapshots(portfolio_id: int):
+    try:
+        with get_db_connection() as conn:
+            cur = conn.cursor()
+            cur.execute("""
+                SELECT n.sim_date, n.cash, n.contributed, cardinality(n.asset_ids)
+                FROM session_snapshots n
+                JOIN game_sessions s ON s.id = n.session_id
+                WHERE s.portfolio_id = %s AND s.is_active = TRUE
+                ORDER BY n.sim_date
+            """, (portfolio_id,))
+            return [{
+                "sim_date": str(r[0]),
+                "cash": float(r[1]),
+                "contributed": float(r[2]),
+                "positions": r[3]
+            } for r in cur.fetchall()]
+    except Exception:
+        return []
+
+
+def fork_session(portfolio_id: int, sim_date: str, name: str = None):
+    """
+    Branches the portfolio's active session at a past sim_date into a new
+    portfolio and session. Nothing is copied from the ledger: the fork
+    points at the parent (parent_portfolio_id, fork_txn_id, fork_date) and
+    portfolio_ledger() reads the parent's rows up to that point. Cash,
+    contributions and the auto-invest plan come from the snapshot taken
+    when the session arrived at sim_date. The parent is left untouched.
+    """
+    try:
+        fork_date = datetime.strptime(sim_date, "%Y-%m-%d").date()
+    except ValueError:
+        return {"error": "Invalid date format. Use YYYY-MM-DD"}
+
+    try:
+        with get_db_connection() as conn:
+            cur = conn.cursor()
+            cur.execute("""
+                SELECT s.id, s.user_id, s.start_date, s.monthly_salary, s.monthly_expenses, p.name, p.currency_code
+                FROM game_sessions s
+                JOIN portfolios p ON p.id = s.portfolio_id
+                WHERE s.portfolio_id = %s AND s.is_active = TRUE
+            """, (portfolio_id,))
+            session = cur.fetchone()
+            if not session:
+                return {"error": "No active session found for this portfolio"}
+            session_id, user_id, start_date, salary, expenses, parent_name, currency = session
+
+            cur.execute("""
+                SELECT cash, contributed, txn_watermark, asset_ids, quantities
+                FROM session_snapshots
+                WHERE session_id = %s AND sim_date = %s
+            """, (session_id, fork_date))
+            snap = cur.fetchone()
+            if not snap:
+                return {"error": f"No snapshot at {sim_date}. Fork at a date this session has been at (see /simulation/snapshots), or fork the parent portfolio."}
+            cash, contributed, watermark, asset_ids, quantities = snap
+
+            # Portfolio names are unique per user: repeated forks at one date get a counter
+            base = name or f"{parent_name} @ {sim_date}"
+            cur.execute("""
+                SELECT name FROM portfolios
+                WHERE user_id = %s AND starts_with(name, %s)
+            """, (user_id, base))
+            taken = {r[0] for r in cur.fetchall()}
+            if name and name in taken:
+                return {"error": f"A portfolio named '{name}' already exists"}
+            fork_name, n = base, 1
+            while fork_name in taken:
+                n += 1
+                fork_name = f"{base} ({n})"
+
+            cur.execute("""
+                INSERT INTO portfolios (user_id, name, currency_code, cash_balance, parent_portfolio_id, fork_txn_id, fork_date)
+                VALUES (%s, %s, %s, %s, %s, %s, %s)
+                RETURNING id
+            """, (user_id, fork_name, currency, cash, portfolio_id, watermark, fork_date))
+            fork_id = cur.fetchone()[0]
+
+            cur.execute("""
+                INSERT INTO game_sessions (user_id, portfolio_id, start_date, sim_date, monthly_salary, monthly_expenses, contributed, is_active)
+                VALUES (%s, %s, %s, %s, %s, %s, %s, TRUE)
+                RETURNING id
+            """, (user_id, fork_id, start_date, fork_date, salary, expenses, contributed))
+            fork_session_id = cur.fetchone()[0]
+
+            cur.execute("""
+                INSERT INTO auto_invest_plans (session_id, asset_id, symbol, weight)
+                SELECT %s, asset_id, symbol, weight FROM auto_invest_plans WHERE session_id = %s
+            """, (fork_session_id, session_id))
+            # The fork starts at its own snapshot so it can be forked again at sim_date
+            cur.execute("""
+                INSERT INTO session_snapshots (session_id, sim_date, cash, contributed, txn_watermark, asset_ids, quantities)
+                SELECT %s, sim_date, cash, contributed, txn_watermark, asset_ids, quantities
+                FROM session_snapshots WHERE session_id = %s AND sim_date = %s
+            """, (fork_session_id, session_id, fork_date))
+
+            cur.execute("SELECT id, symbol FROM assets WHERE id = ANY(%s)", (asset_ids,))
+            symbols = dict(cur.fetchall())
+            conn.commit()
+            return {
+                "status": "success",
+                "portfolio_id": fork_id,
+                "session_id": fork_session_id,
+                "parent_portfolio_id": portfolio_id,
+                "name": fork_name,
+                "sim_date": sim_date,
+                "cash": float(cash),
+                "holdings": {symbols.get(aid, str(aid)): q for aid, q in zip(asset_ids, quantities)}
+            }
+    except Exception as e:
+        return {"error": str(e)}
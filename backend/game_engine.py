@@ -1,6 +1,10 @@
 from datetime import datetime, date
 from dateutil.relativedelta import relativedelta
 from .db_conn import get_db_connection
+from . import auto_invest
+from . import db_orders
+from . import equity
+from . import forks
 
 from .db_currency import get_rate
 
@@ -40,10 +44,10 @@ def create_session(user_id: int, portfolio_id: int, start_date: str, monthly_sal
             # Create session
             cur.execute("""
                 INSERT INTO game_sessions 
-                (user_id, portfolio_id, start_date, sim_date, monthly_salary, monthly_expenses, is_active)
-                VALUES (%s, %s, %s, %s, %s, %s, TRUE)
+                (user_id, portfolio_id, start_date, sim_date, monthly_salary, monthly_expenses, contributed, is_active)
+                VALUES (%s, %s, %s, %s, %s, %s, %s, TRUE)
                 RETURNING id
-            """, (user_id, portfolio_id, s_date, s_date, usd_salary, usd_expenses))
+            """, (user_id, portfolio_id, s_date, s_date, usd_salary, usd_expenses, float(usd_cash)))
             
             row = cur.fetchone()
             if not row:
@@ -59,6 +63,8 @@ def create_session(user_id: int, portfolio_id: int, start_date: str, monthly_sal
                 conn.rollback()
                 return {"error": "Portfolio not found"}
 
+            forks.take_snapshots(cur, [session_id], s_date)
+
             conn.commit()
             return {"session_id": session_id, "start_date": start_date, "sim_date": start_date}
 
@@ -140,6 +146,68 @@ def update_monthly_investment(portfolio_id: int, new_amount: float):
     except Exception as e:
         return {"error": str(e)}
 
+def advance_sessions(cur, sessions, from_date: date, to_date: date):
+    """
+    Moves sessions that are all at from_date to to_date inside the caller's
+    transaction. sessions: [(session_id, portfolio_id, net_monthly)].
+    Auto-invest, conditional orders, salary and equity are each applied to
+    the whole batch with set-based statements.
+    Returns { portfolio_id: summary dict }.
+    """
+    month_starts = auto_invest.crossed_month_starts(from_date, to_date)
+    months_passed = len(month_starts)
+
+    # Auto-invest: buy the plans at each crossed month start (batched)
+    invested = auto_invest.execute_plans(cur, sessions, month_starts)
+
+    # Conditional orders: first trigger crossing in (from_date, to_date],
+    # before salary reaches cash_balance so each fill sees the cash and
+    # holdings of its own date (salary credited so far, auto-invest buys
+    # made so far). One quote matrix serves every portfolio in the batch.
+    net_monthly = {pid: net for _, pid, net in sessions}
+    with_orders, quotes = db_orders.load_order_quotes(cur, list(net_monthly), from_date, to_date)
+    orders = {
+        pid: db_orders.execute_triggered_orders(cur, pid, from_date, to_date, [(d, net_monthly[pid]) for d in month_starts], quotes)
+        for pid in with_orders
+    }
+
+    # Salary - expenses - auto-invest spend, for every portfolio in one UPDATE
+    cash_change = {pid: net * months_passed - invested.get(pid, (0.0, 0))[0] for _, pid, net in sessions}
+    changed = [(pid, delta) for pid, delta in cash_change.items() if delta != 0]
+    if changed:
+        cur.execute("""
+            UPDATE portfolios p
+            SET cash_balance = p.cash_balance + v.delta
+            FROM unnest(%s::int[], %s::float8[]) AS v(id, delta)
+            WHERE p.id = v.id
+        """, ([pid for pid, _ in changed], [delta for _, delta in changed]))
+
+    # Daily value paths over the window, now that all cash and trades are written
+    equity_days = equity.record_equity(cur, sessions, from_date, to_date, month_starts)
+
+    cur.execute("""
+        UPDATE game_sessions s
+        SET sim_date = %s, contributed = s.contributed + v.income
+        FROM unnest(%s::int[], %s::float8[]) AS v(id, income)
+        WHERE s.id = v.id
+    """, (to_date, [sid for sid, _, _ in sessions], [net * months_passed for _, _, net in sessions]))
+    forks.take_snapshots(cur, [sid for sid, _, _ in sessions], to_date)
+
+    summary = {}
+    for _, pid, _ in sessions:
+        spent, buys = invested.get(pid, (0.0, 0))
+        filled = orders.get(pid, {"filled": 0, "rejected": 0})
+        summary[pid] = {
+            "months_passed": months_passed,
+            "cash_added": cash_change[pid],
+            "auto_invested": spent,
+            "auto_buys": buys,
+            "orders_filled": filled["filled"],
+            "orders_rejected": filled["rejected"],
+            "equity_days": equity_days.get(pid, 0)
+        }
+    return summary
+
 def advance_time(portfolio_id: int, target_date: str):
     """
     Moves the simulation forward to target_date.
@@ -173,42 +241,18 @@ def advance_time(portfolio_id: int, target_date: str):
             # Validation: Cannot go back
             if target_date_obj <= current_sim_date_obj:
                 return {"error": f"Cannot time travel backwards or stay same. Current: {current_sim_date}, Target: {target_date}"}
-                
-            # Calculate months passed
-            # Simple logic: (YearDiff * 12) + MonthDiff
-            # Example: Jan 15 -> Feb 14. (2-1) = 1 month.
-            months_passed = (target_date_obj.year - current_sim_date_obj.year) * 12 + (target_date_obj.month - current_sim_date_obj.month)
-            
-            # Avoid negative months logic (though date check covers it)
-            months_passed = max(0, months_passed)
-            
+
             net_monthly = float(salary) - float(expenses)
-            total_cash_change = net_monthly * months_passed
-            
-            # Update Portfolio Cash
-            if total_cash_change != 0:
-                cur.execute("""
-                    UPDATE portfolios 
-                    SET cash_balance = cash_balance + %s 
-                    WHERE id = %s
-                """, (total_cash_change, portfolio_id))
-                
-            # Update Session Date
-            cur.execute("""
-                UPDATE game_sessions 
-                SET sim_date = %s 
-                WHERE id = %s
-            """, (target_date_obj, session_id))
-            
+            summary = advance_sessions(cur, [(session_id, portfolio_id, net_monthly)], current_sim_date_obj, target_date_obj)
+
             conn.commit()
             
             return {
                 "status": "success",
                 "previous_date": str(current_sim_date_obj),
                 "new_date": str(target_date_obj),
-                "months_passed": months_passed,
-                "cash_added": total_cash_change
+                **summary[portfolio_id]
             }
             
     except Exception as e:
-        return {"error": str(e)}
\ No newline at end of file
+        return {"error": str(e)}
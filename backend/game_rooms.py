@@ -0,0 +1,140 @@
+from datetime import datetime
+from .db_conn import get_db_connection
+from .db_portfolio import bulk_portfolio_values
+from .game_engine import advance_sessions
+
+
+def create_room(name: str, start_date: str):
+    try:
+        datetime.strptime(start_date, "%Y-%m-%d")
+    except ValueError:
+        return {"error": "Invalid date format. Use YYYY-MM-DD"}
+    try:
+        with get_db_connection() as conn:
+            cur = conn.cursor()
+            cur.execute("INSERT INTO game_rooms (name, sim_date) VALUES (%s, %s) RETURNING id", (name, start_date))
+            room_id = cur.fetchone()[0]
+            conn.commit()
+            return {"room_id": room_id, "name": name, "sim_date": start_date}
+    except Exception as e:
+        return {"error": str(e)}
+
+
+def join_room(room_id: int, portfolio_id: int):
+    """
+    Adds the portfolio's active session to a room. Rooms move in lockstep,
+    so the session must be at the room's sim_date.
+    """
+    try:
+        with get_db_connection() as conn:
+            cur = conn.cursor()
+            cur.execute("SELECT sim_date FROM game_rooms WHERE id = %s", (room_id,))
+            room = cur.fetchone()
+            if not room:
+                return {"error": "Room not found"}
+
+            cur.execute("SELECT id, sim_date FROM game_sessions WHERE portfolio_id = %s AND is_active = TRUE", (portfolio_id,))
+            session = cur.fetchone()
+            if not session:
+                return {"error": "No active session found for this portfolio"}
+            if session[1] != room[0]:
+                return {"error": f"Session is at {session[1]}, room is at {room[0]}. Start a session on the room's date to join."}
+
+            cur.execute("""
+                INSERT INTO game_room_members (room_id, session_id) VALUES (%s, %s)
+                ON CONFLICT DO NOTHING
+            """, (room_id, session[0]))
+            conn.commit()
+            return {"status": "success", "room_id": room_id, "session_id": session[0]}
+    except Exception as e:
+        return {"error": str(e)}
+
+
+def _member_rows(cur, room_id: int, lock: bool = False):
+    cur.execute(f"""
+        SELECT s.id, s.portfolio_id, s.sim_date, s.monthly_salary - s.monthly_expenses, u.username
+        FROM game_room_members m
+        JOIN game_sessions s ON s.id = m.session_id
+        LEFT JOIN users u ON u.id = s.user_id
+        WHERE m.room_id = %s AND s.is_active = TRUE
+        ORDER BY s.id
+        {"FOR UPDATE OF s" if lock else ""}
+    """, (room_id,))
+    return cur.fetchall()
+
+
+def _standings(cur, members, date):
+    values = bulk_portfolio_values(cur, [pid for _, pid, _, _, _ in members], str(date))
+    rows = [{
+        "session_id": sid,
+        "portfolio_id": pid,
+        "username": username,
+        **values.get(pid, {"cash": 0.0, "assets_value": 0.0, "total_value": 0.0})
+    } for sid, pid, _, _, username in members]
+    rows.sort(key=lambda r: r["total_value"], reverse=True)
+    return rows
+
+
+def get_room(room_id: int):
+    try:
+        with get_db_connection() as conn:
+            cur = conn.cursor()
+            cur.execute("SELECT name, sim_date FROM game_rooms WHERE id = %s", (room_id,))
+            room = cur.fetchone()
+            if not room:
+                return {"error": "Room not found"}
+            members = _member_rows(cur, room_id)
+            return {
+                "room_id": room_id,
+                "name": room[0],
+                "sim_date": str(room[1]),
+                "standings": _standings(cur, members, room[1])
+            }
+    except Exception as e:
+        return {"error": str(e)}
+
+
+def advance_room(room_id: int, target_date: str):
+    """
+    Moves every member session of the room to target_date in one
+    transaction, using the same batched steps as advance_time, and returns
+    the standings valued at the new date.
+    Members that left lockstep (advanced on their own) are skipped.
+    """
+    try:
+        target = datetime.strptime(target_date, "%Y-%m-%d").date()
+    except ValueError:
+        return {"error": "Invalid date format"}
+
+    try:
+        with get_db_connection() as conn:
+            cur = conn.cursor()
+            cur.execute("SELECT sim_date FROM game_rooms WHERE id = %s FOR UPDATE", (room_id,))
+            room = cur.fetchone()
+            if not room:
+                return {"error": "Room not found"}
+            current = room[0]
+            if target <= current:
+                return {"error": f"Cannot time travel backwards or stay same. Current: {current}, Target: {target_date}"}
+
+            members = _member_rows(cur, room_id, lock=True)
+            in_step = [m for m in members if m[2] == current]
+            skipped = [m[1] for m in members if m[2] != current]
+
+            if in_step:
+                advance_sessions(cur, [(sid, pid, float(net)) for sid, pid, _, net, _ in in_step], current, target)
+            cur.execute("UPDATE game_rooms SET sim_date = %s WHERE id = %s", (target, room_id))
+            standings = _standings(cur, in_step, target)
+            conn.commit()
+
+            return {
+                "status": "success",
+                "room_id": room_id,
+                "previous_date": str(current),
+                "new_date": str(target),
+                "advanced": len(in_step),
+                "skipped_portfolios": skipped,
+                "standings": standings
+            }
+    except Exception as e:
+        return {"error": str(e)}
@@ -0,0 +1,287 @@
+import threading
+import numpy as np
+from collections import OrderedDict
+from datetime import datetime
+from .db_conn import get_db_connection
+from .db_prices import get_asset_id, get_cache_generation
+from .metrics import rolling_mean
+from .price_archive import PRICE_SOURCE
+from .price_matrix import to_json_column
+
+MAX_SERIES = 256
+MAX_INDICATORS = 10
+MAX_PERIOD = 1000
+
+_lock = threading.Lock()
+_series = OrderedDict()  # asset_id -> _Series, LRU order
+
+
+def ewm(values, alpha: float, last: float = np.nan):
+    """
+    Exponential smoothing y_t = alpha * x_t + (1 - alpha) * y_{t-1}, continuing
+    from `last` (or starting at x_0 when last is NaN). Vectorized in blocks:
+    inside a block y_t = d^(t+1) * (y_prev + alpha * cumsum(x_s / d^(s+1))),
+    with d = 1 - alpha and blocks short enough that d^-block stays finite.
+    """
+    values = np.asarray(values, dtype=float)
+    decay = 1.0 - alpha
+    if decay <= 0 or len(values) == 0:
+        return values.copy()
+    if np.isnan(last):
+        last = values[0]
+    block = max(1, int(230.0 / -np.log(decay)))  # d^-block <= 1e100
+    out = np.empty(len(values))
+    for i in range(0, len(values), block):
+        x = values[i:i + block]
+        powers = decay ** np.arange(1, len(x) + 1)
+        y = powers * (last + alpha * np.cumsum(x / powers))
+        out[i:i + len(x)] = y
+        last = y[-1]
+    return out
+
+
+def _window(closes, carry, n):
+    """
+    closes prefixed with the previous n - 1 closes kept in carry.
+    """
+    tail = carry if carry is not None else np.empty(0)
+    return np.concatenate([tail, closes]), len(tail)
+
+
+def _ema_step(closes, carry, alpha, warmup):
+    """
+    ewm over new closes continuing from carry (last value, values seen);
+    NaN for the first `warmup` values of the whole series.
+    """
+    last, seen = carry if carry is not None else (np.nan, 0)
+    out = ewm(closes, alpha, last)
+    carry = (out[-1], seen + len(closes)) if len(closes) else (last, seen)
+    out = np.where(seen + np.arange(len(closes)) < warmup, np.nan, out)
+    return out, carry
+
+
+def sma(closes, carry, n: int):
+    x, skip = _window(closes, carry, n)
+    return {"value": rolling_mean(x, n)[skip:]}, x[-(n - 1):] if n > 1 else np.empty(0)
+
+
+def ema(closes, carry, n: int):
+    out, carry = _ema_step(closes, carry, 2.0 / (n + 1), n - 1)
+    return {"value": out}, carry
+
+
+def rsi(closes, carry, n: int):
+    """
+    Wilder's RSI: gains and losses smoothed with alpha = 1 / n.
+    carry: (last close, gain state, loss state).
+    """
+    prev, gain_carry, loss_carry = carry if carry is not None else (np.nan, None, None)
+    change = np.diff(np.concatenate([[prev], closes]))
+    if np.isnan(prev) and len(change):
+        # The first close has no change: it only seeds the next one
+        change, head = change[1:], 1
+    else:
+        head = 0
+    gain, gain_carry = _ema_step(np.maximum(change, 0.0), gain_carry, 1.0 / n, n - 1)
+    loss, loss_carry = _ema_step(np.maximum(-change, 0.0), loss_carry, 1.0 / n, n - 1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        value = np.where(loss > 0, 100.0 - 100.0 / (1.0 + gain / loss), np.where(gain > 0, 100.0, 50.0))
+    value = np.concatenate([np.full(head, np.nan), np.where(np.isnan(gain), np.nan, value)])
+    last = closes[-1] if len(closes) else prev
+    return {"value": value}, (last, gain_carry, loss_carry)
+
+
+def macd(closes, carry, fast: int, slow: int, signal: int):
+    fast_carry, slow_carry, signal_carry = carry if carry is not None else (None, None, None)
+    fast_ema, fast_carry = _ema_step(closes, fast_carry, 2.0 / (fast + 1), fast - 1)
+    slow_ema, slow_carry = _ema_step(closes, slow_carry, 2.0 / (slow + 1), slow - 1)
+    line = fast_ema - slow_ema
+    # The signal line starts once the slow EMA is defined
+    valid = ~np.isnan(line)
+    signal_line = np.full(len(line), np.nan)
+    signal_line[valid], signal_carry = _ema_step(line[valid], signal_carry, 2.0 / (signal + 1), signal - 1)
+    return {"macd": line, "signal": signal_line, "histogram": line - signal_line}, (fast_carry, slow_carry, signal_carry)
+
+
+def bollinger(closes, carry, n: int, k: float = 2.0):
+    x, skip = _window(closes, carry, n)
+    middle = rolling_mean(x, n)
+    std = np.full(len(x), np.nan)
+    if len(x) >= n:
+        std[n - 1:] = np.lib.stride_tricks.sliding_window_view(x, n).std(axis=1)
+    middle, std = middle[skip:], std[skip:]
+    return {"middle": middle, "upper": middle + k * std, "lower": middle - k * std}, x[-(n - 1):] if n > 1 else np.empty(0)
+
+
+# name -> (function, default parameters); parameters after the name are colon separated
+INDICATORS = {
+    "sma": (sma, (20,)),
+    "ema": (ema, (20,)),
+    "rsi": (rsi, (14,)),
+    "macd": (macd, (12, 26, 9)),
+    "bb": (bollinger, (20, 2.0)),
+}
+
+
+def parse_indicators(spec: str):
+    """
+    "sma:50,rsi:14,macd,bb:20:2" -> [(key, name, params)], defaults filled in.
+    """
+    parsed = []
+    for item in [s.strip().lower() for s in (spec or "").split(",") if s.strip()]:
+        name, *args = item.split(":")
+        if name not in INDICATORS:
+            return {"error": f"Unknown indicator '{name}'. Use one of: {', '.join(INDICATORS)}"}
+        defaults = INDICATORS[name][1]
+        if len(args) > len(defaults):
+            return {"error": f"{name} takes at most {len(defaults)} parameters"}
+        try:
+            params = tuple(type(d)(a) for d, a in zip(defaults, args)) + defaults[len(args):]
+        except ValueError:
+            return {"error": f"Invalid parameters for {name}: {item}"}
+        periods = [p for p in params if isinstance(p, int)]
+        if any(not 0 < p <= MAX_PERIOD for p in periods) or any(p <= 0 for p in params):
+            return {"error": f"Indicator periods must be between 1 and {MAX_PERIOD}"}
+        key = ":".join([name] + [f"{p:g}" for p in params])
+        if key not in [p[0] for p in parsed]:
+            parsed.append((key, name, params))
+    if not parsed:
+        return {"error": "At least one indicator is required"}
+    if len(parsed) > MAX_INDICATORS:
+        return {"error": f"At most {MAX_INDICATORS} indicators per request"}
+    return parsed
+
+
+class _Series:
+    """
+    One symbol's daily closes loaded so far plus every indicator computed
+    on them, each with the carry needed to extend it by new closes.
+    """
+    def __init__(self, generation):
+        self.generation = generation
+        self.dates = np.empty(0, dtype="datetime64[D]")
+        self.closes = np.empty(0)
+        self.results = {}  # key -> (name, params, outputs, carry)
+
+    def extend(self, dates, closes):
+        self.dates = np.concatenate([self.dates, dates])
+        self.closes = np.concatenate([self.closes, closes])
+        for key, (name, params, outputs, carry) in self.results.items():
+            new, carry = INDICATORS[name][0](closes, carry, *params)
+            self.results[key] = (name, params, {k: np.concatenate([outputs[k], new[k]]) for k in outputs}, carry)
+
+    def get(self, key, name, params):
+        if key not in self.results:
+            self.results[key] = (name, params, *INDICATORS[name][0](self.closes, None, *params))
+        return self.results[key][2]
+
+
+def _fetch_closes(asset_id: int, after, end: str):
+    with get_db_connection() as conn:
+        cur = conn.cursor()
+        cur.execute(f"""
+            SELECT date, adj_close
+            FROM {PRICE_SOURCE}
+            WHERE asset_id = %s AND date > COALESCE(%s::date, '-infinity'::date) AND date <= %s
+              AND adj_close IS NOT NULL
+            ORDER BY date
+        """, (asset_id, after, end))
+        rows = cur.fetchall()
+    if not rows:
+        return np.empty(0, dtype="datetime64[D]"), np.empty(0)
+    dates, closes = zip(*rows)
+    return np.array(dates, dtype="datetime64[D]"), np.array(closes, dtype=float)
+
+
+def _cached_series(asset_id: int, generation):
+    series = _series.get(asset_id)
+    return series if series is not None and series.generation == generation else None
+
+
+def _load_series(asset_id: int, end: str):
+    """
+    Cached series for asset_id covering end. Indicators are causal, so a
+    series loaded to a later date serves earlier ends by slicing; an end
+    past the last loaded close fetches only the rows after it (picking up
+    prices ingested since) and extends every cached indicator. The lock
+    only guards the cache: the query runs outside it and its rows are
+    merged under it. Callers read the series under the lock.
+    """
+    generation = get_cache_generation()
+    while True:
+        with _lock:
+            series = _cached_series(asset_id, generation)
+            after = series.dates[-1] if series is not None and len(series.dates) else None
+            if after is not None and np.datetime64(end, "D") <= after:
+                _series.move_to_end(asset_id)
+                return series
+
+        dates, closes = _fetch_closes(asset_id, str(after) if after is not None else None, end)
+
+        with _lock:
+            current = _cached_series(asset_id, generation)
+            last = current.dates[-1] if current is not None and len(current.dates) else None
+            # The rows start after `after`: they only fit a series reaching it.
+            # Another request replaced the series meanwhile; load again.
+            if after is not None and (last is None or last < after):
+                continue
+            if current is None:
+                current = _Series(generation)
+            keep = dates > last if last is not None else slice(None)
+            current.extend(dates[keep], closes[keep])
+            _series[asset_id] = current
+            _series.move_to_end(asset_id)
+            while len(_series) > MAX_SERIES:
+                _series.popitem(last=False)
+            return current
+
+
+def get_indicators(symbol: str, end_date: str, spec: str, start_date: str = None):
+    """
+    Daily closes of symbol up to end_date with the requested indicators
+    (e.g. "sma:50,ema:20,rsi:14,macd:12:26:9,bb:20:2"). Indicators always
+    warm up on the full history; start_date only trims the response.
+    """
+    parsed = parse_indicators(spec)
+    if isinstance(parsed, dict):
+        return parsed
+    try:
+        for d in (end_date, start_date):
+            if d:
+                datetime.strptime(d, "%Y-%m-%d")
+    except ValueError:
+        return {"error": "Invalid date format. Use YYYY-MM-DD"}
+    asset_id = get_asset_id(symbol.upper())
+    if not asset_id:
+        return {"error": f"Unknown symbol {symbol}"}
+
+    try:
+        series = _load_series(asset_id, end_date)
+        with _lock:
+            stop = np.searchsorted(series.dates, np.datetime64(end_date, "D"), side="right")
+            begin = np.searchsorted(series.dates, np.datetime64(start_date, "D")) if start_date else 0
+            begin = min(begin, stop)
+            indicators = {}
+            for key, name, params in parsed:
+                outputs = series.get(key, name, params)
+                columns = {k: to_json_column(v[begin:stop]) for k, v in outputs.items()}
+                indicators[key] = columns["value"] if list(columns) == ["value"] else columns
+            dates = [str(d) for d in series.dates[begin:stop]]
+            closes = series.closes[begin:stop].tolist()
+    except Exception as e:
+        print(f"Error computing indicators: {e}")
+        return {"error": "Failed to compute indicators"}
+
+    return {
+        "symbol": symbol.upper(),
+        "start": start_date,
+        "end": end_date,
+        "dates": dates,
+        "close": closes,
+        "indicators": indicators
+    }
+
+
+def reset():
+    with _lock:
+        _series.clear()
@@ -0,0 +1,215 @@
+import os
+import time
+import threading
+from heapq import heapify, heappop, heappush
+from .db_conn import get_db_connection
+from .db_portfolio import bulk_portfolio_values
+
+# Full revaluation interval; between rebuilds only touched portfolios are revalued
+REFRESH_SECONDS = float(os.getenv("LEADERBOARD_REFRESH_SECONDS", "300"))
+RANKINGS = ("return", "value")
+MAX_LIMIT = 1000
+
+# Boards live in process memory. Every deployment here runs a single uvicorn
+# worker (Dockerfile, docker-compose, start_dev.sh), so mark_dirty always
+# reaches the board that serves reads. With several workers each would hold
+# its own board, fresh only for the writes it handled and otherwise up to
+# REFRESH_SECONDS stale.
+#
+# _lock guards the in-memory state and is never held across a DB query;
+# _refresh_lock lets one reader at a time load fresh values (taken before
+# _lock), so reads with nothing to refresh never wait on the database.
+_lock = threading.Lock()
+_refresh_lock = threading.Lock()
+_entries = {}   # portfolio_id -> entry dict
+_boards = {}    # room_id (None = all sessions) -> _Board
+_dirty = {}     # portfolio_id -> sequence number of its latest mark
+_dirty_seq = 0
+_built_at = None
+
+
+class _Board:
+    """
+    One min-heap of keys per ranking (keys sort ascending, best first) with
+    lazy deletion: remove only drops the key from the live set, and stale
+    heap items are discarded when they surface or when they outnumber the
+    live ones. add and remove are O(log n), top-k is O(k log n).
+    """
+    def __init__(self):
+        self.heaps = {r: [] for r in RANKINGS}
+        self.live = {r: set() for r in RANKINGS}
+
+    def __len__(self):
+        return len(self.live[RANKINGS[0]])
+
+    def add(self, entry):
+        for r in RANKINGS:
+            key = _key(entry, r)
+            if key not in self.live[r]:
+                self.live[r].add(key)
+                heappush(self.heaps[r], key)
+
+    def remove(self, entry):
+        for r in RANKINGS:
+            self.live[r].discard(_key(entry, r))
+            heap = self.heaps[r]
+            if len(heap) > 2 * len(self.live[r]) + 64:
+                heap[:] = list(self.live[r])
+                heapify(heap)
+
+    def top(self, ranking, k):
+        heap, live = self.heaps[ranking], self.live[ranking]
+        best = []
+        while heap and len(best) < k:
+            key = heappop(heap)
+            # Skip stale keys and the duplicate left by a remove + re-add
+            if key in live and (not best or key != best[-1]):
+                best.append(key)
+        for key in best:
+            heappush(heap, key)
+        return [pid for _, pid in best]
+
+
+def _key(entry, ranking):
+    if ranking == "value":
+        return (-entry["total_value"], entry["portfolio_id"])
+    # Sessions without a contribution basis rank after every real return
+    ret = entry["return_pct"]
+    return (float("inf") if ret is None else -ret, entry["portfolio_id"])
+
+
+def mark_dirty(*portfolio_ids):
+    """
+    Queues portfolios for revaluation on the next read (after a trade, a
+    time advance or a session/room change).
+    """
+    global _dirty_seq
+    with _lock:
+        for pid in portfolio_ids:
+            _dirty_seq += 1
+            _dirty[pid] = _dirty_seq
+
+
+def _load(cur, portfolio_ids=None):
+    """
+    Entries for the active sessions of portfolio_ids (all when None),
+    each valued at its own sim_date in one bulk pass.
+    """
+    cur.execute("""
+        SELECT s.id, s.portfolio_id, s.sim_date, s.contributed, u.username,
+               COALESCE(array_agg(m.room_id) FILTER (WHERE m.room_id IS NOT NULL), '{}')
+        FROM game_sessions s
+        LEFT JOIN users u ON u.id = s.user_id
+        LEFT JOIN game_room_members m ON m.session_id = s.id
+        WHERE s.is_active = TRUE AND (%s::int[] IS NULL OR s.portfolio_id = ANY(%s))
+        GROUP BY s.id, u.username
+    """, (portfolio_ids, portfolio_ids))
+    sessions = cur.fetchall()
+    values = bulk_portfolio_values(cur, [r[1] for r in sessions], {r[1]: r[2] for r in sessions})
+
+    entries = {}
+    for sid, pid, sim_date, contributed, username, rooms in sessions:
+        if pid not in values:
+            continue
+        total = values[pid]["total_value"]
+        contributed = float(contributed or 0)
+        entries[pid] = {
+            "portfolio_id": pid,
+            "session_id": sid,
+            "username": username,
+            "sim_date": str(sim_date),
+            "total_value": total,
+            "contributed": contributed,
+            "return_pct": (total / contributed - 1.0) * 100 if contributed > 0 else None,
+            "rooms": list(rooms)
+        }
+    return entries
+
+
+def _place(entry):
+    for room in [None] + entry["rooms"]:
+        _boards.setdefault(room, _Board()).add(entry)
+
+
+def _unplace(entry):
+    for room in [None] + entry["rooms"]:
+        _boards[room].remove(entry)
+
+
+def _needs_refresh():
+    return _built_at is None or time.monotonic() - _built_at > REFRESH_SECONDS or bool(_dirty)
+
+
+def _refresh():
+    """
+    Full rebuild every REFRESH_SECONDS, otherwise a revaluation of the dirty
+    portfolios. The load runs outside _lock and is applied under it; a dirty
+    mark is cleared only once its load succeeded and if it was not marked
+    again meanwhile, so a failed load leaves it queued.
+    """
+    global _built_at
+    with _refresh_lock:
+        with _lock:
+            if not _needs_refresh():
+                return
+            full = _built_at is None or time.monotonic() - _built_at > REFRESH_SECONDS
+            marks = dict(_dirty)
+        with get_db_connection() as conn:
+            fresh = _load(conn.cursor(), None if full else sorted(marks))
+
+        with _lock:
+            if full:
+                _entries.clear()
+                _boards.clear()
+                _built_at = time.monotonic()
+            for pid in (fresh if full else marks):
+                old = _entries.pop(pid, None)
+                if old:
+                    _unplace(old)
+                if pid in fresh:
+                    _entries[pid] = fresh[pid]
+                    _place(fresh[pid])
+            for pid, mark in marks.items():
+                if _dirty.get(pid) == mark:
+                    del _dirty[pid]
+
+
+def get_leaderboard(room: int = None, limit: int = 10, by: str = "return"):
+    """
+    Top `limit` active sessions, globally or within a room, ranked by return
+    on contributed cash or by total value (USD, at each session's sim_date).
+    """
+    if by not in RANKINGS:
+        return {"error": f"Unknown ranking '{by}'. Use one of: {', '.join(RANKINGS)}"}
+    if not 0 < limit <= MAX_LIMIT:
+        return {"error": f"limit must be between 1 and {MAX_LIMIT}"}
+
+    try:
+        with _lock:
+            stale = _needs_refresh()
+        if stale:
+            _refresh()
+
+        with _lock:
+            board = _boards.get(room)
+            top = board.top(by, limit) if board else []
+            return {
+                "room": room,
+                "by": by,
+                "total": len(board) if board else 0,
+                "entries": [
+                    {"rank": i + 1, **{k: v for k, v in _entries[pid].items() if k != "rooms"}}
+                    for i, pid in enumerate(top)
+                ]
+            }
+    except Exception as e:
+        return {"error": str(e)}
+
+
+def reset():
+    global _built_at
+    with _refresh_lock, _lock:
+        _entries.clear()
+        _boards.clear()
+        _dirty.clear()
+        _built_at = None
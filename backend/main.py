@@ -1,11 +1,28 @@
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from typing import Optional, List
+from typing import Optional, List, Dict, Any
 import os
-from .simulator import simulate_invest
+from .simulator import simulate_invest, simulate_invest_matrix
 from .db_prices import get_price, get_all_assets, get_price_history
 from . import db_prices
+from . import price_matrix
+from . import backtest
+from . import sweep
+from . import projection
+from . import auto_invest
+from . import db_orders
+from . import equity
+from . import game_rooms
+from . import leaderboard
+from . import forks
+from . import analytics
+from . import covariance
+from . import optimizer
+from . import screener
+from . import indicators
+from . import risk
 from . import db_portfolio as portfolio
 from . import db_currency
 from . import game_engine
@@ -44,6 +61,23 @@ class TradeRequest(BaseModel):
     quantity: float
     date: Optional[str] = None
 
+class BatchOrder(BaseModel):
+    symbol: str
+    side: str # BUY | SELL
+    quantity: float
+
+class BatchOrderRequest(BaseModel):
+    portfolio_id: int
+    orders: List[BatchOrder]
+    date: Optional[str] = None
+
+class RebalanceRequest(BaseModel):
+    targets: Dict[str, float] # symbol -> weight of total value (sum <= 1, rest stays cash)
+    fractional: bool = True
+    min_trade: float = 0 # skip trades worth less than this (USD)
+    dry_run: bool = False
+    date: Optional[str] = None
+
 class ValueRequest(BaseModel):
     portfolio_id: int
     date: str
@@ -65,6 +99,67 @@ class UpdateBudgetRequest(BaseModel):
     portfolio_id: int
     monthly_investment: float
 
+class BacktestRequest(BaseModel):
+    symbols: List[str]
+    start: str # YYYY-MM-DD
+    end: str # YYYY-MM-DD
+    strategy: str # dca | rebalance | ma_crossover
+    initial_cash: float = 10000
+    weights: Optional[Dict[str, float]] = None # default: equal weight
+    contribution: float = 0 # dca: amount invested every period
+    frequency: str = "monthly" # dca / rebalance: weekly | monthly | quarterly | yearly
+    fast: int = 50 # ma_crossover windows (rows)
+    slow: int = 200
+
+class SweepRequest(BaseModel):
+    symbols: List[str]
+    start: str # YYYY-MM-DD, default start for variants that don't sweep "start"
+    end: str # YYYY-MM-DD
+    strategy: str
+    grid: Dict[str, List[Any]] # e.g. {"start": ["2000-01-01", "2005-01-01"], "contribution": [100, 500]}
+    initial_cash: float = 10000
+    weights: Optional[Dict[str, float]] = None
+    contribution: float = 0
+    frequency: str = "monthly"
+    fast: int = 50
+    slow: int = 200
+
+class AutoInvestRequest(BaseModel):
+    portfolio_id: int
+    allocations: Dict[str, float] # symbol -> share of monthly net income (sum <= 1)
+
+class ConditionalOrderRequest(BaseModel):
+    symbol: str
+    side: str # BUY | SELL
+    order_type: str # LIMIT | STOP | TAKE_PROFIT
+    trigger_price: float
+    quantity: float
+
+class ForkSessionRequest(BaseModel):
+    portfolio_id: int
+    sim_date: str # YYYY-MM-DD, a date the session has been at
+    name: Optional[str] = None # new portfolio name (default "<name> @ <sim_date>")
+
+class CreateRoomRequest(BaseModel):
+    name: str
+    start_date: str # YYYY-MM-DD
+
+class JoinRoomRequest(BaseModel):
+    portfolio_id: int
+
+class AdvanceRoomRequest(BaseModel):
+    target_date: str # YYYY-MM-DD
+
+class OptimizeRequest(BaseModel):
+    symbols: List[str]
+    portfolio_id: Optional[int] = None # as of this session's sim_date
+    end: Optional[str] = None # YYYY-MM-DD, when no portfolio_id (default today)
+    window: int = covariance.DEFAULT_WINDOW # lookback in weekdays (same calendar span for every asset)
+    long_only: bool = True
+    max_weight: Optional[float] = None # cap per asset (shorts bounded at -max_weight)
+    risk_free: float = 0.0 # annual rate
+    points: int = optimizer.DEFAULT_POINTS # frontier points
+
 # --- Routes ---
 
 @app.get("/")
@@ -85,12 +180,47 @@ def get_asset_info(symbol: str):
     return details
 
 @app.get("/price/history")
-def get_history(symbol: str, end_date: str):
+def get_history(symbol: str, end_date: str, start_date: Optional[str] = None, resolution: str = "auto"):
+    if resolution not in ("auto", "daily", "weekly", "monthly"):
+        raise HTTPException(status_code=400, detail="resolution must be auto, daily, weekly or monthly")
     print(f"DEBUG: Fetching history for {symbol} until {end_date}")
-    history = get_price_history(symbol.upper(), end_date)
+    history = get_price_history(symbol.upper(), end_date, start_date, resolution)
     print(f"DEBUG: Found {len(history)} data points")
     return history
 
+@app.get("/price/history/multi")
+def get_multi_history(symbols: str, end: str, start: Optional[str] = None, normalize: bool = False, resolution: str = "auto"):
+    symbol_list = [s for s in symbols.split(",") if s.strip()]
+    if not symbol_list:
+        raise HTTPException(status_code=400, detail="At least one symbol is required")
+    if resolution not in ("auto", "daily", "weekly", "monthly"):
+        raise HTTPException(status_code=400, detail="resolution must be auto, daily, weekly or monthly")
+    result = price_matrix.get_multi_history(symbol_list, start, end, normalize, resolution)
+    if result is None:
+        raise HTTPException(status_code=500, detail="Error fetching price history")
+    return result
+
+@app.get("/price/indicators")
+def get_indicators(symbol: str, end_date: str, ind: str = "sma:20", start_date: Optional[str] = None):
+    """
+    Daily closes with technical indicators, e.g. ind=sma:50,ema:20,rsi:14,macd:12:26:9,bb:20:2.
+    """
+    result = indicators.get_indicators(symbol, end_date, ind, start_date)
+    if "error" in result:
+        raise HTTPException(status_code=400, detail=result["error"])
+    return result
+
+@app.get("/screener")
+def get_screener(date: Optional[str] = None, period: str = "1m", sort: str = "return", order: str = "desc",
+                 type: Optional[str] = None, limit: int = 20, offset: int = 0):
+    """
+    Every asset ranked by return, volatility or drawdown over the period ending at date (e.g. the session's sim_date).
+    """
+    result = screener.screen(date, period, sort, order, type, limit, offset)
+    if "error" in result:
+        raise HTTPException(status_code=400, detail=result["error"])
+    return result
+
 @app.get("/price")
 def get_asset_price(symbol: str, date: str):
     print(f"DEBUG: Fetching price for {symbol} on {date}")
@@ -120,6 +250,89 @@ def simulate(
         "future_value": result
     }
 
+@app.get("/simulate/matrix")
+def simulate_matrix(symbol: str, amount: float, freq: str = "monthly"):
+    """
+    Every buy date x sell date outcome at the chosen frequency, for heatmaps.
+    """
+    result = simulate_invest_matrix(amount, symbol.upper(), freq)
+    if "error" in result:
+        raise HTTPException(status_code=400, detail=result["error"])
+    return result
+
+@app.post("/backtest")
+def run_backtest(req: BacktestRequest):
+    result = backtest.run_backtest(
+        req.symbols,
+        req.start,
+        req.end,
+        req.strategy,
+        initial_cash=req.initial_cash,
+        weights=req.weights,
+        contribution=req.contribution,
+        frequency=req.frequency,
+        fast=req.fast,
+        slow=req.slow
+    )
+    if "error" in result:
+        raise HTTPException(status_code=400, detail=result["error"])
+    return result
+
+@app.post("/backtest/sweep")
+def run_backtest_sweep(req: SweepRequest):
+    """
+    Streams one NDJSON line per grid combination as workers finish.
+    """
+    plan = sweep.plan_sweep(
+        req.symbols,
+        req.start,
+        req.end,
+        req.strategy,
+        req.grid,
+        base={
+            "initial_cash": req.initial_cash,
+            "weights": req.weights,
+            "contribution": req.contribution,
+            "frequency": req.frequency,
+            "fast": req.fast,
+            "slow": req.slow,
+        }
+    )
+    if "error" in plan:
+        raise HTTPException(status_code=400, detail=plan["error"])
+    return StreamingResponse(sweep.stream_sweep(plan), media_type="application/x-ndjson")
+
+@app.get("/analytics/correlation")
+def get_correlation(symbols: Optional[str] = None, window: int = covariance.DEFAULT_WINDOW, end: Optional[str] = None, min_periods: Optional[int] = None):
+    """
+    Correlation / covariance matrices of daily returns over the last `window`
+    weekdays (all assets when symbols is omitted).
+    """
+    symbol_list = [s.strip() for s in symbols.split(",") if s.strip()] if symbols else None
+    result = covariance.get_correlation(symbol_list, window, end, min_periods)
+    if "error" in result:
+        raise HTTPException(status_code=400, detail=result["error"])
+    return result
+
+@app.post("/analytics/optimize")
+def optimize_portfolio(req: OptimizeRequest):
+    """
+    Efficient frontier, min-variance and max-Sharpe weights from prices up to the session's sim_date (or end).
+    """
+    result = optimizer.optimize(
+        req.symbols,
+        portfolio_id=req.portfolio_id,
+        end=req.end,
+        window=req.window,
+        long_only=req.long_only,
+        max_weight=req.max_weight,
+        risk_free=req.risk_free,
+        points=req.points
+    )
+    if "error" in result:
+        raise HTTPException(status_code=400, detail=result["error"])
+    return result
+
 # --- Portfolio Routes ---
 
 @app.post("/users")
@@ -158,6 +371,7 @@ def buy_asset(req: TradeRequest):
     result = portfolio.add_transaction(req.portfolio_id, req.symbol.upper(), "BUY", req.quantity, trade_date)
     if "error" in result:
         raise HTTPException(status_code=400, detail=result["error"])
+    leaderboard.mark_dirty(req.portfolio_id)
     return result
 
 @app.post("/portfolio/sell")
@@ -165,6 +379,49 @@ def sell_asset(req: TradeRequest):
     trade_date = _resolve_trade_date(req.portfolio_id, req.date)
     
     result = portfolio.add_transaction(req.portfolio_id, req.symbol.upper(), "SELL", req.quantity, trade_date)
+    if "error" in result:
+        raise HTTPException(status_code=400, detail=result["error"])
+    leaderboard.mark_dirty(req.portfolio_id)
+    return result
+
+@app.post("/portfolio/orders")
+def execute_batch_orders(req: BatchOrderRequest):
+    """
+    Several buys/sells applied atomically (all or none) at the trade date's prices.
+    """
+    trade_date = _resolve_trade_date(req.portfolio_id, req.date)
+
+    result = portfolio.execute_orders(req.portfolio_id, [o.model_dump() for o in req.orders], trade_date)
+    if "error" in result:
+        raise HTTPException(status_code=400, detail=result["error"])
+    leaderboard.mark_dirty(req.portfolio_id)
+    return result
+
+@app.post("/portfolio/{portfolio_id}/rebalance")
+def rebalance_portfolio(portfolio_id: int, req: RebalanceRequest):
+    trade_date = _resolve_trade_date(portfolio_id, req.date)
+
+    result = portfolio.rebalance_portfolio(portfolio_id, req.targets, trade_date, req.fractional, req.min_trade, req.dry_run)
+    if "error" in result:
+        raise HTTPException(status_code=400, detail=result["error"])
+    if not req.dry_run:
+        leaderboard.mark_dirty(portfolio_id)
+    return result
+
+@app.post("/portfolio/{portfolio_id}/conditional_orders")
+def place_conditional_order(portfolio_id: int, req: ConditionalOrderRequest):
+    result = db_orders.place_order(portfolio_id, req.symbol.upper(), req.side, req.order_type, req.trigger_price, req.quantity)
+    if "error" in result:
+        raise HTTPException(status_code=400, detail=result["error"])
+    return result
+
+@app.get("/portfolio/{portfolio_id}/conditional_orders")
+def list_conditional_orders(portfolio_id: int, status: Optional[str] = None):
+    return {"portfolio_id": portfolio_id, "orders": db_orders.list_orders(portfolio_id, status.upper() if status else None)}
+
+@app.delete("/portfolio/{portfolio_id}/conditional_orders/{order_id}")
+def cancel_conditional_order(portfolio_id: int, order_id: int):
+    result = db_orders.cancel_order(portfolio_id, order_id)
     if "error" in result:
         raise HTTPException(status_code=400, detail=result["error"])
     return result
@@ -196,6 +453,39 @@ def get_portfolio_details(portfolio_id: int):
     
     return {**p, "holdings": h, "active_session": session}
 
+@app.get("/portfolio/{portfolio_id}/projection")
+def get_portfolio_projection(portfolio_id: int, years: float = 10, paths: int = 10000, frequency: str = "monthly", block: Optional[int] = None, seed: Optional[int] = None):
+    """
+    Monte Carlo percentile bands of future value from the session's sim_date.
+    """
+    result = projection.project_portfolio(portfolio_id, years, paths, frequency, block, seed=seed)
+    if "error" in result:
+        raise HTTPException(status_code=400, detail=result["error"])
+    return result
+
+@app.get("/portfolio/{portfolio_id}/analytics")
+def get_portfolio_analytics(portfolio_id: int, start: Optional[str] = None, end: Optional[str] = None, risk_free: float = 0.0, benchmark: Optional[str] = None):
+    """
+    TWR, IRR, volatility, Sharpe/Sortino and max drawdown of the active session,
+    plus alpha/beta/tracking error against comma-separated benchmark symbols.
+    """
+    benchmarks = [s.strip() for s in benchmark.split(",") if s.strip()] if benchmark else None
+    result = analytics.portfolio_analytics(portfolio_id, start, end, risk_free, benchmarks)
+    if "error" in result:
+        raise HTTPException(status_code=400, detail=result["error"])
+    return result
+
+@app.get("/portfolio/{portfolio_id}/risk")
+def get_portfolio_risk(portfolio_id: int, confidence: float = 0.95, window: int = risk.DEFAULT_WINDOW):
+    """
+    1-day / 10-day historical VaR and expected shortfall, plus stress scenarios replayed on current holdings.
+    """
+    result = risk.portfolio_risk(portfolio_id, confidence, window)
+    if "error" in result:
+        status = 404 if result["error"] == "Portfolio not found" else 400
+        raise HTTPException(status_code=status, detail=result["error"])
+    return result
+
 # --- Simulation / Game Routes ---
 
 @app.post("/simulation/start")
@@ -213,6 +503,7 @@ def start_simulation(req: StartSimRequest):
     if "error" in result:
         print(f"ERROR starting simulation: {result['error']}")
         raise HTTPException(status_code=400, detail=result["error"])
+    leaderboard.mark_dirty(req.portfolio_id)
     return result
 
 @app.post("/simulation/forward")
@@ -220,6 +511,7 @@ def advance_simulation(req: ForwardSimRequest):
     result = game_engine.advance_time(req.portfolio_id, req.target_date)
     if "error" in result:
         raise HTTPException(status_code=400, detail=result["error"])
+    leaderboard.mark_dirty(req.portfolio_id)
     return result
 
 @app.post("/simulation/update_budget")
@@ -229,6 +521,24 @@ def update_budget(req: UpdateBudgetRequest):
         raise HTTPException(status_code=400, detail=result["error"])
     return result
 
+@app.post("/simulation/auto_invest")
+def set_auto_invest(req: AutoInvestRequest):
+    result = auto_invest.set_plan(req.portfolio_id, req.allocations)
+    if "error" in result:
+        raise HTTPException(status_code=400, detail=result["error"])
+    return result
+
+@app.get("/simulation/auto_invest")
+def get_auto_invest(portfolio_id: int):
+    return {"portfolio_id": portfolio_id, "plan": auto_invest.get_plan(portfolio_id)}
+
+@app.delete("/simulation/auto_invest")
+def clear_auto_invest(portfolio_id: int):
+    result = auto_invest.clear_plan(portfolio_id)
+    if "error" in result:
+        raise HTTPException(status_code=400, detail=result["error"])
+    return result
+
 @app.get("/simulation/status")
 def get_simulation_status(portfolio_id: int):
     session = game_engine.get_session(portfolio_id)
@@ -245,11 +555,75 @@ def get_simulation_status(portfolio_id: int):
         "portfolio_value": val
     }
 
+@app.get("/simulation/equity")
+def get_simulation_equity(portfolio_id: int, start: Optional[str] = None, end: Optional[str] = None):
+    """
+    Daily value path recorded by /simulation/forward, for session charts.
+    """
+    result = equity.get_equity(portfolio_id, start, end)
+    if result is None:
+        raise HTTPException(status_code=500, detail="Error fetching equity history")
+    return {"portfolio_id": portfolio_id, **result}
+
+@app.post("/simulation/fork")
+def fork_simulation(req: ForkSessionRequest):
+    result = forks.fork_session(req.portfolio_id, req.sim_date, req.name)
+    if "error" in result:
+        raise HTTPException(status_code=400, detail=result["error"])
+    leaderboard.mark_dirty(result["portfolio_id"])
+    return result
+
+@app.get("/simulation/snapshots")
+def list_simulation_snapshots(portfolio_id: int):
+    return {"portfolio_id": portfolio_id, "snapshots": forks.list_snapshots(portfolio_id)}
+
 @app.get("/simulation/list")
 def list_user_sessions(user_id: int):
     sessions = game_engine.list_sessions(user_id)
     return {"user_id": user_id, "sessions": sessions}
 
+# --- Game Rooms ---
+
+@app.post("/rooms")
+def create_room(req: CreateRoomRequest):
+    result = game_rooms.create_room(req.name, req.start_date)
+    if "error" in result:
+        raise HTTPException(status_code=400, detail=result["error"])
+    return result
+
+@app.post("/rooms/{room_id}/join")
+def join_room(room_id: int, req: JoinRoomRequest):
+    result = game_rooms.join_room(room_id, req.portfolio_id)
+    if "error" in result:
+        raise HTTPException(status_code=400, detail=result["error"])
+    leaderboard.mark_dirty(req.portfolio_id)
+    return result
+
+@app.get("/rooms/{room_id}")
+def get_room(room_id: int):
+    result = game_rooms.get_room(room_id)
+    if "error" in result:
+        raise HTTPException(status_code=404, detail=result["error"])
+    return result
+
+@app.post("/rooms/{room_id}/advance")
+def advance_room(room_id: int, req: AdvanceRoomRequest):
+    result = game_rooms.advance_room(room_id, req.target_date)
+    if "error" in result:
+        raise HTTPException(status_code=400, detail=result["error"])
+    leaderboard.mark_dirty(*[s["portfolio_id"] for s in result["standings"]])
+    return result
+
+@app.get("/leaderboard")
+def get_leaderboard(room: Optional[int] = None, limit: int = 10, by: str = "return"):
+    """
+    Top sessions by return on contributed cash (or total value), optionally within a room.
+    """
+    result = leaderboard.get_leaderboard(room, limit, by)
+    if "error" in result:
+        raise HTTPException(status_code=400, detail=result["error"])
+    return result
+
 @app.get("/currencies")
 def get_currencies():
     return db_currency.get_all_rates()
@@ -262,7 +636,7 @@ def reset_system():
                 cur = conn.cursor()
                 
                 # Drop all user-related tables and currency rates
-                cur.execute("DROP TABLE IF EXISTS game_sessions, transactions, portfolios, users, exchange_rates CASCADE;")
+                cur.execute("DROP TABLE IF EXISTS game_room_members, game_rooms, session_snapshots, session_equity, pending_orders, auto_invest_plans, game_sessions, transactions, portfolios, users, exchange_rates CASCADE;")
                 
                 # Re-initialize schema
                 schema_path = os.path.join(os.path.dirname(__file__), "portfolio_schema.sql")
@@ -270,10 +644,10 @@ def reset_system():
                     schema_sql = f.read()
                     cur.execute(schema_sql)
                 
-                # Clear all LRU caches to ensure fresh data lookups
-                db_prices.get_price.cache_clear()
-                db_prices.get_asset_start_dates.cache_clear()
-                db_prices.get_assets_metadata.cache_clear()
+                # Clear all caches (and bump the cache generation) to ensure fresh data lookups
+                db_prices.invalidate_caches()
+                leaderboard.reset()
+                indicators.reset()
                     
                 conn.commit()
                 return {"status": "success", "message": "System reset successfully, caches cleared, and rates refreshed"}
@@ -0,0 +1,141 @@
+import numpy as np
+
+# Shared performance math for backtests, analytics and the screener.
+# Everything takes plain NumPy arrays aligned on a date axis.
+
+
+def periods_per_year(dates):
+    """
+    Observations per year for a datetime64[D] axis. Mixed calendars (crypto
+    trades 365 days, equities ~252) make a fixed constant wrong.
+    """
+    if len(dates) < 2:
+        return 252.0
+    span_days = (dates[-1] - dates[0]).astype("timedelta64[D]").astype(float)
+    if span_days <= 0:
+        return 252.0
+    return (len(dates) - 1) / (span_days / 365.25)
+
+
+def simple_returns(values, axis=0):
+    """
+    Period-over-period returns along axis (first period dropped).
+    """
+    values = np.asarray(values, dtype=float)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.diff(values, axis=axis) / np.take(values, np.arange(values.shape[axis] - 1), axis=axis)
+
+
+def drawdown_series(index):
+    """
+    Fractional drawdown from the running peak (0 at new highs, negative below).
+    """
+    index = np.asarray(index, dtype=float)
+    peaks = np.fmax.accumulate(index, axis=0)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return index / peaks - 1.0
+
+
+def max_drawdown(index):
+    dd = drawdown_series(index)
+    if dd.size == 0 or np.all(np.isnan(dd)):
+        return 0.0
+    return float(np.nanmin(dd))
+
+
+def summary_stats(index, dates, returns=None, risk_free: float = 0.0):
+    """
+    Headline statistics for a growth index (e.g. equity net of contributions).
+    returns may be passed when the index is already flow-adjusted elsewhere.
+    """
+    index = np.asarray(index, dtype=float)
+    if returns is None:
+        returns = simple_returns(index)
+    returns = returns[np.isfinite(returns)]
+    ppy = periods_per_year(dates)
+
+    total_return = float(index[-1] / index[0] - 1.0) if len(index) > 1 and index[0] else 0.0
+    years = (dates[-1] - dates[0]).astype("timedelta64[D]").astype(float) / 365.25 if len(dates) > 1 else 0.0
+    cagr = float((1.0 + total_return) ** (1.0 / years) - 1.0) if years > 0 and total_return > -1 else 0.0
+
+    vol = float(np.std(returns, ddof=1) * np.sqrt(ppy)) if len(returns) > 1 else 0.0
+    excess = returns - risk_free / ppy
+    sharpe = float(np.mean(excess) / np.std(returns, ddof=1) * np.sqrt(ppy)) if len(returns) > 1 and np.std(returns) > 0 else 0.0
+    downside = np.minimum(excess, 0.0)
+    downside_dev = float(np.sqrt(np.mean(downside ** 2)) * np.sqrt(ppy)) if len(returns) else 0.0
+    sortino = float(np.mean(excess) * ppy / downside_dev) if downside_dev > 0 else 0.0
+
+    return {
+        "total_return": total_return,
+        "cagr": cagr,
+        "volatility": vol,
+        "sharpe": sharpe,
+        "sortino": sortino,
+        "max_drawdown": max_drawdown(index),
+    }
+
+
+def flow_adjusted_index(equity, flows):
+    """
+    Time-weighted growth index (starts at 1.0) of an equity series that
+    receives external cash flows. flows[t] arrives at t and is already part
+    of equity[t], so r_t = (equity[t] - flows[t]) / equity[t-1] - 1.
+    Returns (index, returns).
+    """
+    equity = np.asarray(equity, dtype=float)
+    flows = np.asarray(flows, dtype=float)
+    prev = equity[:-1]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        returns = np.where(prev > 0, (equity[1:] - flows[1:]) / prev - 1.0, 0.0)
+    returns = np.where(np.isfinite(returns), returns, 0.0)
+    index = np.concatenate([[1.0], np.cumprod(1.0 + returns)])
+    return index, returns
+
+
+def rolling_mean(values, window: int):
+    """
+    Trailing mean over `window` rows via cumulative sums. NaN until the
+    window is full of valid values (late listings don't poison the sums).
+    Works on 1-D or (dates x assets) arrays.
+    """
+    values = np.asarray(values, dtype=float)
+    out = np.full(values.shape, np.nan)
+    if window <= 0 or values.shape[0] < window:
+        return out
+    valid = np.isfinite(values)
+    zeros = np.zeros((1,) + values.shape[1:])
+    csum = np.concatenate([zeros, np.cumsum(np.where(valid, values, 0.0), axis=0)])
+    ccount = np.concatenate([zeros, np.cumsum(valid, axis=0)])
+    sums = csum[window:] - csum[:-window]
+    counts = ccount[window:] - ccount[:-window]
+    out[window - 1:] = np.where(counts == window, sums / window, np.nan)
+    return out
+
+
+def irr(years, amounts, low: float = -0.9999, high: float = 100.0, iterations: int = 200):
+    """
+    Annual money-weighted return: the rate r where
+    sum(amounts * (1 + r) ** -years) == 0, with years measured from the first
+    cash flow. Contributions are negative, the ending value positive.
+    Solved by bisection; each step is one vectorized NPV.
+    Returns None when the flows don't change sign over [low, high].
+    """
+    years = np.asarray(years, dtype=float)
+    amounts = np.asarray(amounts, dtype=float)
+
+    def npv(rate):
+        return float(np.sum(amounts * np.exp(-years * np.log1p(rate))))
+
+    f_low, f_high = npv(low), npv(high)
+    if not (np.isfinite(f_low) and np.isfinite(f_high)) or f_low * f_high > 0:
+        return None
+    for _ in range(iterations):
+        mid = 0.5 * (low + high)
+        f_mid = npv(mid)
+        if f_mid == 0 or high - low < 1e-12:
+            return mid
+        if f_low * f_mid < 0:
+            high = mid
+        else:
+            low, f_low = mid, f_mid
+    return 0.5 * (low + high)
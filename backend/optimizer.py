@@ -0,0 +1,242 @@
+import numpy as np
+from datetime import date, datetime
+from . import covariance
+from .game_engine import get_session
+from .price_matrix import resolve_symbols
+
+DEFAULT_POINTS = 20
+MAX_POINTS = 100
+MAX_ITERATIONS = 5000
+TOLERANCE = 1e-10
+SHARPE_GRID = 48
+SHARPE_ROUNDS = 4
+
+
+def project_capped_simplex(V, lower: float, upper: float):
+    """
+    Euclidean projection of each row of V onto {w : sum(w) = 1, lower <= w <= upper}.
+    The projection is clip(v - tau, lower, upper), and the sum is piecewise
+    linear in tau with breakpoints at v - upper (a weight leaves its cap)
+    and v - lower (a weight hits its floor). Sorting the breakpoints gives
+    the sum at each one by a cumulative sum, and tau is interpolated
+    exactly inside the bracketing segment, for all rows at once.
+    """
+    V = np.atleast_2d(V)
+    k, n = V.shape
+    points = np.concatenate([V - upper, V - lower], axis=1)
+    order = np.argsort(points, axis=1)
+    points = np.take_along_axis(points, order, axis=1)
+    # +1 where a weight becomes free, -1 where it becomes fixed at the floor
+    free = np.cumsum(np.where(order < n, 1, -1), axis=1)
+    total = n * upper - np.concatenate([np.zeros((k, 1)), np.cumsum(free[:, :-1] * np.diff(points, axis=1), axis=1)], axis=1)
+    seg = np.maximum((total >= 1.0).sum(axis=1) - 1, 0)
+    rows = np.arange(k)
+    tau = points[rows, seg] + (total[rows, seg] - 1.0) / np.maximum(free[rows, seg], 1)
+    return np.clip(V - tau[:, None], lower, upper)
+
+
+def solve_frontier(mu, cov, gammas, lower: float = None, upper: float = None, start=None):
+    """
+    Weights maximising gamma * mu'w - w'Cw subject to sum(w) = 1, one row
+    per gamma. gamma = 0 is the minimum-variance portfolio; larger gammas
+    walk up the efficient frontier. Without bounds this is closed form;
+    with bounds every gamma is solved at once by accelerated projected
+    gradient (FISTA), one (gammas x n) @ (n x n) product per iteration,
+    starting from `start` weights when given.
+    """
+    gammas = np.asarray(gammas, dtype=float)
+    n = len(mu)
+    if lower is None:
+        inv_one = np.linalg.solve(cov, np.ones(n))
+        inv_mu = np.linalg.solve(cov, mu)
+        min_var = inv_one / inv_one.sum()
+        # Zero-sum tilt along the frontier
+        tilt = inv_mu - inv_mu.sum() * min_var
+        return min_var + 0.5 * gammas[:, None] * tilt
+
+    step = 1.0 / (2.0 * np.linalg.eigvalsh(cov)[-1])
+    pull = gammas[:, None] * mu
+    w = np.full((len(gammas), n), 1.0 / n) if start is None else np.tile(start, (len(gammas), 1))
+    w = project_capped_simplex(w, lower, upper)
+    y, t = w, np.ones(len(gammas))
+    for _ in range(MAX_ITERATIONS):
+        w_next = project_capped_simplex(y - step * (2.0 * y @ cov - pull), lower, upper)
+        move = w_next - w
+        # Adaptive restart: drop a row's momentum once it points uphill
+        t = np.where(np.einsum("ki,ki->k", y - w_next, move) > 0, 1.0, t)
+        t_next = 0.5 * (1.0 + np.sqrt(1.0 + 4.0 * t * t))
+        y = w_next + ((t - 1.0) / t_next)[:, None] * move
+        w, t = w_next, t_next
+        if np.abs(move).max() < TOLERANCE:
+            break
+    return w
+
+
+def gamma_grid(mu, cov, points: int):
+    """
+    0 (minimum variance) and log-spaced gammas around the scale where the
+    return pull and the variance penalty are comparable.
+    """
+    spread = float(np.max(mu) - np.min(mu))
+    scale = 2.0 * np.trace(cov) / len(mu) / spread if spread > 0 else 1.0
+    return np.concatenate([[0.0], np.geomspace(1e-2, 1e2, points - 1) * scale])
+
+
+def max_sharpe_weights(mu, cov, risk_free: float = 0.0, lower: float = None, upper: float = None,
+                       gammas=None, weights=None):
+    """
+    Tangency portfolio. Closed form C^-1 (mu - rf) without bounds; with
+    bounds the Sharpe ratio is maximised along the bounded frontier,
+    starting from an already solved frontier (gammas, weights) or a fresh
+    grid, then on finer grids around the best point.
+    Returns None when no portfolio has a positive excess return.
+    """
+    if lower is None:
+        raw = np.linalg.solve(cov, mu - risk_free)
+        if raw.sum() <= 0:
+            return None
+        return raw / raw.sum()
+
+    if weights is None:
+        gammas = gamma_grid(mu, cov, SHARPE_GRID)
+        weights = solve_frontier(mu, cov, gammas, lower, upper)
+    for _ in range(SHARPE_ROUNDS):
+        # Sharpe is unimodal along the frontier: zoom in between the best point's neighbours
+        best = int(np.argmax(_sharpe(weights, mu, cov, risk_free)))
+        gammas = np.linspace(gammas[max(best - 1, 0)], gammas[min(best + 1, len(gammas) - 1)], SHARPE_GRID // 4)
+        weights = solve_frontier(mu, cov, gammas, lower, upper, start=weights[best])
+    sharpe = _sharpe(weights, mu, cov, risk_free)
+    best = int(np.argmax(sharpe))
+    return weights[best] if sharpe[best] > 0 else None
+
+
+def _sharpe(weights, mu, cov, risk_free):
+    vol = np.sqrt(np.maximum(np.einsum("ki,ij,kj->k", weights, cov, weights), 0.0))
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(vol > 0, (weights @ mu - risk_free) / vol, -np.inf)
+
+
+def annualized_moments(state, columns, min_periods: int):
+    """
+    Annual expected returns and covariance of the state's columns. Each
+    asset is scaled by its own observation frequency, so equities and
+    crypto in one problem are both annualised correctly. The pairwise-
+    complete covariance is clipped to the nearest positive semi-definite
+    matrix (plus a tiny ridge) so the solvers see a valid covariance.
+    Pairs without enough common history are left NaN for the caller.
+    """
+    ppy = state.periods_per_year(columns)
+    mu = state.means(columns) * ppy
+    cov, _, _ = state.matrices(columns, min_periods)
+    cov = cov * np.sqrt(np.outer(ppy, ppy))
+    if not np.isfinite(cov).all() or not np.isfinite(mu).all():
+        return mu, cov
+    vals, vecs = np.linalg.eigh(0.5 * (cov + cov.T))
+    vals = np.maximum(vals, vals[-1] * 1e-10)
+    return mu, (vecs * vals) @ vecs.T
+
+
+def _portfolio(weights, symbols, mu, cov, risk_free):
+    ret = float(weights @ mu)
+    vol = float(np.sqrt(max(weights @ cov @ weights, 0.0)))
+    return {
+        "weights": {s: (float(w) if abs(w) > 1e-9 else 0.0) for s, w in zip(symbols, weights)},
+        "expected_return": ret,
+        "volatility": vol,
+        "sharpe": (ret - risk_free) / vol if vol > 0 else None
+    }
+
+
+def optimize(symbols, portfolio_id: int = None, end: str = None, window: int = covariance.DEFAULT_WINDOW,
+             long_only: bool = True, max_weight: float = None, risk_free: float = 0.0,
+             points: int = DEFAULT_POINTS):
+    """
+    Mean-variance efficient frontier, minimum-variance and maximum-Sharpe
+    weights for symbols, estimated from the daily returns of the last
+    `window` weekdays up to the session's sim_date (when portfolio_id is
+    given) or `end`, so nothing after that date is used. The covariance
+    comes from the shared cached moment state. Returns and volatility are annualised; risk_free is an
+    annual rate. Weights sum to 1; long_only keeps them >= 0 and
+    max_weight caps each one (and bounds shorts at -max_weight).
+    """
+    if portfolio_id is not None:
+        session = get_session(portfolio_id)
+        if not session:
+            return {"error": "No active session found"}
+        end = session["sim_date"]
+    elif end:
+        try:
+            datetime.strptime(end, "%Y-%m-%d")
+        except ValueError:
+            return {"error": "Invalid date format. Use YYYY-MM-DD"}
+    end = end or date.today().isoformat()
+
+    if not 2 <= window <= covariance.MAX_WINDOW:
+        return {"error": f"window must be between 2 and {covariance.MAX_WINDOW}"}
+    if not 2 <= points <= MAX_POINTS:
+        return {"error": f"points must be between 2 and {MAX_POINTS}"}
+    found, missing = resolve_symbols(symbols or [])
+    if len(found) < 2:
+        return {"error": "At least two known symbols are required"}
+    if max_weight is not None and max_weight <= 0:
+        return {"error": "max_weight must be positive"}
+
+    try:
+        min_periods = max(20, window // 4)
+        state = covariance.get_state(window, end)
+        found, absent = covariance.split_covered(state, found)
+        index = {aid: j for j, aid in enumerate(state.asset_ids.tolist())}
+        if len(found) >= 2:
+            mu, cov = annualized_moments(state, [index[aid] for _, aid in found], min_periods)
+    except Exception as e:
+        print(f"Error estimating moments: {e}")
+        return {"error": "Failed to load price history"}
+    missing = missing + absent
+    if len(found) < 2:
+        return {"error": f"At least two symbols with loaded price history are required (missing: {', '.join(missing)})"}
+    names = [sym for sym, _ in found]
+    n = len(found)
+    if max_weight is not None and max_weight * n < 1.0:
+        return {"error": f"max_weight must be at least 1/{n} for {n} assets"}
+
+    if long_only:
+        lower, upper = 0.0, min(max_weight or 1.0, 1.0)
+    elif max_weight is not None:
+        lower, upper = -max_weight, max_weight
+    else:
+        lower = upper = None
+
+    short = [s for s, m, v in zip(names, mu, np.diag(cov)) if not (np.isfinite(m) and np.isfinite(v))]
+    if not short:
+        i, j = np.nonzero(~np.isfinite(np.triu(cov)))
+        short = [f"{names[a]}/{names[b]}" for a, b in zip(i, j)]
+    if short:
+        return {"error": f"Not enough price history up to {end} for: {', '.join(short)}"}
+
+    gammas = gamma_grid(mu, cov, points)
+    frontier = solve_frontier(mu, cov, gammas, lower, upper)
+    tangency = max_sharpe_weights(mu, cov, risk_free, lower, upper, gammas, frontier)
+
+    curve = []
+    for weights in frontier:
+        point = _portfolio(weights, names, mu, cov, risk_free)
+        # Bounded frontiers flatten at the max-return corner; keep distinct points
+        if not curve or abs(point["expected_return"] - curve[-1]["expected_return"]) > 1e-9:
+            curve.append(point)
+
+    return {
+        "as_of": end,
+        "window": window,
+        "symbols": names,
+        "missing": missing,
+        "long_only": long_only,
+        "max_weight": max_weight,
+        "risk_free": risk_free,
+        "assets": {
+            s: {"expected_return": float(mu[i]), "volatility": float(np.sqrt(cov[i, i]))}
+            for i, s in enumerate(names)
+        },
+        "min_variance": _portfolio(frontier[0], names, mu, cov, risk_free),
+        "max_sharpe": _portfolio(tangency, names, mu, cov, risk_free) if tangency is not None else None,
+        "frontier": curve
+    }
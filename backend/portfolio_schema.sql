@@ -13,10 +13,18 @@ CREATE TABLE IF NOT EXISTS portfolios (
     name TEXT NOT NULL,
     currency_code TEXT DEFAULT 'USD',
     cash_balance NUMERIC DEFAULT 10000.00,
+    parent_portfolio_id INTEGER REFERENCES portfolios(id) ON DELETE CASCADE,
+    fork_txn_id INTEGER,
+    fork_date DATE,
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     UNIQUE(user_id, name)
 );
 
+-- Forks share the parent's ledger up to (fork_txn_id, fork_date) instead of copying it
+ALTER TABLE portfolios ADD COLUMN IF NOT EXISTS parent_portfolio_id INTEGER REFERENCES portfolios(id) ON DELETE CASCADE;
+ALTER TABLE portfolios ADD COLUMN IF NOT EXISTS fork_txn_id INTEGER;
+ALTER TABLE portfolios ADD COLUMN IF NOT EXISTS fork_date DATE;
+
 -- Transactions table
 CREATE TABLE IF NOT EXISTS transactions (
     id SERIAL PRIMARY KEY,
@@ -30,6 +38,30 @@ CREATE TABLE IF NOT EXISTS transactions (
     timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
 
+CREATE INDEX IF NOT EXISTS idx_transactions_portfolio_id ON transactions(portfolio_id);
+
+-- Transactions visible to a portfolio: its own plus, for a fork, every
+-- ancestor's up to the fork point (the tightest watermark along the chain).
+-- All ledger reads go through this function.
+CREATE OR REPLACE FUNCTION portfolio_ledger(p_id INTEGER)
+RETURNS SETOF transactions AS $$
+    WITH RECURSIVE chain (portfolio_id, max_txn, max_date) AS (
+        SELECT p_id, NULL::INTEGER, NULL::DATE
+        UNION ALL
+        SELECT p.parent_portfolio_id, LEAST(c.max_txn, p.fork_txn_id), LEAST(c.max_date, p.fork_date)
+        FROM chain c
+        JOIN portfolios p ON p.id = c.portfolio_id
+        WHERE p.parent_portfolio_id IS NOT NULL
+    )
+    SELECT t.*
+    FROM transactions t
+    JOIN chain c ON c.portfolio_id = t.portfolio_id
+    -- Chain ids as an array so the portfolio_id index is used (the CTE's row estimate is far too high)
+    WHERE t.portfolio_id = ANY (ARRAY(SELECT portfolio_id FROM chain))
+      AND (c.max_txn IS NULL OR t.id <= c.max_txn)
+      AND (c.max_date IS NULL OR t.date <= c.max_date)
+$$ LANGUAGE sql STABLE;
+
 -- Game Sessions table
 CREATE TABLE IF NOT EXISTS game_sessions (
     id SERIAL PRIMARY KEY,
@@ -39,10 +71,81 @@ CREATE TABLE IF NOT EXISTS game_sessions (
     sim_date DATE NOT NULL,
     monthly_salary NUMERIC DEFAULT 0,
     monthly_expenses NUMERIC DEFAULT 0,
+    contributed NUMERIC DEFAULT 0,
     is_active BOOLEAN DEFAULT TRUE,
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
 
+-- Initial cash plus net monthly income credited so far (basis for leaderboard returns)
+ALTER TABLE game_sessions ADD COLUMN IF NOT EXISTS contributed NUMERIC DEFAULT 0;
+
+-- Cash and positions of a session on arrival at each sim_date (start and every advance).
+-- txn_watermark is the newest ledger row included; forks start from a snapshot.
+CREATE TABLE IF NOT EXISTS session_snapshots (
+    session_id INTEGER REFERENCES game_sessions(id) ON DELETE CASCADE,
+    sim_date DATE NOT NULL,
+    cash NUMERIC NOT NULL,
+    contributed NUMERIC NOT NULL DEFAULT 0,
+    txn_watermark INTEGER NOT NULL DEFAULT 0,
+    asset_ids INTEGER[] NOT NULL DEFAULT '{}',
+    quantities DOUBLE PRECISION[] NOT NULL DEFAULT '{}',
+    PRIMARY KEY (session_id, sim_date)
+);
+
+-- Auto-invest plan: share of each month's net income bought on advance_time
+CREATE TABLE IF NOT EXISTS auto_invest_plans (
+    session_id INTEGER REFERENCES game_sessions(id) ON DELETE CASCADE,
+    asset_id INTEGER REFERENCES assets(id),
+    symbol TEXT NOT NULL,
+    weight NUMERIC NOT NULL CHECK (weight > 0),
+    PRIMARY KEY (session_id, asset_id)
+);
+
+-- Conditional orders (limit / stop / take-profit), evaluated on advance_time
+CREATE TABLE IF NOT EXISTS pending_orders (
+    id SERIAL PRIMARY KEY,
+    portfolio_id INTEGER REFERENCES portfolios(id) ON DELETE CASCADE,
+    asset_id INTEGER REFERENCES assets(id),
+    symbol TEXT NOT NULL,
+    side TEXT CHECK (side IN ('BUY', 'SELL')),
+    order_type TEXT CHECK (order_type IN ('LIMIT', 'STOP', 'TAKE_PROFIT')),
+    trigger_price NUMERIC NOT NULL,
+    quantity NUMERIC NOT NULL,
+    status TEXT DEFAULT 'OPEN' CHECK (status IN ('OPEN', 'FILLED', 'REJECTED', 'CANCELLED')),
+    created_date DATE NOT NULL,
+    filled_date DATE,
+    fill_price NUMERIC,
+    note TEXT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS idx_pending_orders_open ON pending_orders (portfolio_id) WHERE status = 'OPEN';
+
+-- Daily value path of a session, written by advance_time (flow = salary - expenses credited that day)
+CREATE TABLE IF NOT EXISTS session_equity (
+    session_id INTEGER REFERENCES game_sessions(id) ON DELETE CASCADE,
+    date DATE NOT NULL,
+    total_value DOUBLE PRECISION NOT NULL,
+    cash DOUBLE PRECISION NOT NULL,
+    flow DOUBLE PRECISION NOT NULL DEFAULT 0,
+    PRIMARY KEY (session_id, date)
+);
+
+-- Game rooms: sessions that advance in lockstep (classrooms, tournaments)
+CREATE TABLE IF NOT EXISTS game_rooms (
+    id SERIAL PRIMARY KEY,
+    name TEXT NOT NULL,
+    sim_date DATE NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS game_room_members (
+    room_id INTEGER REFERENCES game_rooms(id) ON DELETE CASCADE,
+    session_id INTEGER REFERENCES game_sessions(id) ON DELETE CASCADE,
+    joined_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (room_id, session_id)
+);
+
 -- Currencies
 CREATE TABLE IF NOT EXISTS currencies (
     code TEXT PRIMARY KEY,
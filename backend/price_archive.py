@@ -0,0 +1,67 @@
+import os
+from datetime import date
+import numpy as np
+
+# Optional archival layout for cold price history.
+#
+# Closed years can be moved out of the one-row-per-day prices table into
+# prices_archive: one row per (asset_id, year) holding float8 arrays plus a
+# bitmap of which days of the year have a price. The prices_all view unions
+# both layouts, so readers only need to pick the right relation.
+PRICE_ARCHIVE_ENABLED = os.getenv("PRICE_ARCHIVE_ENABLED", "false").lower() in ("1", "true", "yes")
+
+# Relation used for range reads (history, matrices). Point as-of lookups stay
+# on the indexed prices table and only fall back to the view on a miss.
+PRICE_SOURCE = "prices_all" if PRICE_ARCHIVE_ENABLED else "prices"
+
+DAYS_IN_MASK = 366
+
+
+def pack_year(year: int, dates, close, adj_close, volume):
+    """
+    Packs one asset-year of daily rows into the archive layout.
+    dates must all fall inside year. Returns a dict matching prices_archive
+    columns; day_mask bit n (LSB first, as read by get_bit()) is set when
+    Jan 1 + n has a price.
+    """
+    order = np.argsort(np.asarray(dates, dtype="datetime64[D]"))
+    days = np.asarray(dates, dtype="datetime64[D]")[order]
+    offsets = (days - np.datetime64(f"{year}-01-01", "D")).astype(np.int64)
+    if len(offsets) and (offsets.min() < 0 or offsets.max() >= DAYS_IN_MASK):
+        raise ValueError(f"Dates outside {year} passed to pack_year")
+
+    bits = np.zeros(DAYS_IN_MASK, dtype=np.uint8)
+    bits[offsets] = 1
+    return {
+        "year": year,
+        "first_date": days[0].item(),
+        "last_date": days[-1].item(),
+        "day_mask": np.packbits(bits, bitorder="little").tobytes(),
+        "close": np.asarray(close, dtype=float)[order].tolist(),
+        "adj_close": np.asarray(adj_close, dtype=float)[order].tolist(),
+        "volume": np.asarray(volume, dtype=np.int64)[order].tolist(),
+    }
+
+
+def unpack_year(year: int, day_mask: bytes, close, adj_close, volume):
+    """
+    Inverse of pack_year. Returns (dates as datetime64[D], close, adj_close, volume).
+    """
+    bits = np.unpackbits(np.frombuffer(bytes(day_mask), dtype=np.uint8), bitorder="little")
+    offsets = np.flatnonzero(bits)
+    dates = np.datetime64(f"{year}-01-01", "D") + offsets
+    return (
+        dates,
+        np.asarray(close, dtype=float),
+        np.asarray(adj_close, dtype=float),
+        np.asarray(volume, dtype=np.int64),
+    )
+
+
+def archivable_before(keep_years: int, today: date = None):
+    """
+    First year that must stay in the hot table when keeping keep_years of
+    recent history (the current year is never closed).
+    """
+    today = today or date.today()
+    return today.year - max(1, keep_years) + 1
@@ -0,0 +1,251 @@
+import numpy as np
+from .db_conn import get_db_connection
+from .db_prices import lookup_asset, get_asset_id, get_asset_start_dates
+from .db_aggregates import AGGREGATE_TABLES, pick_resolution
+from .price_archive import PRICE_SOURCE
+
+
+def resolve_symbols(symbols):
+    """
+    Resolves user supplied symbols to asset ids using the symbol dictionary.
+    Returns (found, missing) where found is a list of (SYMBOL, asset_id),
+    de-duplicated and in request order.
+    """
+    found = []
+    missing = []
+    seen = set()
+    seen_ids = set()
+    for raw in symbols:
+        sym = raw.strip().upper()
+        if not sym or sym in seen:
+            continue
+        seen.add(sym)
+        asset = lookup_asset(sym)
+        asset_id = asset["id"] if asset else get_asset_id(sym)
+        if not asset_id:
+            missing.append(sym)
+        elif asset_id not in seen_ids:
+            # "BTC" and "BTC-USD" are the same column
+            seen_ids.add(asset_id)
+            found.append((sym, asset_id))
+    return found, missing
+
+
+# Last price strictly before the window start, per asset (as-of seed).
+_SEED_ROWS_SQL = f"""
+        SELECT t.asset_id, p.date, p.adj_close
+        FROM unnest(%s::int[]) AS t(asset_id)
+        CROSS JOIN LATERAL (
+            SELECT date, adj_close
+            FROM {PRICE_SOURCE}
+            WHERE asset_id = t.asset_id AND date < %s
+            ORDER BY date DESC
+            LIMIT 1
+        ) p
+"""
+
+
+def _fetch_daily_rows(cur, asset_ids, start_date, end_date):
+    if start_date:
+        cur.execute(f"""
+            SELECT asset_id, date, adj_close
+            FROM {PRICE_SOURCE}
+            WHERE asset_id = ANY(%s) AND date >= %s AND date <= %s
+            UNION ALL
+        """ + _SEED_ROWS_SQL, (asset_ids, start_date, end_date, asset_ids, start_date))
+    else:
+        cur.execute(f"""
+            SELECT asset_id, date, adj_close
+            FROM {PRICE_SOURCE}
+            WHERE asset_id = ANY(%s) AND date <= %s
+        """, (asset_ids, end_date))
+    return cur.fetchall()
+
+
+def _fetch_aggregate_rows(cur, asset_ids, start_date, end_date, resolution):
+    """
+    Closed periods from the aggregate table, labelled with the period's last
+    calendar day so every asset lands on the same axis point, followed by the
+    daily rows of the (still open) period containing end_date.
+    Returns None if the aggregates have not been built for these assets.
+    """
+    table, unit = AGGREGATE_TABLES[resolution]
+    cur.execute(f"""
+        SELECT asset_id, (period_start + interval '1 {unit}' - interval '1 day')::date, adj_close, TRUE
+        FROM {table}
+        WHERE asset_id = ANY(%s)
+          AND period_start >= date_trunc('{unit}', COALESCE(%s::date, '-infinity'::date))
+          AND period_start < date_trunc('{unit}', %s::date)
+        UNION ALL
+        SELECT asset_id, date, adj_close, FALSE
+        FROM {PRICE_SOURCE}
+        WHERE asset_id = ANY(%s)
+          AND date >= GREATEST(date_trunc('{unit}', %s::date)::date, COALESCE(%s::date, '-infinity'::date))
+          AND date <= %s
+    """ + (f"UNION ALL SELECT asset_id, date, adj_close, FALSE FROM ({_SEED_ROWS_SQL}) seed" if start_date else ""),
+        (asset_ids, start_date, end_date, asset_ids, end_date, start_date, end_date)
+        + ((asset_ids, start_date) if start_date else ()))
+    rows = cur.fetchall()
+    if not any(r[3] for r in rows):
+        return None
+    return [r[:3] for r in rows]
+
+
+def fetch_price_rows(asset_ids, start_date, end_date, resolution: str = "daily"):
+    """
+    One query over prices for every asset in the window [start_date, end_date].
+    When start_date is given, the last price *before* it is included for each
+    asset as well, so columns can be forward-filled from the very first day.
+
+    resolution "weekly" / "monthly" reads the precomputed aggregate tables
+    (falling back to daily rows if they are not populated).
+
+    Returns NumPy arrays (asset_ids, dates as datetime64[D], adj_close).
+    """
+    asset_ids = [int(a) for a in asset_ids]
+    with get_db_connection() as conn:
+        cur = conn.cursor()
+        rows = None
+        if resolution in AGGREGATE_TABLES:
+            try:
+                rows = _fetch_aggregate_rows(cur, asset_ids, start_date, end_date, resolution)
+            except Exception as e:
+                print(f"WARNING: {resolution} aggregates unavailable, using daily prices: {e}")
+                conn.rollback()
+        if rows is None:
+            rows = _fetch_daily_rows(cur, asset_ids, start_date, end_date)
+
+    if not rows:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype="datetime64[D]"), np.empty(0)
+
+    ids, dates, prices = zip(*rows)
+    return (
+        np.array(ids, dtype=np.int64),
+        np.array(dates, dtype="datetime64[D]"),
+        np.array(prices, dtype=float),
+    )
+
+
+def forward_fill(matrix):
+    """
+    Column-wise forward fill of NaNs (leading NaNs stay NaN).
+    """
+    if matrix.size == 0:
+        return matrix
+    valid = ~np.isnan(matrix)
+    idx = np.where(valid, np.arange(matrix.shape[0])[:, None], 0)
+    np.maximum.accumulate(idx, axis=0, out=idx)
+    return matrix[idx, np.arange(matrix.shape[1])]
+
+
+def align_prices(row_assets, row_dates, row_prices, asset_ids, start_date=None):
+    """
+    Outer-joins long-format price rows into a (dates x assets) matrix.
+
+    The date axis is the union of all dates in the window, so crypto (daily)
+    and equities (trading days) share one calendar. Gaps are forward-filled
+    with the last known price (as-of semantics). Rows dated before start_date
+    only seed the fill and never appear on the axis.
+    """
+    asset_ids = np.asarray(asset_ids, dtype=np.int64)
+    order = np.argsort(asset_ids)
+    col = order[np.searchsorted(asset_ids, row_assets, sorter=order)]
+
+    if start_date is not None:
+        in_window = row_dates >= np.datetime64(start_date, "D")
+    else:
+        in_window = np.ones(len(row_dates), dtype=bool)
+
+    axis = np.unique(row_dates[in_window])
+
+    # Row 0 holds the pre-window seed prices and is dropped after filling.
+    matrix = np.full((len(axis) + 1, len(asset_ids)), np.nan)
+    seed = ~in_window
+    matrix[0, col[seed]] = row_prices[seed]
+    rows = np.searchsorted(axis, row_dates[in_window]) + 1
+    matrix[rows, col[in_window]] = row_prices[in_window]
+
+    return axis, forward_fill(matrix)[1:]
+
+
+def load_price_matrix(asset_ids, start_date, end_date, resolution: str = "daily"):
+    """
+    Loads an aligned, forward-filled price matrix for asset_ids.
+    Returns (dates, matrix) with matrix[:, j] belonging to asset_ids[j].
+    """
+    row_assets, row_dates, row_prices = fetch_price_rows(asset_ids, start_date, end_date, resolution)
+    return align_prices(row_assets, row_dates, row_prices, asset_ids, start_date)
+
+
+def load_quote_matrix(asset_ids, start: str, end: str):
+    """
+    Raw (dates x assets) closes in [start, end] with no forward fill (NaN
+    where an asset did not trade), plus each asset's last close before start.
+    Returns (dates, quotes, before).
+    """
+    row_assets, row_dates, row_prices = fetch_price_rows(asset_ids, start, end)
+    order = np.argsort(asset_ids)
+    cols = order[np.searchsorted(np.asarray(asset_ids)[order], row_assets)]
+    seed = row_dates < np.datetime64(start, "D")
+
+    before = np.full(len(asset_ids), np.nan)
+    # Seed rows hold one row per asset: the last close before start
+    before[cols[seed]] = row_prices[seed]
+    axis = np.unique(row_dates[~seed])
+    quotes = np.full((len(axis), len(asset_ids)), np.nan)
+    quotes[np.searchsorted(axis, row_dates[~seed]), cols[~seed]] = row_prices[~seed]
+    return axis, quotes, before
+
+
+def normalize_columns(matrix, base=100.0):
+    """
+    Rescales each column so its first available value equals base.
+    """
+    if matrix.size == 0:
+        return matrix
+    valid = ~np.isnan(matrix)
+    first_row = np.argmax(valid, axis=0)
+    first = matrix[first_row, np.arange(matrix.shape[1])]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return matrix / first * base
+
+
+def to_json_column(values):
+    """
+    Converts a float column to a JSON friendly list (NaN -> None).
+    """
+    return np.where(np.isnan(values), None, values).tolist()
+
+
+def get_multi_history(symbols, start_date, end_date, normalize: bool = False, resolution: str = "auto"):
+    """
+    Returns several symbols' history on a single date axis:
+    { dates: [...], series: { SYMBOL: [price or None, ...] }, missing: [...] }
+    """
+    found, missing = resolve_symbols(symbols)
+    result = {"start": start_date, "end": end_date, "dates": [], "series": {}, "missing": missing}
+    if not found:
+        return result
+
+    asset_ids = [aid for _, aid in found]
+    if resolution == "auto":
+        first_date = start_date
+        if not first_date:
+            start_dates = get_asset_start_dates()
+            known = [start_dates[aid] for aid in asset_ids if aid in start_dates]
+            first_date = min(known) if known else None
+        resolution = pick_resolution(first_date, end_date)
+    result["resolution"] = resolution
+
+    try:
+        dates, matrix = load_price_matrix(asset_ids, start_date, end_date, resolution)
+    except Exception as e:
+        print(f"Error fetching multi history: {e}")
+        return None
+
+    if normalize:
+        matrix = normalize_columns(matrix)
+
+    result["dates"] = [str(d) for d in dates]
+    result["series"] = {sym: to_json_column(matrix[:, j]) for j, (sym, _) in enumerate(found)}
+    return result
@@ -0,0 +1,170 @@
+import numpy as np
+from datetime import datetime
+from functools import lru_cache
+from .db_prices import lookup_asset, get_cache_generation
+from .price_matrix import load_price_matrix
+from . import db_portfolio as portfolio
+from . import game_engine
+
+# Step sizes: monthly steps use month-end closes, daily steps trading days.
+STEPS_PER_MONTH = {"monthly": 1, "daily": 21}
+DEFAULT_BLOCK = {"monthly": 6, "daily": 20}
+PERCENTILES = (5, 25, 50, 75, 95)
+MAX_PATHS = 50000
+# paths x steps per asset kept in memory at once
+MAX_CELLS = 6_000_000
+
+
+@lru_cache(maxsize=32)
+def historical_returns(asset_ids: tuple, end_date: str, frequency: str, lookback_years: int, generation: int):
+    """
+    (periods x assets) simple returns over the lookback window ending at
+    end_date, keeping only periods where every asset has a return so that
+    resampled rows carry real cross-asset co-movement.
+    Cached per asset set; generation is part of the key only.
+    """
+    end = np.datetime64(end_date, "D")
+    start = str(end - np.timedelta64(int(lookback_years * 365.25), "D"))
+    dates, prices = load_price_matrix(list(asset_ids), start, end_date)
+    if frequency == "monthly" and len(dates):
+        months = dates.astype("datetime64[M]")
+        # Last trading row of every month
+        prices = prices[np.concatenate([months[1:] != months[:-1], [True]])]
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        returns = prices[1:] / prices[:-1] - 1.0
+    complete = np.isfinite(returns).all(axis=1)
+    returns = returns[complete]
+    returns.flags.writeable = False
+    return returns
+
+
+def block_indices(n_rows: int, steps: int, paths: int, block: int, rng):
+    """
+    Row indices for a moving-block bootstrap, shape (steps, paths): each path
+    is a concatenation of random contiguous blocks of `block` historical periods.
+    """
+    block = max(1, min(block, n_rows))
+    n_blocks = -(-steps // block)
+    starts = rng.integers(0, n_rows - block + 1, size=(n_blocks, 1, paths))
+    idx = starts + np.arange(block)[None, :, None]
+    return idx.reshape(n_blocks * block, paths)[:steps]
+
+
+def simulate_paths(returns, values, cash: float, flow: float, steps: int, steps_per_month: int,
+                   paths: int, block: int, rng):
+    """
+    Total portfolio value per step and path, shape (steps + 1, paths).
+
+    Holdings drift with resampled returns. A positive monthly net flow is
+    invested at the current weights at every month end; a negative one is
+    drawn from cash. Per asset, with G the cumulative growth:
+        V[t] = G[t] * (V0 + sum_{k <= t} c_k / G[k])
+    so the path needs no Python loop over steps. Arrays are time-major so
+    the cumulative products run over contiguous rows, in place.
+    """
+    values = np.asarray(values, dtype=float)
+    total0 = values.sum()
+    weights = values / total0 if total0 > 0 else np.full(len(values), 1.0 / len(values))
+
+    months = np.zeros(steps)
+    months[steps_per_month - 1::steps_per_month] = 1.0
+    invested = max(flow, 0.0) * months
+    cash_path = cash + np.concatenate([[0.0], np.cumsum(min(flow, 0.0) * months)])
+
+    idx = block_indices(len(returns), steps, paths, block, rng)
+    by_asset = np.ascontiguousarray(returns.T)
+    total = np.empty((steps + 1, paths))
+    total[0] = total0
+    total[1:] = 0.0
+    for j in range(len(values)):
+        growth = by_asset[j][idx]
+        growth += 1.0
+        np.cumprod(growth, axis=0, out=growth)
+        if flow > 0:
+            held = np.divide((weights[j] * invested)[:, None], growth)
+            np.cumsum(held, axis=0, out=held)
+            held += values[j]
+            held *= growth
+            total[1:] += held
+        else:
+            growth *= values[j]
+            total[1:] += growth
+    total += cash_path[:, None]
+    return total
+
+
+def project_portfolio(portfolio_id: int, years: float = 10, paths: int = 10000, frequency: str = "monthly",
+                      block: int = None, lookback_years: int = 20, seed: int = None):
+    """
+    Monte Carlo projection of a session portfolio from its current sim_date,
+    resampling history up to that date only (no look-ahead).
+    Returns percentile bands of total value per month.
+    """
+    if frequency not in STEPS_PER_MONTH:
+        return {"error": f"Unknown frequency '{frequency}'. Use one of: {', '.join(STEPS_PER_MONTH)}"}
+    if not 0 < paths <= MAX_PATHS:
+        return {"error": f"paths must be between 1 and {MAX_PATHS}"}
+    months = int(round(years * 12))
+    if months <= 0:
+        return {"error": "years must be positive"}
+    steps_per_month = STEPS_PER_MONTH[frequency]
+    steps = months * steps_per_month
+    if paths * steps > MAX_CELLS:
+        return {"error": f"paths x steps exceeds {MAX_CELLS}; use fewer paths, fewer years or monthly steps"}
+
+    session = game_engine.get_session(portfolio_id)
+    if not session:
+        return {"error": "No active session found"}
+    sim_date = session["sim_date"]
+    flow = session["monthly_salary"] - session["monthly_expenses"]
+
+    current = portfolio.get_portfolio_value(portfolio_id, sim_date)
+    if not current:
+        return {"error": "Portfolio not found or error calculating value"}
+
+    held = {}
+    for h in current["holdings"]:
+        asset = lookup_asset(h["symbol"])
+        if asset and h["value"] > 0:
+            held[asset["id"]] = held.get(asset["id"], 0.0) + h["value"]
+    if not held:
+        # All cash: project the cash flows alone
+        cash_path = current["cash"] + flow * np.arange(months + 1)
+        bands = {f"p{q}": cash_path.tolist() for q in PERCENTILES}
+        return _result(sim_date, months, bands, current["total_value"], flow, paths, 0)
+
+    asset_ids = tuple(sorted(held))
+    try:
+        returns = historical_returns(asset_ids, sim_date, frequency, lookback_years, get_cache_generation())
+    except Exception as e:
+        print(f"Error loading projection history: {e}")
+        return {"error": "Failed to load price data"}
+    block = block or DEFAULT_BLOCK[frequency]
+    if len(returns) < 2 * block:
+        return {"error": "Not enough common price history for these holdings"}
+
+    rng = np.random.default_rng(seed)
+    values = [held[aid] for aid in asset_ids]
+    total = simulate_paths(returns, values, current["cash"], flow, steps, steps_per_month, paths, block, rng)
+
+    monthly = total[::steps_per_month]
+    bands = np.percentile(monthly, PERCENTILES, axis=1)
+    result = _result(sim_date, months, {f"p{q}": b.tolist() for q, b in zip(PERCENTILES, bands)},
+                     current["total_value"], flow, paths, len(returns))
+    paid_in = current["total_value"] + max(flow, 0.0) * months
+    result["prob_below_contributions"] = float(np.mean(monthly[-1] < paid_in))
+    return result
+
+
+def _result(sim_date, months, bands, start_value, flow, paths, sample_periods):
+    start = np.datetime64(datetime.strptime(sim_date, "%Y-%m-%d").date(), "M")
+    return {
+        "start_date": sim_date,
+        "months": [str(start + np.timedelta64(m, "M")) for m in range(months + 1)],
+        "bands": bands,
+        "start_value": start_value,
+        "monthly_net_flow": flow,
+        "paths": paths,
+        "sample_periods": sample_periods,
+    }
@@ -0,0 +1,186 @@
+import numpy as np
+from datetime import datetime, timedelta
+from functools import lru_cache
+from .db_conn import get_db_connection
+from .db_prices import get_cache_generation
+from .price_matrix import load_price_matrix
+
+HORIZONS = (1, 10)
+DEFAULT_WINDOW = 500
+MAX_WINDOW = 2520
+MIN_OBSERVATIONS = 30
+
+# name -> (label, start, end): peak-to-trough windows replayed on current holdings
+SCENARIOS = {
+    "dotcom": ("Dot-com crash", "2000-03-24", "2002-10-09"),
+    "gfc_2008": ("2008 financial crisis", "2007-10-09", "2009-03-09"),
+    "covid_2020": ("March 2020 COVID crash", "2020-02-19", "2020-03-23"),
+    "drawdown_2022": ("2022 drawdown", "2022-01-03", "2022-10-12"),
+}
+
+
+def historical_var(pnl, confidence: float):
+    """
+    (VaR, expected shortfall) of a sample of P&L outcomes, both as positive
+    losses: VaR is the (1 - confidence) quantile loss, ES the mean loss at
+    or beyond it.
+    """
+    pnl = np.asarray(pnl, dtype=float)
+    cutoff = np.quantile(pnl, 1.0 - confidence)
+    return float(-cutoff), float(-pnl[pnl <= cutoff].mean())
+
+
+def horizon_pnl(prices, values, horizon: int):
+    """
+    P&L of holding `values` over every overlapping `horizon`-row window of a
+    forward-filled (dates x assets) price matrix: one matrix-vector product.
+    Assets without a price at a window's start contribute nothing to it.
+    """
+    with np.errstate(invalid="ignore", divide="ignore"):
+        returns = prices[horizon:] / prices[:-horizon] - 1.0
+    return np.where(np.isfinite(returns), returns, 0.0) @ values
+
+
+def scenario_path(dates, prices, values, start: str, end: str):
+    """
+    P&L path of holding `values` from the as-of prices at start through end.
+    Returns (path dates, path P&L, covered asset mask).
+    """
+    base = np.searchsorted(dates, np.datetime64(start, "D"), side="right") - 1
+    stop = np.searchsorted(dates, np.datetime64(end, "D"), side="right")
+    if stop == 0:
+        return dates[:0], np.empty(0), np.zeros(prices.shape[1], dtype=bool)
+    base = max(base, 0)
+    anchor = prices[base]
+    covered = np.isfinite(anchor) & (anchor > 0)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        path = prices[base:stop] / anchor - 1.0
+    path = np.where(np.isfinite(path) & covered, path, 0.0)
+    return dates[base:stop], path @ values, covered
+
+
+def _positions(cur, portfolio_id: int):
+    """
+    (as_of, cash, ((asset_id, symbol, quantity), ...)) as of the active
+    session's sim_date (today without a session), or None if the portfolio
+    does not exist.
+    """
+    cur.execute("""
+        SELECT COALESCE(s.sim_date, CURRENT_DATE), p.cash_balance
+        FROM portfolios p
+        LEFT JOIN game_sessions s ON s.portfolio_id = p.id AND s.is_active = TRUE
+        WHERE p.id = %s
+    """, (portfolio_id,))
+    row = cur.fetchone()
+    if not row:
+        return None
+    as_of, cash = row
+    cur.execute("""
+        SELECT asset_id, symbol, SUM(CASE WHEN type = 'BUY' THEN quantity ELSE -quantity END)::float8 AS qty
+        FROM portfolio_ledger(%s)
+        WHERE date <= %s
+        GROUP BY asset_id, symbol
+        HAVING SUM(CASE WHEN type = 'BUY' THEN quantity ELSE -quantity END) > 1e-12
+        ORDER BY asset_id
+    """, (portfolio_id, as_of))
+    return str(as_of), float(cash), tuple(cur.fetchall())
+
+
+@lru_cache(maxsize=256)
+def _cached_risk(positions, cash: float, as_of: str, confidence: float, window: int, generation: int):
+    """
+    Risk of a set of positions on a date. Keyed by the positions themselves,
+    so a trade or a sim-date move is a new entry and identical holdings share one.
+    """
+    asset_ids = [aid for aid, _, _ in positions]
+    symbols = [sym for _, sym, _ in positions]
+    quantities = np.array([qty for _, _, qty in positions], dtype=float)
+
+    scenarios = {k: v for k, v in SCENARIOS.items() if v[2] <= as_of}
+    var_start = datetime.strptime(as_of, "%Y-%m-%d").date() - timedelta(days=int(window * 1.5) + 30)
+    start = min([var_start.isoformat()] + [v[1] for v in scenarios.values()])
+    dates, prices = load_price_matrix(asset_ids, start, as_of) if asset_ids else (np.empty(0, dtype="datetime64[D]"), np.empty((0, 0)))
+
+    last = prices[-1] if len(prices) else np.full(len(asset_ids), np.nan)
+    priced = np.isfinite(last)
+    values = np.where(priced, quantities * np.where(priced, last, 0.0), 0.0)
+    invested = float(values.sum())
+    total = cash + invested
+
+    # Every horizon samples the same last window + 1 price rows (overlapping for 10 days)
+    recent = prices[-(window + 1):]
+    var = {}
+    for horizon in HORIZONS:
+        pnl = horizon_pnl(recent, values, horizon) if len(recent) > horizon else np.empty(0)
+        if not asset_ids:
+            # All cash: nothing at risk
+            var[f"{horizon}d"] = {"var": 0.0, "es": 0.0, "var_pct": 0.0, "es_pct": 0.0, "observations": 0}
+            continue
+        if len(pnl) < MIN_OBSERVATIONS:
+            var[f"{horizon}d"] = None
+            continue
+        loss, shortfall = historical_var(pnl, confidence)
+        var[f"{horizon}d"] = {
+            "var": loss,
+            "es": shortfall,
+            "var_pct": loss / total * 100 if total else 0.0,
+            "es_pct": shortfall / total * 100 if total else 0.0,
+            "observations": len(pnl)
+        }
+
+    replayed = []
+    for name, (label, s_start, s_end) in scenarios.items():
+        path_dates, path, covered = scenario_path(dates, prices, values, s_start, s_end)
+        if not len(path):
+            continue
+        trough = int(np.argmin(path))
+        replayed.append({
+            "name": name,
+            "label": label,
+            "start": s_start,
+            "end": s_end,
+            "pnl": float(path[-1]),
+            "return_pct": float(path[-1]) / total * 100 if total else 0.0,
+            "trough_pnl": float(path[trough]),
+            "trough_date": str(path_dates[trough]),
+            # Positions not yet listed at the window start are held flat
+            "uncovered": [s for s, ok, v in zip(symbols, covered, values) if not ok and v > 0]
+        })
+
+    return {
+        "date": as_of,
+        "total_value": total,
+        "cash": cash,
+        "invested": invested,
+        "confidence": confidence,
+        "window": window,
+        "var": var,
+        "scenarios": replayed,
+        "skipped_scenarios": [k for k in SCENARIOS if k not in scenarios],
+        "missing_prices": [s for s, ok in zip(symbols, priced) if not ok]
+    }
+
+
+def portfolio_risk(portfolio_id: int, confidence: float = 0.95, window: int = DEFAULT_WINDOW):
+    """
+    Historical-simulation VaR and expected shortfall over 1 and 10 days,
+    plus named stress windows replayed on the holdings at the session's
+    sim_date. All from one aligned price matrix of the held assets; only
+    prices up to sim_date are used, and scenarios that end after it are
+    skipped. Amounts are USD.
+    """
+    if not 0.5 <= confidence < 1.0:
+        return {"error": "confidence must be in [0.5, 1)"}
+    if not MIN_OBSERVATIONS <= window <= MAX_WINDOW:
+        return {"error": f"window must be between {MIN_OBSERVATIONS} and {MAX_WINDOW}"}
+    try:
+        with get_db_connection() as conn:
+            state = _positions(conn.cursor(), portfolio_id)
+        if state is None:
+            return {"error": "Portfolio not found"}
+        as_of, cash, positions = state
+        result = _cached_risk(positions, cash, as_of, confidence, window, get_cache_generation())
+        return {"portfolio_id": portfolio_id, **result}
+    except Exception as e:
+        print(f"Error computing risk: {e}")
+        return {"error": "Failed to compute risk"}
@@ -0,0 +1,148 @@
+import numpy as np
+from datetime import date, datetime, timedelta
+from functools import lru_cache
+from .db_prices import get_assets_metadata, get_cache_generation, get_data_version
+from .price_matrix import forward_fill, load_quote_matrix
+from . import metrics
+
+PERIODS = {"1m": 30, "3m": 91, "1y": 365}
+SORTS = ("return", "volatility", "max_drawdown", "price", "symbol")
+MAX_LIMIT = 500
+
+
+def screen_matrix(dates, quotes, before, start: str, end: str):
+    """
+    Per-column statistics of a raw (dates x assets) quote matrix (NaN where
+    an asset did not trade), seeded with each asset's last close before the
+    window [start, end]. Returns a dict of arrays:
+        price        last close
+        return       last close over the seed (or first in-window close)
+        volatility   annualised std of returns on the days the asset traded
+        max_drawdown worst peak-to-trough of the forward-filled closes
+        partial      True when the asset started trading inside the window
+        traded       at least one close inside the window
+    """
+    filled = forward_fill(np.vstack([before, quotes]))
+    prev = filled[:-1]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        returns = quotes / prev - 1.0
+    valid = np.isfinite(returns) & (prev > 0)
+    counts = valid.sum(axis=0)
+
+    traded = np.isfinite(quotes).any(axis=0)
+    partial = ~np.isfinite(before)
+    first = filled[np.argmax(np.isfinite(filled), axis=0), np.arange(filled.shape[1])]
+    last = filled[-1]
+
+    # Each asset at its own frequency (crypto trades every day, equities do
+    # not) over its own span: from start, or its first close if it listed later
+    first_row = np.argmax(np.isfinite(quotes), axis=0)
+    since = np.where(partial, dates[first_row], np.datetime64(start, "D")) if len(dates) else np.datetime64(start, "D")
+    years = (np.datetime64(end, "D") - since).astype("timedelta64[D]").astype(float) / 365.25
+
+    x = np.where(valid, returns, 0.0)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean = x.sum(axis=0) / counts
+        var = ((x - mean) ** 2 * valid).sum(axis=0) / (counts - 1)
+        volatility = np.where(years > 0, np.sqrt(var * counts / years), np.nan)
+        total = last / first - 1.0
+    volatility[counts < 2] = np.nan
+    dd = metrics.drawdown_series(filled)
+    return {
+        "price": last,
+        "return": total,
+        "volatility": volatility,
+        "max_drawdown": np.nanmin(np.where(np.isfinite(dd), dd, 0.0), axis=0),
+        "partial": partial,
+        "traded": traded,
+    }
+
+
+@lru_cache(maxsize=32)
+def _screen(as_of: str, period: str, generation: int, data_version: int = None):
+    """
+    Statistics for every asset over the period ending at as_of, from one
+    price query and one vectorized pass. Cached per (date, period);
+    data_version keys windows that reach today, whose prices may still be
+    arriving.
+    """
+    assets = get_assets_metadata()
+    asset_ids = [a["id"] for a in assets]
+    start = (datetime.strptime(as_of, "%Y-%m-%d").date() - timedelta(days=PERIODS[period])).isoformat()
+    axis, quotes, before = load_quote_matrix(asset_ids, start, as_of)
+    stats = screen_matrix(axis, quotes, before, start, as_of)
+
+    keep = stats["traded"]
+    rows = [asset for asset, k in zip(assets, keep) if k]
+    return rows, {k: v[keep] for k, v in stats.items() if k != "traded"}
+
+
+def screen(as_of: str = None, period: str = "1m", sort: str = "return", order: str = "desc",
+           asset_type: str = None, limit: int = 20, offset: int = 0):
+    """
+    Ranks every asset that traded in the `period` before as_of (default
+    today) by return, volatility, drawdown, price or symbol. Filtering by
+    type, sorting and pagination run on the cached statistics.
+    """
+    if period not in PERIODS:
+        return {"error": f"Unknown period '{period}'. Use one of: {', '.join(PERIODS)}"}
+    if sort not in SORTS:
+        return {"error": f"Unknown sort '{sort}'. Use one of: {', '.join(SORTS)}"}
+    if order not in ("asc", "desc"):
+        return {"error": "order must be 'asc' or 'desc'"}
+    if not 0 < limit <= MAX_LIMIT or offset < 0:
+        return {"error": f"limit must be between 1 and {MAX_LIMIT} and offset >= 0"}
+    if as_of:
+        try:
+            datetime.strptime(as_of, "%Y-%m-%d")
+        except ValueError:
+            return {"error": "Invalid date format. Use YYYY-MM-DD"}
+    today = date.today().isoformat()
+    as_of = as_of or today
+
+    try:
+        # Today's prices may not be loaded yet: key on the price tables' write counters
+        data_version = get_data_version() if as_of >= today else None
+        assets, stats = _screen(as_of, period, get_cache_generation(), data_version)
+    except Exception as e:
+        print(f"Error running screener: {e}")
+        return {"error": "Failed to run screener"}
+
+    selected = np.arange(len(assets))
+    if asset_type:
+        wanted = asset_type.lower()
+        selected = selected[[(assets[i]["type"] or "").lower() == wanted for i in selected]]
+
+    if sort == "symbol":
+        ranked = sorted(selected, key=lambda i: assets[i]["symbol"], reverse=order == "desc")
+    else:
+        values = stats[sort][selected]
+        # NaNs (too little history) always sort last
+        keys = np.where(np.isnan(values), np.inf, -values if order == "desc" else values)
+        ranked = selected[np.argsort(keys, kind="stable")]
+
+    page = ranked[offset:offset + limit]
+    return {
+        "date": as_of,
+        "period": period,
+        "sort": sort,
+        "order": order,
+        "type": asset_type,
+        "total": len(selected),
+        "offset": offset,
+        "results": [{
+            "symbol": assets[i]["symbol"],
+            "name": assets[i]["name"],
+            "type": assets[i]["type"],
+            "currency": assets[i]["currency"],
+            "price": float(stats["price"][i]),
+            "return": _number(stats["return"][i]),
+            "volatility": _number(stats["volatility"][i]),
+            "max_drawdown": _number(stats["max_drawdown"][i]),
+            "partial": bool(stats["partial"][i])
+        } for i in page]
+    }
+
+
+def _number(value):
+    return float(value) if np.isfinite(value) else None
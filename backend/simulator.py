@@ -1,4 +1,8 @@
-from .db_prices import get_adj_close
+import numpy as np
+from functools import lru_cache
+from .db_prices import get_adj_close, lookup_asset, get_last_price_date, get_cache_generation
+from .price_matrix import load_price_matrix
+from .backtest import period_starts, FREQUENCIES
 
 
 def simulate_invest(amount: float, symbol: str, buy_date: str, sell_date: str):
@@ -23,3 +27,69 @@ def simulate_invest(amount: float, symbol: str, buy_date: str, sell_date: str):
 
     return round(value, 2)
 
+
+@lru_cache(maxsize=64)
+def _period_prices(asset_id: int, freq: str, last_date: str, generation: int):
+    """
+    Period-start dates and prices of an asset. Only the vector is cached;
+    the quadratic matrix is rebuilt per request.
+    last_date and generation are part of the key only, so a new price row
+    or a cache invalidation produces a fresh entry.
+    """
+    dates, matrix = load_price_matrix([asset_id], None, last_date)
+    prices = matrix[:, 0]
+    keep = period_starts(dates, freq) & np.isfinite(prices) & (prices > 0)
+    dates, prices = dates[keep], prices[keep]
+    prices.flags.writeable = False
+    return dates, prices
+
+
+def extreme_holds(prices):
+    """
+    (buy, sell) index pairs of the best and worst growth p[j] / p[i] over
+    every hold with j > i, in one pass: each sell date is matched against
+    the lowest (best) or highest (worst) price before it.
+    """
+    later = prices[1:]
+    best_sell = int(np.argmax(later / np.minimum.accumulate(prices[:-1]))) + 1
+    worst_sell = int(np.argmin(later / np.maximum.accumulate(prices[:-1]))) + 1
+    best = (int(np.argmin(prices[:best_sell])), best_sell)
+    worst = (int(np.argmax(prices[:worst_sell])), worst_sell)
+    return best, worst
+
+
+def simulate_invest_matrix(amount: float, symbol: str, freq: str = "monthly"):
+    """
+    Lump-sum outcome of investing <amount> on every period start and selling
+    on the same or any later period start, from one outer division of the
+    price series. values[i][k] is the value when buying on dates[i] and
+    selling on dates[i + k]; best and worst only consider holds with k > 0.
+    """
+    if freq not in FREQUENCIES:
+        return {"error": f"Unknown frequency '{freq}'. Use one of: {', '.join(FREQUENCIES)}"}
+    asset = lookup_asset(symbol)
+    if not asset:
+        return {"error": f"Unknown symbol {symbol}"}
+    last_date = get_last_price_date(asset["id"])
+    if not last_date:
+        return {"error": f"No price data for {symbol}"}
+
+    try:
+        dates, prices = _period_prices(asset["id"], freq, last_date, get_cache_generation())
+    except Exception as e:
+        print(f"Error building simulate matrix for {symbol}: {e}")
+        return {"error": "Failed to load price data"}
+    if len(dates) < 2:
+        return {"error": "Not enough price history for this frequency"}
+
+    values = np.round(prices[None, :] / prices[:, None] * amount, 2)
+    best, worst = extreme_holds(prices)
+    return {
+        "symbol": asset["symbol"],
+        "amount": amount,
+        "freq": freq,
+        "dates": [str(d) for d in dates],
+        "values": [values[i, i:].tolist() for i in range(len(dates))],
+        "best": {"buy": str(dates[best[0]]), "sell": str(dates[best[1]]), "value": float(values[best])},
+        "worst": {"buy": str(dates[worst[0]]), "sell": str(dates[worst[1]]), "value": float(values[worst])},
+    }
@@ -0,0 +1,228 @@
+import os
+import json
+import itertools
+import multiprocessing
+import threading
+import numpy as np
+from collections import OrderedDict
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import shared_memory
+from . import price_matrix
+from .backtest import run_strategy, STRATEGIES
+
+# Parameters a sweep grid may vary. "start" moves the backtest start date
+# inside the shared snapshot; the rest are passed to backtest.run_strategy.
+SWEEP_PARAMS = ("start", "initial_cash", "contribution", "frequency", "fast", "slow")
+MAX_COMBINATIONS = 5000
+MAX_WORKERS = int(os.getenv("SWEEP_MAX_WORKERS", os.cpu_count() or 1))
+MAX_ATTACHED = 4
+
+# One process pool shared by every sweep, started on first use: spawning
+# interpreters and importing numpy per request costs more than a small
+# sweep. Each sweep ships its own snapshot name with its tasks. Workers come
+# from a forkserver, not a fork of the threaded server, so they never
+# inherit a lock (DB pool, BLAS threads) another thread held at fork time.
+_pool = None
+_pool_lock = threading.Lock()
+
+# Worker-side views of shared snapshots, attached on first use: name -> (shm, dates, prices)
+_snapshots = OrderedDict()
+
+
+def expand_grid(grid):
+    """
+    Cartesian product of a {param: [values]} grid as a list of dicts,
+    in a stable order (keys sorted) so result indexes are reproducible.
+    """
+    keys = sorted(grid)
+    return [dict(zip(keys, combo)) for combo in itertools.product(*(grid[k] for k in keys))]
+
+
+class PriceSnapshot:
+    """
+    Read-only (dates x assets) price matrix copied once into shared memory.
+    Worker processes map the same pages instead of receiving a pickled copy
+    per task or re-querying the database.
+    """
+
+    def __init__(self, dates, prices):
+        self.shape = prices.shape
+        n = len(dates)
+        self._shm = shared_memory.SharedMemory(create=True, size=max(1, n * 8 + prices.size * 8))
+        np.ndarray((n,), dtype=np.int64, buffer=self._shm.buf)[:] = dates.astype("datetime64[D]").astype(np.int64)
+        np.ndarray(self.shape, dtype=np.float64, buffer=self._shm.buf, offset=n * 8)[:] = prices
+
+    @property
+    def name(self):
+        return self._shm.name
+
+    def release(self):
+        self._shm.close()
+        self._shm.unlink()
+
+
+def _get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=MAX_WORKERS, mp_context=multiprocessing.get_context("forkserver"))
+        return _pool
+
+
+def _discard_pool(pool):
+    """
+    Drops a broken pool (a worker died) so the next submit starts a fresh one.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _attach(name, shape):
+    """
+    Worker side: the (dates, prices) view of a snapshot, mapped once per
+    process. Only the most recently used few stay mapped.
+    """
+    if name not in _snapshots:
+        shm = shared_memory.SharedMemory(name=name)
+        n = shape[0]
+        dates = np.ndarray((n,), dtype=np.int64, buffer=shm.buf).astype("datetime64[D]")
+        prices = np.ndarray(shape, dtype=np.float64, buffer=shm.buf, offset=n * 8)
+        prices.flags.writeable = False
+        _snapshots[name] = (shm, dates, prices)
+        while len(_snapshots) > MAX_ATTACHED:
+            old_shm, _, old_prices = _snapshots.popitem(last=False)[1]
+            del old_prices  # release the buffer view before closing
+            old_shm.close()
+    _snapshots.move_to_end(name)
+    return _snapshots[name][1:]
+
+
+def _run_variant(index, params, strategy, base, snapshot):
+    """
+    Worker task: one backtest on a slice of the shared snapshot
+    (name, shape, symbols). Returns summary stats only; equity curves stay
+    in the worker.
+    """
+    name, shape, symbols = snapshot
+    dates, prices = _attach(name, shape)
+    kwargs = dict(base)
+    kwargs.update({k: v for k, v in params.items() if k != "start"})
+    first = 0
+    if "start" in params:
+        first = int(np.searchsorted(dates, np.datetime64(params["start"], "D")))
+
+    result = run_strategy(dates[first:], prices[first:], symbols, strategy, max_trades=0, **kwargs)
+    if "error" in result:
+        return {"index": index, "params": params, "error": result["error"]}
+    return {
+        "index": index,
+        "params": params,
+        "start": str(dates[first]),
+        "stats": result["stats"],
+    }
+
+
+def plan_sweep(symbols, start_date: str, end_date: str, strategy: str, grid, base=None):
+    """
+    Validates the grid and loads the price snapshot once for the widest window.
+    Returns a plan dict for stream_sweep, or {"error": ...}.
+    """
+    if strategy not in STRATEGIES:
+        return {"error": f"Unknown strategy '{strategy}'. Use one of: {', '.join(STRATEGIES)}"}
+    if not grid:
+        return {"error": "Grid must contain at least one parameter"}
+    unknown = [k for k in grid if k not in SWEEP_PARAMS]
+    if unknown:
+        return {"error": f"Unknown sweep parameter(s): {', '.join(unknown)}. Use: {', '.join(SWEEP_PARAMS)}"}
+    if any(not isinstance(v, list) or not v for v in grid.values()):
+        return {"error": "Every grid parameter needs a non-empty list of values"}
+
+    combos = expand_grid(grid)
+    if len(combos) > MAX_COMBINATIONS:
+        return {"error": f"Grid has {len(combos)} combinations (max {MAX_COMBINATIONS})"}
+
+    # The snapshot must cover the earliest swept start date
+    starts = [start_date] + [str(s) for s in grid.get("start", [])]
+    try:
+        window_start = min(np.datetime64(s, "D") for s in starts)
+    except ValueError:
+        return {"error": "Invalid start date in grid"}
+
+    found, missing = price_matrix.resolve_symbols(symbols)
+    if not found:
+        return {"error": "None of the requested symbols were found"}
+    try:
+        dates, prices = price_matrix.load_price_matrix([aid for _, aid in found], str(window_start), end_date)
+    except Exception as e:
+        print(f"Error loading sweep prices: {e}")
+        return {"error": "Failed to load price data"}
+    if len(dates) < 2:
+        return {"error": "Not enough price data in the requested window"}
+
+    return {
+        "strategy": strategy,
+        "symbols": [sym for sym, _ in found],
+        "missing": missing,
+        "combos": combos,
+        "base": {k: v for k, v in (base or {}).items() if v is not None},
+        "dates": dates,
+        "prices": prices,
+    }
+
+
+def stream_sweep(plan, workers: int = None):
+    """
+    Runs every combination of the plan on the shared process pool and yields
+    NDJSON lines as variants finish (completion order, tagged with their
+    grid index). At most `workers` variants of one sweep are in flight, so
+    concurrent sweeps share the pool. The first line is a header, the last
+    a summary.
+    """
+    combos = plan["combos"]
+    yield json.dumps({
+        "type": "header",
+        "strategy": plan["strategy"],
+        "symbols": plan["symbols"],
+        "missing": plan["missing"],
+        "count": len(combos),
+    }) + "\n"
+
+    snapshot = PriceSnapshot(plan["dates"], plan["prices"])
+    task = (snapshot.name, snapshot.shape, plan["symbols"])
+    workers = max(1, min(workers or MAX_WORKERS, len(combos)))
+    queued = iter(enumerate(combos))
+    running = {}  # future -> (index, params, pool)
+    errors = 0
+
+    def submit():
+        for i, params in itertools.islice(queued, workers - len(running)):
+            pool = _get_pool()
+            running[pool.submit(_run_variant, i, params, plan["strategy"], plan["base"], task)] = (i, params, pool)
+
+    try:
+        submit()
+        while running:
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                index, params, pool = running.pop(future)
+                try:
+                    row = future.result()
+                except Exception as e:
+                    print(f"Sweep variant {index} failed: {e}")
+                    if isinstance(e, BrokenProcessPool):
+                        _discard_pool(pool)
+                    row = {"index": index, "params": params, "error": "Variant failed"}
+                errors += "error" in row
+                yield json.dumps({"type": "result", **row}) + "\n"
+            submit()
+    finally:
+        # A client disconnect closes the generator here: queued variants are
+        # never submitted, and the snapshot outlives the ones still running
+        wait(running)
+        snapshot.release()
+
+    yield json.dumps({"type": "done", "count": len(combos), "errors": errors, "workers": workers}) + "\n"
@@ -0,0 +1,46 @@
+from .db_portfolio import allocation_breakdown
+
+def run_test(name, func):
+    print(f"Testing {name}...", end=" ")
+    try:
+        func()
+        print("✅ PASS")
+    except AssertionError as e:
+        print(f"❌ FAIL: {e}")
+    except Exception as e:
+        print(f"❌ ERROR: {e}")
+
+def _holding(symbol, value, asset_type, currency="usd"):
+    return {"symbol": symbol, "value": value, "type": asset_type, "currency": currency}
+
+def test_groups_by_type_and_currency():
+    holdings = [
+        _holding("AAPL", 300.0, "stocks"),
+        _holding("MSFT", 100.0, "stocks"),
+        _holding("BTC-USD", 400.0, "crypto"),
+        _holding("SAP.DE", 0.0, "stocks", "eur"),  # missing price
+    ]
+    result = allocation_breakdown(holdings, 200.0)
+    by_type = result["allocation"]["by_type"]
+    assert by_type["stocks"] == {"value": 400.0, "count": 3, "percent": 40.0}, f"Got {by_type['stocks']}"
+    assert by_type["cash"]["percent"] == 20.0 and by_type["crypto"]["percent"] == 40.0
+    by_currency = result["allocation"]["by_currency"]
+    assert by_currency["USD"]["value"] == 1000.0 and by_currency["EUR"]["value"] == 0.0
+
+def test_concentration_ignores_cash():
+    holdings = [_holding("A", 500.0, "stocks"), _holding("B", 250.0, "etfs"), _holding("C", 250.0, "etfs")]
+    c = allocation_breakdown(holdings, 9000.0)["concentration"]
+    assert abs(c["hhi"] - 0.375) < 1e-12, f"Got {c['hhi']}"
+    assert abs(c["effective_positions"] - 1 / 0.375) < 1e-12
+    assert c["top_symbol"] == "A" and c["top_percent"] == 50.0
+
+def test_cash_only():
+    result = allocation_breakdown([], 100.0)
+    assert result["allocation"]["by_type"] == {"cash": {"value": 100.0, "count": 0, "percent": 100.0}}
+    assert result["concentration"]["hhi"] == 0.0 and result["concentration"]["top_symbol"] is None
+
+if __name__ == "__main__":
+    print("--- Starting Allocation Tests ---")
+    run_test("Groups By Type And Currency", test_groups_by_type_and_currency)
+    run_test("Concentration Ignores Cash", test_concentration_ignores_cash)
+    run_test("Cash Only", test_cash_only)
@@ -0,0 +1,95 @@
+import os
+import numpy as np
+from . import game_engine
+from . import db_portfolio as portfolio
+from .analytics import performance, relative_performance, portfolio_analytics
+from .db_conn import get_db_connection
+from .db_prices import invalidate_caches
+from .metrics import irr
+
+def run_test(name, func):
+    print(f"Testing {name}...", end=" ")
+    try:
+        func()
+        print("✅ PASS")
+    except AssertionError as e:
+        print(f"❌ FAIL: {e}")
+    except Exception as e:
+        print(f"❌ ERROR: {e}")
+
+def test_irr_known_rate():
+    assert abs(irr([0.0, 1.0], [-100.0, 110.0]) - 0.10) < 1e-9
+    # 100 in, 100 more after a year, 231 out after two years: 10% a year
+    assert abs(irr([0.0, 1.0, 2.0], [-100.0, -100.0, 231.0]) - 0.10) < 1e-9
+    assert irr([0.0, 1.0], [100.0, 50.0]) is None
+
+def test_salary_is_not_return():
+    # Flat market: value only grows by injected salary, so TWR and IRR are 0
+    dates = np.arange(np.datetime64("2020-01-01"), np.datetime64("2020-01-01") + 400, 20)
+    flows = np.where(np.arange(len(dates)) % 2 == 1, 100.0, 0.0)
+    flows[0] = 0.0
+    values = 1000.0 + np.cumsum(flows)
+    r = performance(dates, values, flows)
+    assert abs(r["twr"]) < 1e-12 and abs(r["irr"]) < 1e-9, f"Got {r['twr']}, {r['irr']}"
+    assert r["net_flows"] == flows.sum() and r["max_drawdown"] == 0.0
+
+def test_twr_vs_irr_timing():
+    # +10%, then a big deposit, then -10%: TWR ignores the deposit, IRR does not
+    dates = np.array(["2020-01-01", "2020-07-01", "2021-01-01"], dtype="datetime64[D]")
+    values = np.array([100.0, 1110.0, 999.0])
+    flows = np.array([0.0, 1000.0, 0.0])
+    r = performance(dates, values, flows)
+    assert abs(r["twr"] - (1.1 * 0.9 - 1)) < 1e-12
+    assert r["irr"] < r["twr"]
+
+def test_relative_to_benchmark():
+    rng = np.random.default_rng(1)
+    dates = np.arange(np.datetime64("2020-01-01"), np.datetime64("2020-01-01") + 300)
+    bench = 100 * np.cumprod(1 + rng.normal(0, 0.01, 300))
+    # Index tracks the benchmark exactly; a second benchmark with doubled returns
+    doubled = 100 * np.cumprod(np.concatenate([[1.0], 1 + 2 * (bench[1:] / bench[:-1] - 1)]))
+    same, lev = relative_performance(dates, bench / bench[0], dates, np.column_stack([bench, doubled]))
+    assert abs(same["beta"] - 1) < 1e-9 and abs(same["alpha"]) < 1e-9 and same["tracking_error"] < 1e-12
+    assert abs(lev["beta"] - 0.5) < 1e-9 and abs(lev["correlation"] - 1) < 1e-9
+
+def test_benchmark_as_of_alignment():
+    # Benchmark has no quote on the index's middle date: its price is carried forward
+    dates = np.array(["2020-01-03", "2020-01-04", "2020-01-06"], dtype="datetime64[D]")
+    bench_dates = np.array(["2020-01-02", "2020-01-03", "2020-01-06"], dtype="datetime64[D]")
+    (r,) = relative_performance(dates, np.array([1.0, 1.0, 1.1]), bench_dates, np.array([[9.0], [10.0], [12.0]]))
+    assert abs(r["benchmark_return"] - 0.2) < 1e-12 and abs(r["excess_return"] + 0.1) < 1e-12
+
+def test_cache_follows_generation():
+    # After /reset, session and ledger ids restart, so a new session can
+    # share (session_id, version) with a cached one: the generation must differ
+    user_id = portfolio.create_user(f"gamer_{os.urandom(4).hex()}")
+    pid = portfolio.create_portfolio(user_id, "StatsPort")["id"]
+    try:
+        game_engine.create_session(user_id, pid, "2016-01-04", 3000, 1000, 10000)
+        game_engine.advance_time(pid, "2016-04-01")
+        before = portfolio_analytics(pid)
+        assert "error" not in before, before
+        # Same ids and row count, different values: what a reset + replay looks like
+        with get_db_connection() as conn:
+            conn.cursor().execute("""
+                UPDATE session_equity SET total_value = total_value * 2
+                WHERE session_id = (SELECT id FROM game_sessions WHERE portfolio_id = %s)
+            """, (pid,))
+            conn.commit()
+        assert portfolio_analytics(pid) == before, "Served from cache within a generation"
+        invalidate_caches()
+        after = portfolio_analytics(pid)
+        assert after["end_value"] == 2 * before["end_value"], f"{after} vs {before}"
+    finally:
+        with get_db_connection() as conn:
+            conn.cursor().execute("DELETE FROM users WHERE id = %s", (user_id,))
+            conn.commit()
+
+if __name__ == "__main__":
+    print("--- Starting Analytics Tests ---")
+    run_test("IRR Known Rate", test_irr_known_rate)
+    run_test("Salary Is Not Return", test_salary_is_not_return)
+    run_test("TWR vs IRR Timing", test_twr_vs_irr_timing)
+    run_test("Relative To Benchmark", test_relative_to_benchmark)
+    run_test("Benchmark As-Of Alignment", test_benchmark_as_of_alignment)
+    run_test("Cache Follows Generation", test_cache_follows_generation)
@@ -0,0 +1,97 @@
+import os
+import numpy as np
+from datetime import date
+from . import auto_invest
+from . import game_engine
+from . import db_portfolio as portfolio
+from .auto_invest import crossed_month_starts
+from .db_conn import get_db_connection
+from .price_archive import pack_year
+
+def run_test(name, func):
+    print(f"Testing {name}...", end=" ")
+    try:
+        func()
+        print("✅ PASS")
+    except AssertionError as e:
+        print(f"❌ FAIL: {e}")
+    except Exception as e:
+        print(f"❌ ERROR: {e}")
+
+def test_crossed_month_starts():
+    starts = crossed_month_starts(date(2020, 11, 15), date(2021, 2, 1))
+    assert starts == [date(2020, 12, 1), date(2021, 1, 1), date(2021, 2, 1)], f"Got {starts}"
+    assert crossed_month_starts(date(2020, 1, 1), date(2020, 1, 31)) == [], "Same month credits nothing"
+    # Must agree with advance_time's months_passed
+    assert len(crossed_month_starts(date(2000, 1, 15), date(2020, 1, 20))) == 240
+
+def _session(start_date, salary, expenses):
+    user_id = portfolio.create_user(f"gamer_{os.urandom(4).hex()}")
+    pid = portfolio.create_portfolio(user_id, "AutoPort")["id"]
+    res = game_engine.create_session(user_id, pid, start_date, salary, expenses)
+    assert "session_id" in res, f"Start session failed: {res}"
+    return user_id, pid
+
+def _cleanup(user_id, asset_id=None):
+    with get_db_connection() as conn:
+        cur = conn.cursor()
+        cur.execute("DELETE FROM users WHERE id = %s", (user_id,))
+        if asset_id:
+            cur.execute("DELETE FROM assets WHERE id = %s", (asset_id,))
+        conn.commit()
+
+def test_monthly_plan():
+    user_id, pid = _session("2015-01-15", 5000, 2000)
+    try:
+        assert "error" in auto_invest.set_plan(pid, {"SPY": 0.8, "AAPL": 0.4}), "Weights above 1 must be rejected"
+        res = auto_invest.set_plan(pid, {"SPY": 0.5, "BTC": 0.1, "BTC-USD": 0.15})
+        assert res["plan"] == {"SPY": 0.5, "BTC-USD": 0.25}, f"Aliases not merged: {res}"
+
+        res = game_engine.advance_time(pid, "2015-04-10")
+        assert res["months_passed"] == 3 and res["auto_buys"] == 6, f"Got {res}"
+        assert abs(res["auto_invested"] - 3 * 3000 * 0.75) < 1e-6
+        assert abs(res["cash_added"] - 3 * 3000 * 0.25) < 1e-6
+        with get_db_connection() as conn:
+            cur = conn.cursor()
+            cur.execute("SELECT symbol, SUM(quantity * price_per_unit) FROM transactions WHERE portfolio_id = %s GROUP BY symbol", (pid,))
+            spent = {sym: float(v) for sym, v in cur.fetchall()}
+        assert abs(spent["SPY"] - 4500) < 1e-6 and abs(spent["BTC-USD"] - 2250) < 1e-6, f"Got {spent}"
+    finally:
+        _cleanup(user_id)
+
+def test_archived_prices():
+    # An asset whose 2010 prices only exist in prices_archive
+    symbol = f"ARC_{os.urandom(4).hex()}"
+    days = np.arange(np.datetime64("2010-01-01"), np.datetime64("2011-01-01"))
+    days = days[np.is_busday(days)]
+    packed = pack_year(2010, days.tolist(), [50.0] * len(days), [50.0] * len(days), [0] * len(days))
+    with get_db_connection() as conn:
+        cur = conn.cursor()
+        cur.execute("INSERT INTO assets (symbol, name, type) VALUES (%s, %s, 'stocks') RETURNING id", (symbol, symbol))
+        asset_id = cur.fetchone()[0]
+        cur.execute("""
+            INSERT INTO prices_archive (asset_id, year, first_date, last_date, day_mask, close, adj_close, volume)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+        """, (asset_id, 2010, packed["first_date"], packed["last_date"], packed["day_mask"],
+              packed["close"], packed["adj_close"], packed["volume"]))
+        conn.commit()
+    user_id, pid = _session("2010-01-15", 1000, 0)
+    enabled = auto_invest.PRICE_ARCHIVE_ENABLED
+    try:
+        auto_invest.PRICE_ARCHIVE_ENABLED = True
+        session_id = auto_invest.set_plan(pid, {symbol: 1.0})["session_id"]
+        months = crossed_month_starts(date(2010, 1, 15), date(2010, 4, 10))
+        with get_db_connection() as conn:
+            cur = conn.cursor()
+            res = auto_invest.execute_plans(cur, [(session_id, pid, 1000.0)], months)
+            conn.rollback()
+        assert res == {pid: (3000.0, 3)}, f"Archived months skipped: {res}"
+    finally:
+        auto_invest.PRICE_ARCHIVE_ENABLED = enabled
+        _cleanup(user_id, asset_id)
+
+if __name__ == "__main__":
+    print("--- Starting Auto-Invest Tests ---")
+    run_test("Crossed Month Starts", test_crossed_month_starts)
+    run_test("Monthly Plan", test_monthly_plan)
+    run_test("Archived Prices", test_archived_prices)
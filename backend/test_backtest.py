@@ -0,0 +1,86 @@
+import numpy as np
+from .backtest import period_starts, run_dca, run_rebalance, run_ma_crossover, run_strategy
+from .metrics import rolling_mean, flow_adjusted_index
+
+def run_test(name, func):
+    print(f"Testing {name}...", end=" ")
+    try:
+        func()
+        print("✅ PASS")
+    except AssertionError as e:
+        print(f"❌ FAIL: {e}")
+    except Exception as e:
+        print(f"❌ ERROR: {e}")
+
+def _days(*isos):
+    return np.array(isos, dtype="datetime64[D]")
+
+def test_period_starts():
+    dates = _days("2024-01-30", "2024-01-31", "2024-02-01", "2024-02-02", "2024-02-05", "2024-04-01")
+    assert period_starts(dates, "monthly").tolist() == [True, False, True, False, False, True]
+    # 2024-02-05 is a Monday
+    assert period_starts(dates, "weekly").tolist() == [True, False, False, False, True, True]
+    assert period_starts(dates, "quarterly").tolist() == [True, False, False, False, False, True]
+
+def test_dca_units():
+    prices = np.array([[10.0, np.nan], [20.0, 5.0], [40.0, 10.0]])
+    schedule = np.array([True, True, False])
+    equity, flows, bought = run_dca(prices, np.array([0.5, 0.5]), schedule, 100.0, 100.0)
+    # Row 0: initial cash + first contribution, 100 -> 10 units of A, 100 idle (B not listed).
+    # Row 1: 50 -> 2.5 A, 50 -> 10 B.
+    assert np.allclose(bought[:, 0], [10.0, 2.5, 0.0])
+    assert np.allclose(bought[:, 1], [0.0, 10.0, 0.0])
+    assert np.allclose(equity, [200.0, 12.5 * 20 + 10 * 5 + 100, 12.5 * 40 + 10 * 10 + 100]), f"Got {equity}"
+    assert flows.tolist() == [200.0, 100.0, 0.0]
+
+def test_rebalance_matches_loop():
+    rng = np.random.default_rng(7)
+    prices = np.cumprod(1 + rng.normal(0, 0.02, (60, 3)), axis=0) * 100
+    weights = np.array([0.2, 0.3, 0.5])
+    schedule = np.zeros(60, dtype=bool)
+    schedule[::10] = True
+    equity, _, _ = run_rebalance(prices, weights, schedule, 1000.0)
+
+    value, units, expected = 1000.0, None, []
+    for t in range(60):
+        if schedule[t]:
+            if units is not None:
+                value = float(units @ prices[t])
+            units = value * weights / prices[t]
+        expected.append(float(units @ prices[t]))
+    assert np.allclose(equity, expected), "Vectorized rebalance should match a day-by-day loop"
+
+def test_ma_crossover_no_lookahead():
+    # Price jumps on the day the signal first turns on; that jump must not be captured
+    prices = np.array([[10.0], [10.0], [10.0], [12.0], [24.0], [24.0]])
+    equity, _, traded = run_ma_crossover(prices, np.array([1.0]), 100.0, 1, 2)
+    # Signal (fast > slow) first true on row 3 -> invested from row 4
+    assert np.allclose(equity, [100, 100, 100, 100, 200, 200]), f"Got {equity}"
+    assert np.flatnonzero(traded[:, 0]).tolist() == [4]
+
+def test_rolling_mean_nan():
+    values = np.array([np.nan, 1.0, 2.0, 3.0])
+    out = rolling_mean(values, 2)
+    assert np.isnan(out[:2]).all() and np.allclose(out[2:], [1.5, 2.5])
+
+def test_flow_adjusted_index():
+    # 100 -> 110 (+10%), then +100 contribution -> 210 is 0% growth
+    index, _ = flow_adjusted_index(np.array([100.0, 110.0, 210.0]), np.array([100.0, 0.0, 100.0]))
+    assert np.allclose(index, [1.0, 1.1, 1.1])
+
+def test_strategy_validation():
+    dates = _days("2024-01-01", "2024-01-02")
+    prices = np.ones((2, 1))
+    assert "error" in run_strategy(dates, prices, ["A"], "momentum")
+    assert "error" in run_strategy(dates, prices, ["A"], "ma_crossover", fast=20, slow=10)
+    assert "error" in run_strategy(dates, prices, ["A"], "dca", weights={"A": 0})
+
+if __name__ == "__main__":
+    print("--- Starting Backtest Tests ---")
+    run_test("Period Starts", test_period_starts)
+    run_test("DCA Units", test_dca_units)
+    run_test("Rebalance vs Loop", test_rebalance_matches_loop)
+    run_test("MA Crossover No Look-ahead", test_ma_crossover_no_lookahead)
+    run_test("Rolling Mean NaN", test_rolling_mean_nan)
+    run_test("Flow Adjusted Index", test_flow_adjusted_index)
+    run_test("Strategy Validation", test_strategy_validation)
@@ -0,0 +1,88 @@
+import os
+from . import game_engine
+from . import db_portfolio as portfolio
+from .db_conn import get_db_connection
+from .db_prices import get_prices, get_asset_id
+
+def run_test(name, func):
+    print(f"Testing {name}...", end=" ")
+    try:
+        func()
+        print("✅ PASS")
+    except AssertionError as e:
+        print(f"❌ FAIL: {e}")
+    except Exception as e:
+        print(f"❌ ERROR: {e}")
+
+DATE = "2016-03-15"
+
+def _portfolio(cash):
+    user_id = portfolio.create_user(f"gamer_{os.urandom(4).hex()}")
+    pid = portfolio.create_portfolio(user_id, "BatchPort")["id"]
+    res = game_engine.create_session(user_id, pid, DATE, 0, 0, cash)
+    assert "session_id" in res, f"Start session failed: {res}"
+    return user_id, pid
+
+def _state(pid):
+    with get_db_connection() as conn:
+        cur = conn.cursor()
+        cur.execute("SELECT cash_balance FROM portfolios WHERE id = %s", (pid,))
+        cash = float(cur.fetchone()[0])
+        cur.execute("SELECT symbol, type, quantity::float8 FROM transactions WHERE portfolio_id = %s ORDER BY id", (pid,))
+        return cash, cur.fetchall()
+
+def _cleanup(user_id):
+    with get_db_connection() as conn:
+        conn.cursor().execute("DELETE FROM users WHERE id = %s", (user_id,))
+        conn.commit()
+
+def test_all_or_nothing():
+    user_id, pid = _portfolio(1000)
+    try:
+        # The first order fits, the second does not: neither may be recorded
+        res = portfolio.execute_orders(pid, [
+            {"symbol": "SPY", "side": "BUY", "quantity": 2},
+            {"symbol": "AAPL", "side": "BUY", "quantity": 1000},
+        ], DATE)
+        assert "error" in res and res["error"].startswith("Order 2"), res
+        assert _state(pid) == (1000.0, []), _state(pid)
+
+        res = portfolio.execute_orders(pid, [
+            {"symbol": "SPY", "side": "BUY", "quantity": 2},
+            {"symbol": "GLD", "side": "SELL", "quantity": 1},
+        ], DATE)
+        assert "error" in res and "insufficient holdings" in res["error"], res
+        assert _state(pid) == (1000.0, [])
+
+        res = portfolio.execute_orders(pid, [{"symbol": "SPY", "side": "BUY", "quantity": 2}], DATE, dry_run=True)
+        assert res["status"] == "dry_run" and _state(pid) == (1000.0, []), "Dry run must not write"
+    finally:
+        _cleanup(user_id)
+
+def test_sells_fund_buys():
+    prices = get_prices([get_asset_id("SPY"), get_asset_id("AAPL")], DATE)
+    spy, aapl = prices[get_asset_id("SPY")], prices[get_asset_id("AAPL")]
+    user_id, pid = _portfolio(10 * spy)
+    try:
+        assert "error" not in portfolio.execute_orders(pid, [{"symbol": "SPY", "side": "BUY", "quantity": 10}], DATE)
+        cash, _ = _state(pid)
+        assert abs(cash) < 1e-6, cash
+
+        # Listed buy-first with no cash: only works if the sell is applied first
+        units = 10 * spy / aapl
+        res = portfolio.execute_orders(pid, [
+            {"symbol": "AAPL", "side": "BUY", "quantity": units},
+            {"symbol": "SPY", "side": "SELL", "quantity": 10},
+        ], DATE)
+        assert res.get("status") == "success", res
+        assert [o["symbol"] for o in res["orders"]] == ["AAPL", "SPY"], "Results keep the request order"
+        assert abs(res["new_balance"]) < 1e-6, res
+        _, txns = _state(pid)
+        assert [(s, t) for s, t, _ in txns] == [("SPY", "BUY"), ("SPY", "SELL"), ("AAPL", "BUY")], txns
+    finally:
+        _cleanup(user_id)
+
+if __name__ == "__main__":
+    print("--- Starting Batch Order Tests ---")
+    run_test("All Or Nothing", test_all_or_nothing)
+    run_test("Sells Fund Buys", test_sells_fund_buys)
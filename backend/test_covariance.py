@@ -0,0 +1,100 @@
+import os
+import time
+import numpy as np
+from . import db_prices
+from .covariance import MomentState, get_correlation, window_start
+from .db_conn import get_db_connection
+from .optimizer import optimize
+
+def run_test(name, func):
+    print(f"Testing {name}...", end=" ")
+    try:
+        func()
+        print("✅ PASS")
+    except AssertionError as e:
+        print(f"❌ FAIL: {e}")
+    except Exception as e:
+        print(f"❌ ERROR: {e}")
+
+def _prices(T=300, n=4, seed=0):
+    rng = np.random.default_rng(seed)
+    prices = 100 * np.cumprod(1 + rng.normal(0, 0.01, (T, n)), axis=0)
+    prices[:120, 1] = np.nan                   # listed later
+    prices[rng.random((T, n)) < 0.1] = np.nan  # days without a quote
+    return np.arange(np.datetime64("2020-01-01"), np.datetime64("2020-01-01") + T), prices
+
+def test_pairwise_complete():
+    dates, prices = _prices()
+    state = MomentState([1, 2, 3, 4], 100)
+    state.push(dates, prices)
+    cov, corr, obs = state.matrices([0, 1, 2, 3], 20)
+
+    # Brute force: returns against each asset's previous quote, pair by pair
+    last = np.full(4, np.nan)
+    returns = np.full(prices.shape, np.nan)
+    for t in range(len(prices)):
+        returns[t] = prices[t] / last - 1
+        last = np.where(np.isnan(prices[t]), last, prices[t])
+    window = returns[dates >= window_start(dates[-1], 100)]
+    for i in range(4):
+        for j in range(4):
+            both = np.isfinite(window[:, i]) & np.isfinite(window[:, j])
+            assert obs[i, j] == both.sum()
+            expected = np.cov(window[both, i], window[both, j])[0, 1]
+            assert abs(cov[i, j] - expected) < 1e-15, f"{i},{j}: {cov[i, j]} vs {expected}"
+    assert np.allclose(np.diag(corr), 1.0)
+
+def test_incremental_matches_rebuild():
+    dates, prices = _prices(seed=1)
+    rolled = MomentState([1, 2, 3, 4], 60)
+    for start in range(0, len(dates), 7):
+        rolled.push(dates[start:start + 7], prices[start:start + 7])
+    fresh = MomentState([1, 2, 3, 4], 60)
+    fresh.push(dates, prices)
+    a, b = rolled.matrices([0, 1, 2, 3], 10), fresh.matrices([0, 1, 2, 3], 10)
+    assert np.allclose(a[0], b[0], atol=1e-15) and (a[2] == b[2]).all()
+
+def test_window_is_calendar_span():
+    # Every-day (crypto-like) rows: a 5-weekday window ending on a Sunday
+    # spans Monday..Sunday, so it keeps 7 daily rows, not 5
+    dates = np.arange(np.datetime64("2024-01-01"), np.datetime64("2024-01-29"))
+    prices = 100 * np.cumprod(1 + np.random.default_rng(2).normal(0, 0.01, (len(dates), 1)), axis=0)
+    state = MomentState([1], 5)
+    state.push(dates, prices)
+    assert str(state.dates[0]) == "2024-01-22" and len(state.dates) == 7, state.dates
+    # Moving the end forward with no new rows still evicts
+    state.push(dates[:0], prices[:0], "2024-01-30")
+    assert str(state.dates[0]) == "2024-01-24" and len(state.dates) == 5, state.dates
+    fresh = MomentState([1], 5)
+    fresh.push(dates, prices, "2024-01-30")
+    assert np.allclose(state.matrices([0], 2)[0], fresh.matrices([0], 2)[0], atol=1e-15)
+
+def test_asset_added_since_metadata():
+    # Resolves through the DB fallback but has no column in the cached state yet
+    db_prices.get_assets_metadata()
+    symbol = f"NEW_{os.urandom(4).hex().upper()}"
+    with get_db_connection() as conn:
+        cur = conn.cursor()
+        cur.execute("INSERT INTO assets (symbol, name, type) VALUES (%s, %s, 'stocks') RETURNING id", (symbol, symbol))
+        asset_id = cur.fetchone()[0]
+        conn.commit()
+    checked = db_prices._data_version_checked
+    try:
+        db_prices._data_version_checked = time.monotonic()  # no data-version poll during the test
+        res = get_correlation(["SPY", "AAPL", symbol], 60, "2020-06-30")
+        assert res.get("symbols") == ["SPY", "AAPL"] and res["missing"] == [symbol], res
+        res = optimize(["SPY", "AAPL", symbol], end="2020-06-30", window=60)
+        assert res.get("symbols") == ["SPY", "AAPL"] and res["missing"] == [symbol], res
+        assert "error" in optimize(["SPY", symbol], end="2020-06-30", window=60)
+    finally:
+        db_prices._data_version_checked = checked
+        with get_db_connection() as conn:
+            conn.cursor().execute("DELETE FROM assets WHERE id = %s", (asset_id,))
+            conn.commit()
+
+if __name__ == "__main__":
+    print("--- Starting Covariance Tests ---")
+    run_test("Pairwise Complete", test_pairwise_complete)
+    run_test("Incremental Matches Rebuild", test_incremental_matches_rebuild)
+    run_test("Window Is Calendar Span", test_window_is_calendar_span)
+    run_test("Asset Added Since Metadata", test_asset_added_since_metadata)
@@ -0,0 +1,107 @@
+import os
+import numpy as np
+from . import db_aggregates, db_prices, price_matrix
+from .db_aggregates import pick_resolution, refresh_price_aggregates, WEEKLY_AFTER_DAYS, MONTHLY_AFTER_DAYS
+from .db_conn import get_db_connection
+from .db_prices import get_price_history
+from .price_archive import pack_year
+
+def run_test(name, func):
+    print(f"Testing {name}...", end=" ")
+    try:
+        func()
+        print("✅ PASS")
+    except AssertionError as e:
+        print(f"❌ FAIL: {e}")
+    except Exception as e:
+        print(f"❌ ERROR: {e}")
+
+def test_resolution_thresholds():
+    start = np.datetime64("2000-01-01")
+    at = lambda days: str(start + np.timedelta64(days, "D"))
+    assert pick_resolution("2000-01-01", at(WEEKLY_AFTER_DAYS)) == "daily"
+    assert pick_resolution("2000-01-01", at(WEEKLY_AFTER_DAYS + 1)) == "weekly"
+    assert pick_resolution("2000-01-01", at(MONTHLY_AFTER_DAYS)) == "weekly"
+    assert pick_resolution("2000-01-01", at(MONTHLY_AFTER_DAYS + 1)) == "monthly"
+    # Missing bounds and timestamps
+    assert pick_resolution(None, "2020-01-01") == "daily"
+    assert pick_resolution("2000-01-01", None) == "daily"
+    assert pick_resolution("2000-01-01T00:00:00", "2020-01-01 12:00") == "monthly"
+
+def test_daily_fallback_without_aggregates():
+    # Temporary asset with daily prices only: weekly history must serve the daily rows
+    symbol = f"AGG_{os.urandom(4).hex()}"
+    days = np.arange(np.datetime64("2020-01-01"), np.datetime64("2022-01-01"))
+    days = days[np.is_busday(days)]
+    with get_db_connection() as conn:
+        cur = conn.cursor()
+        cur.execute("INSERT INTO assets (symbol, name, type) VALUES (%s, %s, 'stocks') RETURNING id", (symbol, symbol))
+        asset_id = cur.fetchone()[0]
+        cur.executemany(
+            "INSERT INTO prices (asset_id, date, close, adj_close, volume) VALUES (%s, %s, %s, %s, 0)",
+            [(asset_id, str(d), 100.0 + i, 100.0 + i) for i, d in enumerate(days)]
+        )
+        conn.commit()
+    try:
+        history = get_price_history(symbol, "2021-12-31", "2020-01-01", "weekly")
+        assert len(history) == len(days), f"Expected {len(days)} daily rows, got {len(history)}"
+        assert history[-1]["price"] == 100.0 + len(days) - 1
+
+        with get_db_connection() as conn:
+            refresh_price_aggregates(conn.cursor(), [asset_id])
+            conn.commit()
+        weekly = get_price_history(symbol, "2021-12-31", "2020-01-01", "weekly")
+        assert len(weekly) < len(days) / 4, f"Got {len(weekly)} weekly rows"
+        assert weekly[-1] == history[-1], "As-of price must still be the last daily close"
+    finally:
+        with get_db_connection() as conn:
+            conn.cursor().execute("DELETE FROM assets WHERE id = %s", (asset_id,))
+            conn.commit()
+
+def test_archived_open_period():
+    # Fully archived asset: the open period's daily rows and the last price
+    # date must come from prices_all, like the aggregates themselves
+    symbol = f"AGA_{os.urandom(4).hex()}"
+    days = np.arange(np.datetime64("2010-01-01"), np.datetime64("2011-01-01"))
+    days = days[np.is_busday(days)]
+    closes = [100.0 + i for i in range(len(days))]
+    packed = pack_year(2010, days.tolist(), closes, closes, [0] * len(days))
+    with get_db_connection() as conn:
+        cur = conn.cursor()
+        cur.execute("INSERT INTO assets (symbol, name, type) VALUES (%s, %s, 'stocks') RETURNING id", (symbol, symbol))
+        asset_id = cur.fetchone()[0]
+        cur.execute("""
+            INSERT INTO prices_archive (asset_id, year, first_date, last_date, day_mask, close, adj_close, volume)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+        """, (asset_id, 2010, packed["first_date"], packed["last_date"], packed["day_mask"],
+              packed["close"], packed["adj_close"], packed["volume"]))
+        conn.commit()
+    modules = (db_aggregates, db_prices, price_matrix)
+    saved = [m.PRICE_SOURCE for m in modules], db_prices.PRICE_ARCHIVE_ENABLED
+    try:
+        for m in modules:
+            m.PRICE_SOURCE = "prices_all"
+        db_prices.PRICE_ARCHIVE_ENABLED = True
+        with get_db_connection() as conn:
+            refresh_price_aggregates(conn.cursor(), [asset_id])
+            conn.commit()
+
+        as_of = closes[int(np.searchsorted(days, np.datetime64("2010-06-15")))]
+        monthly = get_price_history(symbol, "2010-06-15", "2010-01-01", "monthly")
+        assert monthly[-1] == {"date": "2010-06-15", "price": as_of}, f"Got {monthly[-1]}"
+        ids, dates, prices = price_matrix.fetch_price_rows([asset_id], None, "2010-06-15", "monthly")
+        assert str(dates.max()) == "2010-06-15" and prices[dates.argmax()] == as_of
+        assert db_prices.get_last_price_date(asset_id) == "2010-12-31"
+    finally:
+        for m, source in zip(modules, saved[0]):
+            m.PRICE_SOURCE = source
+        db_prices.PRICE_ARCHIVE_ENABLED = saved[1]
+        with get_db_connection() as conn:
+            conn.cursor().execute("DELETE FROM assets WHERE id = %s", (asset_id,))
+            conn.commit()
+
+if __name__ == "__main__":
+    print("--- Starting Price Aggregate Tests ---")
+    run_test("Resolution Thresholds", test_resolution_thresholds)
+    run_test("Daily Fallback Without Aggregates", test_daily_fallback_without_aggregates)
+    run_test("Archived Open Period", test_archived_open_period)
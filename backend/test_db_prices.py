@@ -0,0 +1,46 @@
+import os
+import time
+from . import db_prices
+from .db_conn import get_db_connection
+
+def run_test(name, func):
+    print(f"Testing {name}...", end=" ")
+    try:
+        func()
+        print("✅ PASS")
+    except AssertionError as e:
+        print(f"❌ FAIL: {e}")
+    except Exception as e:
+        print(f"❌ ERROR: {e}")
+
+def _generation_after_poll():
+    db_prices._data_version_checked = None
+    return db_prices.get_cache_generation()
+
+def test_generation_follows_data_load():
+    # Another process writing prices (the nightly load) must move the generation
+    before = _generation_after_poll()
+    assert db_prices.get_cache_generation() == before, "Polls are throttled"
+
+    symbol = f"GEN_{os.urandom(4).hex().upper()}"
+    with get_db_connection() as conn:
+        cur = conn.cursor()
+        cur.execute("INSERT INTO assets (symbol, name, type) VALUES (%s, %s, 'stocks') RETURNING id", (symbol, symbol))
+        asset_id = cur.fetchone()[0]
+        cur.execute("INSERT INTO prices (asset_id, date, close, adj_close, volume) VALUES (%s, '2020-01-02', 10, 10, 0)", (asset_id,))
+        conn.commit()
+    try:
+        # Statistics are flushed asynchronously, within about a second
+        deadline = time.monotonic() + 5
+        while _generation_after_poll() == before and time.monotonic() < deadline:
+            time.sleep(0.2)
+        assert db_prices.get_cache_generation() > before, "Generation did not move after the load"
+        assert db_prices.lookup_asset(symbol)["id"] == asset_id, "Symbol dictionary not rebuilt"
+    finally:
+        with get_db_connection() as conn:
+            conn.cursor().execute("DELETE FROM assets WHERE id = %s", (asset_id,))
+            conn.commit()
+
+if __name__ == "__main__":
+    print("--- Starting Price Cache Tests ---")
+    run_test("Generation Follows Data Load", test_generation_follows_data_load)
@@ -0,0 +1,51 @@
+import numpy as np
+from .equity import equity_path
+
+def run_test(name, func):
+    print(f"Testing {name}...", end=" ")
+    try:
+        func()
+        print("✅ PASS")
+    except AssertionError as e:
+        print(f"❌ FAIL: {e}")
+    except Exception as e:
+        print(f"❌ ERROR: {e}")
+
+def _days(*isos):
+    return np.array(isos, dtype="datetime64[D]")
+
+def test_equity_path():
+    # Price known from a seed row before the window; no quote on the 4th (weekend)
+    price_dates = _days("2020-01-01", "2020-01-03", "2020-01-06")
+    prices = np.array([[10.0], [12.0], [11.0]])
+    axis = _days("2020-01-02", "2020-01-03", "2020-01-04", "2020-01-06")
+
+    # Buy 5 units on the 3rd for 60; salary of 100 credited on the 4th
+    trades = (_days("2020-01-03"), np.array([0]), np.array([5.0]), np.array([-60.0]))
+    flows = (_days("2020-01-04"), np.array([100.0]))
+    total, cash, flow = equity_path(axis, price_dates, prices, np.array([2.0]), trades, 500.0, flows)
+
+    assert np.allclose(cash, [500, 440, 540, 540]), f"Got {cash}"
+    assert np.allclose(flow, [0, 0, 100, 0])
+    assert np.allclose(total, [2 * 10 + 500, 7 * 12 + 440, 7 * 12 + 540, 7 * 11 + 540]), f"Got {total}"
+
+def test_flow_on_non_axis_day():
+    # A salary dated on a day missing from the axis lands on the next axis day
+    axis = _days("2020-02-28", "2020-03-02")
+    total, cash, flow = equity_path(axis, _days("2020-02-28"), np.zeros((1, 0)), np.zeros(0),
+                                    (_days(), np.zeros(0, dtype=np.int64), np.zeros(0), np.zeros(0)),
+                                    0.0, (_days("2020-03-01"), np.array([50.0])))
+    assert flow.tolist() == [0.0, 50.0] and total.tolist() == [0.0, 50.0]
+
+def test_cash_only_path():
+    # No assets held: no price rows at all
+    axis = _days("2020-01-01", "2020-02-01", "2020-02-10")
+    empty = (_days(), np.array([], dtype=np.int64), np.array([]), np.array([]))
+    total, cash, _ = equity_path(axis, _days(), np.empty((0, 0)), np.array([]), empty, 1000.0, (_days("2020-02-01"), np.array([50.0])))
+    assert np.allclose(total, [1000, 1050, 1050]) and np.allclose(cash, total), f"Got {total}"
+
+if __name__ == "__main__":
+    print("--- Starting Equity Path Tests ---")
+    run_test("Equity Path", test_equity_path)
+    run_test("Flow On Non-Axis Day", test_flow_on_non_axis_day)
+    run_test("Cash-Only Path", test_cash_only_path)
@@ -0,0 +1,72 @@
+import os
+from . import forks
+from . import game_engine
+from . import db_portfolio as portfolio
+from .db_conn import get_db_connection
+
+def run_test(name, func):
+    print(f"Testing {name}...", end=" ")
+    try:
+        func()
+        print("✅ PASS")
+    except AssertionError as e:
+        print(f"❌ FAIL: {e}")
+    except Exception as e:
+        print(f"❌ ERROR: {e}")
+
+def _ledger(pid):
+    with get_db_connection() as conn:
+        cur = conn.cursor()
+        cur.execute("SELECT symbol, type, quantity::float8, date FROM portfolio_ledger(%s) ORDER BY id", (pid,))
+        return [(sym, typ, q, str(d)) for sym, typ, q, d in cur.fetchall()]
+
+def test_fork_flow():
+    user_id = portfolio.create_user(f"gamer_{os.urandom(4).hex()}")
+    pid = portfolio.create_portfolio(user_id, "ForkPort")["id"]
+    try:
+        # 1. Parent: buy, advance, buy on the new date, advance again
+        assert "session_id" in game_engine.create_session(user_id, pid, "2015-01-15", 3000, 1000, 10000)
+        assert "error" not in portfolio.execute_orders(pid, [{"symbol": "SPY", "side": "BUY", "quantity": 10}], "2015-01-15")
+        assert "error" not in game_engine.advance_time(pid, "2015-03-10")
+        assert "error" not in portfolio.execute_orders(pid, [{"symbol": "AAPL", "side": "BUY", "quantity": 5}], "2015-03-10")
+        assert "error" not in game_engine.advance_time(pid, "2015-05-10")
+
+        # 2. One snapshot per date the session has been at
+        snaps = forks.list_snapshots(pid)
+        assert [s["sim_date"] for s in snaps] == ["2015-01-15", "2015-03-10", "2015-05-10"], snaps
+        assert snaps[0]["cash"] == 10000 and snaps[0]["positions"] == 0
+        assert snaps[1]["positions"] == 1, "Snapshot is taken on arrival, before that day's trades"
+
+        # 3. Fork at 2015-03-10: cash and positions from the snapshot
+        res = forks.fork_session(pid, "2015-03-10")
+        assert res.get("status") == "success", res
+        fork_id = res["portfolio_id"]
+        assert res["name"] == "ForkPort @ 2015-03-10"
+        assert res["holdings"] == {"SPY": 10.0} and abs(res["cash"] - snaps[1]["cash"]) < 1e-9, res
+        assert game_engine.get_session(fork_id)["sim_date"] == "2015-03-10"
+
+        # 4. The fork sees the parent's rows up to the fork point only
+        parent_rows = _ledger(pid)
+        assert [r[0] for r in parent_rows] == ["SPY", "AAPL"]
+        assert _ledger(fork_id) == parent_rows[:1], _ledger(fork_id)
+
+        # 5. Trades in the fork stay out of the parent
+        assert "error" not in portfolio.execute_orders(fork_id, [{"symbol": "GLD", "side": "BUY", "quantity": 2}], "2015-03-10")
+        assert "error" not in game_engine.advance_time(fork_id, "2015-04-10")
+        assert [r[0] for r in _ledger(fork_id)] == ["SPY", "GLD"]
+        assert _ledger(pid) == parent_rows
+
+        # 6. A second fork at the same date gets its own name
+        again = forks.fork_session(pid, "2015-03-10")
+        assert again.get("status") == "success", again
+        assert again["name"] == "ForkPort @ 2015-03-10 (2)"
+        assert "error" in forks.fork_session(pid, "2015-03-10", "ForkPort"), "Explicit duplicate name must be rejected"
+        assert "error" in forks.fork_session(pid, "2015-02-01"), "No snapshot at a date the session skipped"
+    finally:
+        with get_db_connection() as conn:
+            conn.cursor().execute("DELETE FROM users WHERE id = %s", (user_id,))
+            conn.commit()
+
+if __name__ == "__main__":
+    print("--- Starting Fork Tests ---")
+    run_test("Fork Flow", test_fork_flow)
@@ -0,0 +1,148 @@
+import os
+import numpy as np
+from . import db_orders
+from . import game_engine
+from . import game_rooms
+from . import db_portfolio as portfolio
+from .db_conn import get_db_connection
+from .price_archive import pack_year
+
+def run_test(name, func):
+    print(f"Testing {name}...", end=" ")
+    try:
+        func()
+        print("✅ PASS")
+    except AssertionError as e:
+        print(f"❌ FAIL: {e}")
+    except Exception as e:
+        print(f"❌ ERROR: {e}")
+
+def _player(start_date, cash, orders):
+    user_id = portfolio.create_user(f"gamer_{os.urandom(4).hex()}")
+    pid = portfolio.create_portfolio(user_id, "RoomPort")["id"]
+    res = game_engine.create_session(user_id, pid, start_date, 3000, 1000, cash)
+    assert "session_id" in res, f"Start session failed: {res}"
+    if orders:
+        res = portfolio.execute_orders(pid, orders, start_date)
+        assert "error" not in res, res
+    return user_id, pid
+
+def _cleanup(user_ids, room_id=None, asset_id=None):
+    with get_db_connection() as conn:
+        cur = conn.cursor()
+        cur.execute("DELETE FROM users WHERE id = ANY(%s)", (list(user_ids),))
+        if room_id:
+            cur.execute("DELETE FROM game_rooms WHERE id = %s", (room_id,))
+        if asset_id:
+            cur.execute("DELETE FROM assets WHERE id = %s", (asset_id,))
+        conn.commit()
+
+def test_bulk_values_match_single():
+    players = [
+        _player("2016-03-15", 10000, [{"symbol": "SPY", "side": "BUY", "quantity": 10}, {"symbol": "BTC", "side": "BUY", "quantity": 0.5}]),
+        _player("2016-03-15", 5000, [{"symbol": "AAPL", "side": "BUY", "quantity": 20}]),
+        _player("2016-03-15", 2000, []),
+    ]
+    try:
+        pids = [pid for _, pid in players]
+        for date in ("2016-03-15", "2018-06-29"):
+            with get_db_connection() as conn:
+                values = portfolio.bulk_portfolio_values(conn.cursor(), pids, date)
+            for pid in pids:
+                single = portfolio.get_portfolio_value(pid, date)
+                assert abs(values[pid]["total_value"] - single["total_value"]) < 1e-6, f"{pid} on {date}: {values[pid]} vs {single}"
+    finally:
+        _cleanup([user_id for user_id, _ in players])
+
+def test_bulk_values_archived_prices():
+    # A position whose only prices are in prices_archive
+    symbol = f"ARC_{os.urandom(4).hex()}"
+    days = np.arange(np.datetime64("2010-01-01"), np.datetime64("2011-01-01"))
+    days = days[np.is_busday(days)]
+    packed = pack_year(2010, days.tolist(), [40.0] * len(days), [40.0] * len(days), [0] * len(days))
+    user_id, pid = _player("2010-06-01", 1000, [])
+    with get_db_connection() as conn:
+        cur = conn.cursor()
+        cur.execute("INSERT INTO assets (symbol, name, type) VALUES (%s, %s, 'stocks') RETURNING id", (symbol, symbol))
+        asset_id = cur.fetchone()[0]
+        cur.execute("""
+            INSERT INTO prices_archive (asset_id, year, first_date, last_date, day_mask, close, adj_close, volume)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+        """, (asset_id, 2010, packed["first_date"], packed["last_date"], packed["day_mask"],
+              packed["close"], packed["adj_close"], packed["volume"]))
+        cur.execute("""
+            INSERT INTO transactions (portfolio_id, asset_id, type, symbol, quantity, price_per_unit, date)
+            VALUES (%s, %s, 'BUY', %s, 5, 40.0, '2010-06-01')
+        """, (pid, asset_id, symbol))
+        conn.commit()
+    enabled = portfolio.PRICE_ARCHIVE_ENABLED
+    try:
+        portfolio.PRICE_ARCHIVE_ENABLED = True
+        with get_db_connection() as conn:
+            values = portfolio.bulk_portfolio_values(conn.cursor(), [pid], "2010-09-30")
+        assert values[pid]["assets_value"] == 200.0, f"Archived price not used: {values}"
+    finally:
+        portfolio.PRICE_ARCHIVE_ENABLED = enabled
+        _cleanup([user_id], asset_id=asset_id)
+
+def test_advance_room():
+    room_id = game_rooms.create_room("Test Room", "2016-03-15")["room_id"]
+    players = [
+        _player("2016-03-15", 10000, [{"symbol": "SPY", "side": "BUY", "quantity": 10}]),
+        _player("2016-03-15", 1000, []),
+        _player("2016-03-15", 1000, []),
+    ]
+    try:
+        for _, pid in players:
+            assert "error" not in game_rooms.join_room(room_id, pid)
+        # The last player leaves lockstep by advancing alone
+        straggler = players[2][1]
+        res = game_engine.advance_time(straggler, "2016-04-01")
+        assert "error" not in res, res
+
+        res = game_rooms.advance_room(room_id, "2016-06-10")
+        assert res["advanced"] == 2 and res["skipped_portfolios"] == [straggler], f"Got {res}"
+        assert "error" in game_rooms.advance_room(room_id, "2016-06-10"), "Room cannot stay on the same date"
+
+        standings = res["standings"]
+        totals = [r["total_value"] for r in standings]
+        assert totals == sorted(totals, reverse=True)
+        for row in standings:
+            assert game_engine.get_session(row["portfolio_id"])["sim_date"] == "2016-06-10"
+            single = portfolio.get_portfolio_value(row["portfolio_id"], "2016-06-10")
+            assert abs(row["total_value"] - single["total_value"]) < 1e-6, f"{row} vs {single}"
+        # Three month starts of salary minus expenses
+        cash_player = next(r for r in standings if r["portfolio_id"] == players[1][1])
+        assert abs(cash_player["cash"] - (1000 + 3 * 2000)) < 1e-6, cash_player
+    finally:
+        _cleanup([user_id for user_id, _ in players], room_id=room_id)
+
+def test_room_orders_share_quotes():
+    # Members' open orders on different assets: one quote load for the room
+    room_id = game_rooms.create_room("Order Room", "2016-03-15")["room_id"]
+    players = [_player("2016-03-15", 10000, []) for _ in range(3)]
+    loads = []
+    quote_matrix = db_orders._quote_matrix
+    def counting(cur, asset_ids, start_date, end_date):
+        loads.append(list(asset_ids))
+        return quote_matrix(cur, asset_ids, start_date, end_date)
+    try:
+        for (_, pid), symbol in zip(players, ("SPY", "AAPL", "GLD")):
+            assert "error" not in game_rooms.join_room(room_id, pid)
+            assert "error" not in db_orders.place_order(pid, symbol, "BUY", "LIMIT", 1e6, 1)
+        db_orders._quote_matrix = counting
+        res = game_rooms.advance_room(room_id, "2016-04-10")
+        assert res["advanced"] == 3, res
+        assert len(loads) == 1 and len(loads[0]) == 3, f"Quote loads: {loads}"
+        for _, pid in players:
+            assert db_orders.list_orders(pid)[0]["status"] == "FILLED"
+    finally:
+        db_orders._quote_matrix = quote_matrix
+        _cleanup([user_id for user_id, _ in players], room_id=room_id)
+
+if __name__ == "__main__":
+    print("--- Starting Game Room Tests ---")
+    run_test("Bulk Values Match Single", test_bulk_values_match_single)
+    run_test("Bulk Values Archived Prices", test_bulk_values_archived_prices)
+    run_test("Advance Room", test_advance_room)
+    run_test("Room Orders Share Quotes", test_room_orders_share_quotes)
@@ -0,0 +1,131 @@
+import os
+import numpy as np
+from . import indicators
+from .db_conn import get_db_connection
+from .indicators import INDICATORS, ewm, get_indicators, parse_indicators
+
+def run_test(name, func):
+    print(f"Testing {name}...", end=" ")
+    try:
+        func()
+        print("✅ PASS")
+    except AssertionError as e:
+        print(f"❌ FAIL: {e}")
+    except Exception as e:
+        print(f"❌ ERROR: {e}")
+
+def _closes(n=1500, seed=0):
+    rng = np.random.default_rng(seed)
+    return 100 * np.cumprod(1 + rng.normal(0, 0.02, n))
+
+def _loop_ewm(values, alpha):
+    out = [values[0]]
+    for x in values[1:]:
+        out.append(alpha * x + (1 - alpha) * out[-1])
+    return np.array(out)
+
+def test_ewm_matches_recursion():
+    closes = _closes()
+    for alpha in (2 / 3, 2 / 201, 0.999):
+        assert np.allclose(ewm(closes, alpha), _loop_ewm(closes, alpha), rtol=1e-12), f"alpha {alpha}"
+
+def test_rsi_wilder():
+    closes = _closes(300)
+    change = np.diff(closes)
+    gain = _loop_ewm(np.maximum(change, 0), 1 / 14)
+    loss = _loop_ewm(np.maximum(-change, 0), 1 / 14)
+    expected = 100 - 100 / (1 + gain / loss)
+    value = INDICATORS["rsi"][0](closes, None, 14)[0]["value"]
+    assert np.isnan(value[:14]).all() and not np.isnan(value[14:]).any()
+    assert np.allclose(value[14:], expected[13:]), "RSI differs from Wilder recursion"
+
+def test_bollinger_window():
+    closes = _closes(100)
+    out = INDICATORS["bb"][0](closes, None, 20, 2.0)[0]
+    window = closes[30:50]
+    assert np.isclose(out["middle"][49], window.mean())
+    assert np.isclose(out["upper"][49], window.mean() + 2 * window.std())
+    assert np.isnan(out["lower"][18]) and not np.isnan(out["lower"][19])
+
+def test_incremental_matches_full():
+    # Extending day by day (as a sim advances) gives the full computation
+    closes = _closes(400)
+    for key, name, params in parse_indicators("sma:50,ema:20,rsi:14,macd,bb:20:2"):
+        func = INDICATORS[name][0]
+        full = func(closes, None, *params)[0]
+        parts, carry = {}, None
+        for chunk in np.split(closes, [1, 5, 40, 41, 200, 399]):
+            out, carry = func(chunk, carry, *params)
+            for k, v in out.items():
+                parts.setdefault(k, []).append(v)
+        for k, v in full.items():
+            assert np.allclose(np.concatenate(parts[k]), v, equal_nan=True, rtol=1e-12), f"{key} {k}"
+
+def test_parse_indicators():
+    parsed = parse_indicators("SMA:50, macd, bb:20:2.5, sma:50")
+    assert [p[0] for p in parsed] == ["sma:50", "macd:12:26:9", "bb:20:2.5"], f"Got {parsed}"
+    assert "error" in parse_indicators("foo:3")
+    assert "error" in parse_indicators("sma:0")
+    assert "error" in parse_indicators("rsi:14:2")
+
+def _insert_closes(asset_id, days, closes):
+    with get_db_connection() as conn:
+        conn.cursor().executemany(
+            "INSERT INTO prices (asset_id, date, close, adj_close, volume) VALUES (%s, %s, %s, %s, 0)",
+            [(asset_id, str(d), float(c), float(c)) for d, c in zip(days, closes)]
+        )
+        conn.commit()
+
+def test_late_rows_picked_up():
+    # A request past the last stored close must not hide rows ingested later
+    symbol = f"IND_{os.urandom(4).hex().upper()}"
+    days = np.arange(np.datetime64("2020-01-01"), np.datetime64("2020-03-01"))
+    days = days[np.is_busday(days)]
+    closes = _closes(len(days))
+    with get_db_connection() as conn:
+        cur = conn.cursor()
+        cur.execute("INSERT INTO assets (symbol, name, type) VALUES (%s, %s, 'stocks') RETURNING id", (symbol, symbol))
+        asset_id = cur.fetchone()[0]
+        conn.commit()
+    try:
+        _insert_closes(asset_id, days[:20], closes[:20])
+        first = get_indicators(symbol, "2020-02-28", "sma:5")
+        assert "error" not in first, first
+        assert len(first["dates"]) == 20, f"Got {len(first['dates'])} rows"
+
+        _insert_closes(asset_id, days[20:], closes[20:])
+        res = get_indicators(symbol, "2020-02-28", "sma:5")
+        assert res["dates"] == [str(d) for d in days], "Rows added after the first request are missing"
+        assert np.allclose(res["indicators"]["sma:5"][4:], np.convolve(closes, np.ones(5) / 5, "valid"))
+        earlier = get_indicators(symbol, "2020-01-15", "sma:5")
+        assert earlier["dates"][-1] == "2020-01-15" and earlier["close"] == res["close"][:len(earlier["close"])]
+    finally:
+        with get_db_connection() as conn:
+            conn.cursor().execute("DELETE FROM assets WHERE id = %s", (asset_id,))
+            conn.commit()
+
+def test_fetch_outside_lock():
+    # An end past the last close queries every time; it must not block other symbols
+    fetch = indicators._fetch_closes
+    held = []
+    def checking(asset_id, after, end):
+        held.append(indicators._lock.locked())
+        return fetch(asset_id, after, end)
+    indicators._fetch_closes = checking
+    try:
+        first = get_indicators("SPY", "2100-01-01", "sma:20")
+        again = get_indicators("SPY", "2100-01-01", "sma:20")
+        assert "error" not in first and again == first
+        assert held and not any(held), f"Fetched under the lock: {held}"
+    finally:
+        indicators._fetch_closes = fetch
+
+if __name__ == "__main__":
+    print("--- Starting Indicator Tests ---")
+    run_test("EWM Matches Recursion", test_ewm_matches_recursion)
+    run_test("RSI Wilder", test_rsi_wilder)
+    run_test("Bollinger Window", test_bollinger_window)
+    run_test("Incremental Matches Full", test_incremental_matches_full)
+    run_test("Parse Indicators", test_parse_indicators)
+    run_test("Late Rows Picked Up", test_late_rows_picked_up)
+    run_test("Fetch Outside Lock", test_fetch_outside_lock)
@@ -0,0 +1,92 @@
+import os
+import random
+from . import db_portfolio as portfolio
+from . import game_engine
+from . import leaderboard
+from .db_conn import get_db_connection
+from .leaderboard import _Board
+
+def run_test(name, func):
+    print(f"Testing {name}...", end=" ")
+    try:
+        func()
+        print("✅ PASS")
+    except AssertionError as e:
+        print(f"❌ FAIL: {e}")
+    except Exception as e:
+        print(f"❌ ERROR: {e}")
+
+def _entry(pid, total, ret):
+    return {"portfolio_id": pid, "total_value": total, "return_pct": ret}
+
+def test_board_ranking():
+    board = _Board()
+    entries = [_entry(1, 500.0, 10.0), _entry(2, 900.0, -5.0), _entry(3, 100.0, None), _entry(4, 300.0, 25.0)]
+    for e in entries:
+        board.add(e)
+    assert board.top("return", 4) == [4, 1, 2, 3], f"Got {board.top('return', 4)}"
+    assert board.top("value", 2) == [2, 1]
+
+def test_board_update():
+    # An update is remove(old) + add(new); the old key must not linger
+    board = _Board()
+    old, other = _entry(1, 500.0, 10.0), _entry(2, 600.0, 20.0)
+    board.add(old)
+    board.add(other)
+    board.remove(old)
+    board.add(_entry(1, 800.0, 60.0))
+    assert board.top("return", 5) == [1, 2], f"Got {board.top('return', 5)}"
+    assert len(board) == 2
+
+def test_board_churn():
+    # Many updates of the same portfolios: stale keys never surface and get compacted
+    rng = random.Random(7)
+    board = _Board()
+    current = {pid: _entry(pid, 100.0, 0.0) for pid in range(50)}
+    for e in current.values():
+        board.add(e)
+    for _ in range(2000):
+        pid = rng.randrange(50)
+        board.remove(current[pid])
+        current[pid] = _entry(pid, rng.uniform(0, 1000), rng.choice([None, rng.uniform(-50, 50)]))
+        board.add(current[pid])
+    expected = sorted(current, key=lambda p: (-current[p]["total_value"], p))
+    assert board.top("value", 10) == expected[:10], "Top 10 differs from a full sort"
+    assert board.top("value", 100) == expected, "Repeated reads must return the same ranking"
+    assert len(board) == 50 and len(board.heaps["value"]) <= 2 * 50 + 64 + 1
+
+def test_failed_load_keeps_dirty():
+    # A revaluation that fails must leave the portfolio queued, not drop its update
+    user_id = portfolio.create_user(f"gamer_{os.urandom(4).hex()}")
+    pid = portfolio.create_portfolio(user_id, "BoardPort")["id"]
+    load = leaderboard._load
+    try:
+        assert "session_id" in game_engine.create_session(user_id, pid, "2016-03-15", 3000, 1000, 5000)
+        assert "error" not in leaderboard.get_leaderboard(by="value", limit=1000)
+        assert "error" not in portfolio.execute_orders(pid, [{"symbol": "SPY", "side": "BUY", "quantity": 10}], "2016-03-15")
+        leaderboard.mark_dirty(pid)
+
+        def failing(cur, portfolio_ids=None):
+            raise RuntimeError("connection lost")
+        leaderboard._load = failing
+        assert "error" in leaderboard.get_leaderboard(by="value", limit=1000)
+        assert pid in leaderboard._dirty, "Dirty mark lost with the failed load"
+
+        leaderboard._load = load
+        res = leaderboard.get_leaderboard(by="value", limit=1000)
+        entry = next(e for e in res["entries"] if e["portfolio_id"] == pid)
+        assert abs(entry["total_value"] - portfolio.get_portfolio_value(pid, "2016-03-15")["total_value"]) < 1e-6, entry
+        assert pid not in leaderboard._dirty
+    finally:
+        leaderboard._load = load
+        with get_db_connection() as conn:
+            conn.cursor().execute("DELETE FROM users WHERE id = %s", (user_id,))
+            conn.commit()
+        leaderboard.mark_dirty(pid)
+
+if __name__ == "__main__":
+    print("--- Starting Leaderboard Tests ---")
+    run_test("Board Ranking", test_board_ranking)
+    run_test("Board Update", test_board_update)
+    run_test("Board Churn", test_board_churn)
+    run_test("Failed Load Keeps Dirty", test_failed_load_keeps_dirty)
@@ -0,0 +1,64 @@
+import time
+import numpy as np
+from .optimizer import project_capped_simplex, solve_frontier, gamma_grid, max_sharpe_weights
+
+def run_test(name, func):
+    print(f"Testing {name}...", end=" ")
+    try:
+        func()
+        print("✅ PASS")
+    except AssertionError as e:
+        print(f"❌ FAIL: {e}")
+    except Exception as e:
+        print(f"❌ ERROR: {e}")
+
+def _problem(n, seed=0):
+    rng = np.random.default_rng(seed)
+    factors = rng.normal(size=(n, 3)) * 0.1
+    cov = factors @ factors.T + np.diag(rng.uniform(0.01, 0.09, n))
+    return rng.uniform(0.0, 0.2, n), cov
+
+def test_projection():
+    v = np.array([[0.9, 0.5, -0.2, 0.1], [3.0, 3.0, 3.0, 3.0]])
+    w = project_capped_simplex(v, 0.0, 0.4)
+    assert np.allclose(w.sum(axis=1), 1.0) and w.min() >= 0 and w.max() <= 0.4
+    assert np.allclose(w[0], [0.4, 0.4, 0.0, 0.2]), f"Got {w[0]}"
+    assert np.allclose(w[1], 0.25)
+
+def test_loose_bounds_match_closed_form():
+    mu, cov = _problem(8)
+    gammas = [0.0, 0.05]
+    exact = solve_frontier(mu, cov, gammas)
+    bounded = solve_frontier(mu, cov, gammas, -10.0, 10.0)
+    assert np.abs(exact - bounded).max() < 1e-6, f"Diff {np.abs(exact - bounded).max()}"
+
+def test_long_only_max_sharpe():
+    # Brute force over a fine grid of the 3-asset simplex
+    mu, cov = _problem(3, seed=1)
+    a, b = np.meshgrid(np.linspace(0, 1, 401), np.linspace(0, 1, 401))
+    grid = np.column_stack([a.ravel(), b.ravel(), 1 - a.ravel() - b.ravel()])
+    grid = grid[grid[:, 2] >= 0]
+    sharpe = (grid @ mu - 0.02) / np.sqrt(np.einsum("ki,ij,kj->k", grid, cov, grid))
+    w = max_sharpe_weights(mu, cov, 0.02, 0.0, 1.0)
+    best = (w @ mu - 0.02) / np.sqrt(w @ cov @ w)
+    assert best >= sharpe.max() - 1e-6, f"{best} < {sharpe.max()}"
+
+def test_capped_frontier_100_assets():
+    mu, cov = _problem(100)
+    start = time.perf_counter()
+    gammas = gamma_grid(mu, cov, 20)
+    w = solve_frontier(mu, cov, gammas, 0.0, 0.05)
+    max_sharpe_weights(mu, cov, 0.0, 0.0, 0.05, gammas, w)
+    elapsed = time.perf_counter() - start
+    assert np.allclose(w.sum(axis=1), 1.0) and w.min() >= 0 and w.max() <= 0.05 + 1e-12
+    ret = w @ mu
+    var = np.einsum("ki,ij,kj->k", w, cov, w)
+    assert np.all(np.diff(ret) >= -1e-9) and np.all(np.diff(var) >= -1e-9), "Frontier not monotone"
+    assert elapsed < 1.0, f"Took {elapsed:.2f}s"
+
+if __name__ == "__main__":
+    print("--- Starting Optimizer Tests ---")
+    run_test("Projection", test_projection)
+    run_test("Loose Bounds Match Closed Form", test_loose_bounds_match_closed_form)
+    run_test("Long-Only Max Sharpe", test_long_only_max_sharpe)
+    run_test("Capped Frontier 100 Assets", test_capped_frontier_100_assets)
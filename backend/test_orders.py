@@ -0,0 +1,99 @@
+import os
+import numpy as np
+from . import db_orders
+from . import game_engine
+from . import db_portfolio as portfolio
+from .auto_invest import set_plan
+from .db_conn import get_db_connection
+from .db_orders import first_trigger, triggers_below
+from .db_prices import lookup_asset
+
+def run_test(name, func):
+    print(f"Testing {name}...", end=" ")
+    try:
+        func()
+        print("✅ PASS")
+    except AssertionError as e:
+        print(f"❌ FAIL: {e}")
+    except Exception as e:
+        print(f"❌ ERROR: {e}")
+
+def test_trigger_directions():
+    assert triggers_below("LIMIT", "BUY") and triggers_below("STOP", "SELL")
+    assert not triggers_below("LIMIT", "SELL") and not triggers_below("STOP", "BUY")
+    assert not triggers_below("TAKE_PROFIT", "SELL")
+
+def test_first_trigger():
+    path = np.array([100.0, 95.0, np.nan, 80.0, 120.0])
+    prices = np.column_stack([path, path, path, path])
+    triggers = np.array([90.0, 110.0, 50.0, 95.0])
+    below = np.array([True, False, True, True])
+    triggered, row = first_trigger(prices, triggers, below)
+    assert triggered.tolist() == [True, True, False, True]
+    # Days without a quote (NaN) never trigger; equality counts as a cross
+    assert row[0] == 3 and row[1] == 4 and row[3] == 1, f"Got {row}"
+
+def test_quote_matrix_window():
+    # Only closes inside the window, read on the caller's cursor
+    spy, btc = lookup_asset("SPY")["id"], lookup_asset("BTC")["id"]
+    with get_db_connection() as conn:
+        dates, quotes = db_orders._quote_matrix(conn.cursor(), [spy, btc], "2015-01-03", "2015-01-06")
+    assert [str(d) for d in dates] == ["2015-01-03", "2015-01-04", "2015-01-05", "2015-01-06"], dates
+    assert np.isnan(quotes[:2, 0]).all() and np.isfinite(quotes[2:, 0]).all(), "SPY has no weekend closes"
+    assert np.isfinite(quotes[:, 1]).all()
+
+def _session(start_date, salary):
+    user_id = portfolio.create_user(f"gamer_{os.urandom(4).hex()}")
+    pid = portfolio.create_portfolio(user_id, "OrderPort")["id"]
+    res = game_engine.create_session(user_id, pid, start_date, salary, 0)
+    assert "session_id" in res, f"Start session failed: {res}"
+    return user_id, pid
+
+def _cleanup(user_id):
+    with get_db_connection() as conn:
+        conn.cursor().execute("DELETE FROM users WHERE id = %s", (user_id,))
+        conn.commit()
+
+def _statuses(pid):
+    return {o["symbol"]: (o["status"], o["filled_date"]) for o in db_orders.list_orders(pid)}
+
+def test_fill_before_salary_rejected():
+    # Both orders trigger on the first trading day, before any salary or
+    # auto-invest buy: the end-of-window cash and holdings must not fund them
+    user_id, pid = _session("2015-01-15", 5000)
+    try:
+        set_plan(pid, {"SPY": 0.5})
+        db_orders.place_order(pid, "AAPL", "BUY", "LIMIT", 1e6, 10)
+        db_orders.place_order(pid, "SPY", "SELL", "LIMIT", 1.0, 1)
+        res = game_engine.advance_time(pid, "2015-03-10")
+        assert res["orders_rejected"] == 2 and res["orders_filled"] == 0, f"Got {res}"
+        statuses = _statuses(pid)
+        assert statuses["AAPL"] == ("REJECTED", "2015-01-16"), statuses
+        assert statuses["SPY"] == ("REJECTED", "2015-01-16"), statuses
+    finally:
+        _cleanup(user_id)
+
+def test_fill_after_salary():
+    # Starts on a Saturday: Feb 1 salary lands before the first trading day
+    user_id, pid = _session("2015-01-31", 5000)
+    try:
+        db_orders.place_order(pid, "AAPL", "BUY", "LIMIT", 1e6, 10)
+        res = game_engine.advance_time(pid, "2015-03-10")
+        assert res["orders_filled"] == 1, f"Got {res}"
+        order = db_orders.list_orders(pid)[0]
+        assert order["filled_date"] == "2015-02-02", order
+        with get_db_connection() as conn:
+            cur = conn.cursor()
+            cur.execute("SELECT cash_balance FROM portfolios WHERE id = %s", (pid,))
+            cash = float(cur.fetchone()[0])
+        assert abs(cash - (2 * 5000 - 10 * order["fill_price"])) < 1e-6, f"Cash {cash}"
+    finally:
+        _cleanup(user_id)
+
+if __name__ == "__main__":
+    print("--- Starting Conditional Order Tests ---")
+    run_test("Trigger Directions", test_trigger_directions)
+    run_test("First Trigger", test_first_trigger)
+    run_test("Quote Matrix Window", test_quote_matrix_window)
+    run_test("Fill Before Salary Rejected", test_fill_before_salary_rejected)
+    run_test("Fill After Salary", test_fill_after_salary)
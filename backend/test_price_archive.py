@@ -0,0 +1,43 @@
+import numpy as np
+from datetime import date
+from .price_archive import pack_year, unpack_year, archivable_before
+
+def run_test(name, func):
+    print(f"Testing {name}...", end=" ")
+    try:
+        func()
+        print("✅ PASS")
+    except AssertionError as e:
+        print(f"❌ FAIL: {e}")
+    except Exception as e:
+        print(f"❌ ERROR: {e}")
+
+def test_pack_roundtrip():
+    # Leap year, unordered input, includes Dec 31 (offset 365)
+    dates = [date(2020, 12, 31), date(2020, 1, 2), date(2020, 2, 29), date(2020, 1, 1)]
+    close = [4.0, 2.0, 3.0, 1.0]
+    packed = pack_year(2020, dates, close, close, [40, 20, 30, 10])
+
+    assert len(packed["day_mask"]) == 46, "366 bits should pack into 46 bytes"
+    assert packed["first_date"] == date(2020, 1, 1) and packed["last_date"] == date(2020, 12, 31)
+    assert packed["close"] == [1.0, 2.0, 3.0, 4.0], "Values must be stored in date order"
+
+    out_dates, out_close, _, out_volume = unpack_year(2020, packed["day_mask"], packed["close"], packed["adj_close"], packed["volume"])
+    assert out_dates.tolist() == sorted(dates), f"Got {out_dates}"
+    assert out_close.tolist() == [1.0, 2.0, 3.0, 4.0]
+    assert out_volume.tolist() == [10, 20, 30, 40]
+
+def test_mask_bit_order():
+    # Must match Postgres get_bit(bytea, n): LSB of the first byte is bit 0
+    packed = pack_year(2021, [date(2021, 1, 1), date(2021, 1, 9)], [1.0, 2.0], [1.0, 2.0], [0, 0])
+    assert packed["day_mask"][0] == 0b00000001 and packed["day_mask"][1] == 0b00000001
+
+def test_archivable_before():
+    assert archivable_before(2, date(2024, 6, 1)) == 2023
+    assert archivable_before(0, date(2024, 6, 1)) == 2024, "Current year is never archived"
+
+if __name__ == "__main__":
+    print("--- Starting Price Archive Tests ---")
+    run_test("Pack/Unpack Roundtrip", test_pack_roundtrip)
+    run_test("Bitmap Bit Order", test_mask_bit_order)
+    run_test("Closed Year Cutoff", test_archivable_before)
@@ -0,0 +1,50 @@
+import numpy as np
+from .price_matrix import align_prices, forward_fill, normalize_columns, to_json_column
+
+def run_test(name, func):
+    print(f"Testing {name}...", end=" ")
+    try:
+        func()
+        print("✅ PASS")
+    except AssertionError as e:
+        print(f"❌ FAIL: {e}")
+    except Exception as e:
+        print(f"❌ ERROR: {e}")
+
+def _d(*dates):
+    return np.array(dates, dtype="datetime64[D]")
+
+def test_forward_fill():
+    m = np.array([[np.nan, 1.0], [2.0, np.nan], [np.nan, np.nan], [4.0, 5.0]])
+    filled = forward_fill(m)
+    assert np.isnan(filled[0, 0]), "Leading NaN must stay NaN"
+    assert filled[2, 0] == 2.0 and filled[2, 1] == 1.0, f"Gap not filled: {filled}"
+    assert filled[3].tolist() == [4.0, 5.0]
+
+def test_align_mixed_calendars():
+    # Asset 7 trades daily (crypto), asset 3 only on weekdays.
+    # 2024-01-05 is a Friday, 2024-01-06/07 the weekend.
+    row_assets = np.array([7, 7, 7, 7, 3, 3, 3])
+    row_dates = _d("2024-01-04", "2024-01-05", "2024-01-06", "2024-01-08",
+                   "2024-01-03", "2024-01-05", "2024-01-08")
+    row_prices = np.array([10.0, 11.0, 12.0, 13.0, 100.0, 101.0, 102.0])
+
+    dates, matrix = align_prices(row_assets, row_dates, row_prices, [3, 7], "2024-01-04")
+
+    assert [str(d) for d in dates] == ["2024-01-04", "2024-01-05", "2024-01-06", "2024-01-08"]
+    # Asset 3 has no row on 01-04, so it is seeded from 01-03 (before the window)
+    assert matrix[:, 0].tolist() == [100.0, 101.0, 101.0, 102.0], f"Got {matrix[:, 0]}"
+    assert matrix[:, 1].tolist() == [10.0, 11.0, 12.0, 13.0], f"Got {matrix[:, 1]}"
+
+def test_normalize_late_listing():
+    m = np.array([[50.0, np.nan], [100.0, 20.0], [75.0, 30.0]])
+    n = normalize_columns(m)
+    assert n[0, 0] == 100.0 and n[1, 0] == 200.0
+    assert np.isnan(n[0, 1]) and n[1, 1] == 100.0 and n[2, 1] == 150.0
+    assert to_json_column(n[:, 1]) == [None, 100.0, 150.0]
+
+if __name__ == "__main__":
+    print("--- Starting Price Matrix Tests ---")
+    run_test("Forward Fill", test_forward_fill)
+    run_test("Alignment Across Calendars", test_align_mixed_calendars)
+    run_test("Normalization", test_normalize_late_listing)
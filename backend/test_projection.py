@@ -0,0 +1,48 @@
+import numpy as np
+from .projection import block_indices, simulate_paths
+
+def run_test(name, func):
+    print(f"Testing {name}...", end=" ")
+    try:
+        func()
+        print("✅ PASS")
+    except AssertionError as e:
+        print(f"❌ FAIL: {e}")
+    except Exception as e:
+        print(f"❌ ERROR: {e}")
+
+def test_block_indices():
+    idx = block_indices(50, 14, 200, 5, np.random.default_rng(0))
+    assert idx.shape == (14, 200)
+    assert idx.min() >= 0 and idx.max() < 50
+    # Rows inside a block are consecutive history periods
+    assert (np.diff(idx[:5], axis=0) == 1).all() and (np.diff(idx[5:10], axis=0) == 1).all()
+
+def test_flat_returns():
+    # With zero returns the value is just holdings + cash + invested flows
+    returns = np.zeros((24, 2))
+    total = simulate_paths(returns, [600.0, 400.0], 50.0, 100.0, 12, 1, 10, 3, np.random.default_rng(0))
+    assert total.shape == (13, 10)
+    assert np.allclose(total[:, 0], 1050.0 + 100.0 * np.arange(13)), f"Got {total[:, 0]}"
+
+def test_constant_growth_with_flows():
+    # 1% per step on a single asset matches the closed-form annuity
+    returns = np.full((24, 1), 0.01)
+    total = simulate_paths(returns, [1000.0], 0.0, 100.0, 12, 1, 4, 6, np.random.default_rng(0))
+    expected = 1000.0
+    for _ in range(12):
+        expected = expected * 1.01 + 100.0
+    assert np.allclose(total[-1], expected), f"Got {total[-1]}, expected {expected}"
+
+def test_negative_flow_drawn_from_cash():
+    returns = np.zeros((24, 1))
+    total = simulate_paths(returns, [1000.0], 500.0, -100.0, 42, 21, 3, 20, np.random.default_rng(0))
+    # Daily steps: one withdrawal every 21 steps
+    assert np.allclose(total[[0, 20, 21, 42], 0], [1500.0, 1500.0, 1400.0, 1300.0])
+
+if __name__ == "__main__":
+    print("--- Starting Projection Tests ---")
+    run_test("Block Indices", test_block_indices)
+    run_test("Flat Returns", test_flat_returns)
+    run_test("Constant Growth With Flows", test_constant_growth_with_flows)
+    run_test("Negative Flow From Cash", test_negative_flow_drawn_from_cash)
@@ -0,0 +1,44 @@
+import numpy as np
+from .db_portfolio import rebalance_trades
+
+def run_test(name, func):
+    print(f"Testing {name}...", end=" ")
+    try:
+        func()
+        print("✅ PASS")
+    except AssertionError as e:
+        print(f"❌ FAIL: {e}")
+    except Exception as e:
+        print(f"❌ ERROR: {e}")
+
+def test_fractional_targets():
+    # 1000 total: 10 units @ 50 + 500 cash -> 60/40 of 1000
+    delta = rebalance_trades([10.0, 0.0], [50.0, 20.0], [0.6, 0.4], 500.0)
+    assert np.allclose(delta, [2.0, 20.0]), f"Got {delta}"
+
+def test_whole_units_stay_affordable():
+    # Buys round down, sells round up: cash never goes negative
+    units, prices = np.array([3.3, 0.0]), np.array([30.0, 7.0])
+    delta = rebalance_trades(units, prices, [0.0, 1.0], 1.0, fractional=False)
+    assert delta[0] == -3.3 and delta[1] == 14.0, f"Got {delta}"
+    assert 1.0 - delta @ prices >= 0
+
+def test_min_trade_scales_buys():
+    # The 5.0 sell is under min_trade, so the buy is scaled to the cash on hand
+    delta = rebalance_trades([1.0, 0.0], [5.0, 10.0], [0.0, 1.0], 50.0, min_trade=6.0)
+    assert delta[0] == 0.0 and np.isclose(delta[1], 5.0), f"Got {delta}"
+
+def test_many_assets():
+    rng = np.random.default_rng(0)
+    n = 500
+    units, prices = rng.uniform(0, 10, n), rng.uniform(1, 500, n)
+    delta = rebalance_trades(units, prices, np.full(n, 1.0 / n), 1000.0)
+    after = (units + delta) * prices
+    assert np.allclose(after / after.sum(), 1.0 / n)
+
+if __name__ == "__main__":
+    print("--- Starting Rebalance Tests ---")
+    run_test("Fractional Targets", test_fractional_targets)
+    run_test("Whole Units Stay Affordable", test_whole_units_stay_affordable)
+    run_test("Min Trade Scales Buys", test_min_trade_scales_buys)
+    run_test("Many Assets", test_many_assets)
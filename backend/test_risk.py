@@ -0,0 +1,48 @@
+import numpy as np
+from .risk import historical_var, horizon_pnl, scenario_path
+
+def run_test(name, func):
+    print(f"Testing {name}...", end=" ")
+    try:
+        func()
+        print("✅ PASS")
+    except AssertionError as e:
+        print(f"❌ FAIL: {e}")
+    except Exception as e:
+        print(f"❌ ERROR: {e}")
+
+def test_var_and_shortfall():
+    # 100 losses of 1..100 among 2000 outcomes; quantiles interpolate between samples
+    pnl = np.concatenate([-np.arange(1, 101, dtype=float), np.zeros(1900)])
+    var, es = historical_var(pnl, 0.95)
+    assert np.isclose(var, 0.05), f"Got {var}"
+    var, es = historical_var(pnl, 0.99)
+    assert np.isclose(var, 80.01), f"Got {var}"
+    assert np.isclose(es, np.arange(81, 101).mean()), f"Got {es}"
+
+def test_horizon_pnl_matches_revaluation():
+    rng = np.random.default_rng(0)
+    prices = 100 * np.cumprod(1 + rng.normal(0, 0.01, (60, 3)), axis=0)
+    prices[:20, 2] = np.nan  # listed later: flat before it has a price
+    units = np.array([2.0, 5.0, 1.0])
+    values = units * prices[-1]
+    pnl = horizon_pnl(prices, values, 10)
+    t = 30
+    expected = (values * (prices[t + 10] / prices[t] - 1)).sum()
+    assert len(pnl) == 50 and np.isclose(pnl[t], expected)
+    assert np.isclose(pnl[5], (values[:2] * (prices[15, :2] / prices[5, :2] - 1)).sum())
+
+def test_scenario_path():
+    dates = np.arange(np.datetime64("2020-02-17"), np.datetime64("2020-02-17") + 10)
+    prices = np.column_stack([np.linspace(100, 80, 10), np.r_[np.nan, np.nan, np.nan, np.linspace(50, 60, 7)]])
+    values = np.array([1000.0, 500.0])
+    path_dates, path, covered = scenario_path(dates, prices, values, "2020-02-18", "2020-02-25")
+    assert str(path_dates[0]) == "2020-02-18" and str(path_dates[-1]) == "2020-02-25"
+    assert covered.tolist() == [True, False]
+    assert np.isclose(path[-1], 1000 * (prices[8, 0] / prices[1, 0] - 1))
+
+if __name__ == "__main__":
+    print("--- Starting Risk Tests ---")
+    run_test("VaR And Shortfall", test_var_and_shortfall)
+    run_test("Horizon P&L Matches Revaluation", test_horizon_pnl_matches_revaluation)
+    run_test("Scenario Path", test_scenario_path)
@@ -0,0 +1,93 @@
+import os
+import time
+import numpy as np
+from datetime import date, timedelta
+from . import db_prices
+from .db_conn import get_db_connection
+from .screener import screen, screen_matrix
+
+def run_test(name, func):
+    print(f"Testing {name}...", end=" ")
+    try:
+        func()
+        print("✅ PASS")
+    except AssertionError as e:
+        print(f"❌ FAIL: {e}")
+    except Exception as e:
+        print(f"❌ ERROR: {e}")
+
+def _dates(n):
+    return np.arange(np.datetime64("2021-01-01"), np.datetime64("2021-01-01") + n)
+
+def test_returns_and_drawdown():
+    quotes = np.array([
+        [110.0, np.nan, np.nan],
+        [np.nan, 50.0, np.nan],
+        [99.0, 40.0, np.nan],
+        [121.0, 60.0, np.nan],
+    ])
+    before = np.array([100.0, np.nan, 7.0])
+    stats = screen_matrix(_dates(4), quotes, before, "2020-12-31", "2021-01-04")
+    assert np.allclose(stats["return"][:2], [0.21, 0.2]), f"Got {stats['return']}"
+    assert np.allclose(stats["max_drawdown"][:2], [-0.1, -0.2])
+    assert stats["partial"].tolist() == [False, True, False]
+    # No close in the window: screened out by the caller
+    assert stats["traded"].tolist() == [True, True, False]
+
+def test_volatility_on_traded_days():
+    # Weekday-only quotes: forward-filled weekends must not dilute volatility
+    rng = np.random.default_rng(0)
+    dates = _dates(364)
+    returns = rng.normal(0, 0.01, len(dates))
+    closes = 100 * np.cumprod(1 + returns)
+    weekday = (dates.astype("datetime64[D]").view("int64") - 4) % 7 < 5
+    quotes = np.where(weekday, closes, np.nan)[:, None]
+    stats = screen_matrix(dates, quotes, np.array([100.0]), "2020-12-31", str(dates[-1]))
+
+    traded = quotes[:, 0][weekday]
+    daily = np.diff(np.concatenate([[100.0], traded])) / np.concatenate([[100.0], traded[:-1]])
+    expected = daily.std(ddof=1) * np.sqrt(len(daily) / (364 / 365.25))
+    assert np.isclose(stats["volatility"][0], expected), f"{stats['volatility'][0]} vs {expected}"
+
+def _insert_price(asset_id, day, price):
+    with get_db_connection() as conn:
+        conn.cursor().execute(
+            "INSERT INTO prices (asset_id, date, close, adj_close, volume) VALUES (%s, %s, %s, %s, 0)",
+            (asset_id, day, price, price))
+        conn.commit()
+
+def test_today_follows_new_prices():
+    # A screen for today must not keep serving the universe from before today's load
+    symbol = f"SCR_{os.urandom(4).hex().upper()}"
+    with get_db_connection() as conn:
+        cur = conn.cursor()
+        cur.execute("INSERT INTO assets (symbol, name, type) VALUES (%s, %s, 'stocks') RETURNING id", (symbol, symbol))
+        asset_id = cur.fetchone()[0]
+        conn.commit()
+    checked = db_prices._data_version_checked
+    try:
+        _insert_price(asset_id, date.today() - timedelta(days=10), 10.0)
+        db_prices.invalidate_caches()
+        db_prices._data_version_checked = time.monotonic()  # the generation stays put
+
+        def price():
+            res = screen(sort="symbol", order="asc", limit=500)
+            return next((r["price"] for r in res["results"] if r["symbol"] == symbol), None)
+        assert price() == 10.0
+        _insert_price(asset_id, date.today(), 20.0)
+        # Statistics are flushed asynchronously, within about a second
+        deadline = time.monotonic() + 5
+        while price() != 20.0 and time.monotonic() < deadline:
+            time.sleep(0.2)
+        assert price() == 20.0, "Today's screen still served from before the new prices"
+    finally:
+        db_prices._data_version_checked = checked
+        with get_db_connection() as conn:
+            conn.cursor().execute("DELETE FROM assets WHERE id = %s", (asset_id,))
+            conn.commit()
+
+if __name__ == "__main__":
+    print("--- Starting Screener Tests ---")
+    run_test("Returns And Drawdown", test_returns_and_drawdown)
+    run_test("Volatility On Traded Days", test_volatility_on_traded_days)
+    run_test("Today Follows New Prices", test_today_follows_new_prices)
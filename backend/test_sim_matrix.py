@@ -0,0 +1,45 @@
+import numpy as np
+from .simulator import extreme_holds, simulate_invest_matrix
+
+def run_test(name, func):
+    print(f"Testing {name}...", end=" ")
+    try:
+        func()
+        print("✅ PASS")
+    except AssertionError as e:
+        print(f"❌ FAIL: {e}")
+    except Exception as e:
+        print(f"❌ ERROR: {e}")
+
+def test_rising_series():
+    # Every hold gains: the worst is still a real hold, never buy == sell
+    best, worst = extreme_holds(np.array([100.0, 101.0, 110.0, 111.0, 150.0]))
+    assert best == (0, 4), f"Got {best}"
+    assert worst[1] > worst[0], f"Zero-length worst hold {worst}"
+    assert worst == (2, 3), f"Got {worst}"
+
+def test_matches_brute_force():
+    prices = np.random.default_rng(3).lognormal(0.0, 0.2, 60)
+    growth = prices[None, :] / prices[:, None]
+    growth[np.tril_indices(len(prices))] = np.nan
+    best, worst = extreme_holds(prices)
+    assert np.isclose(growth[best], np.nanmax(growth)) and np.isclose(growth[worst], np.nanmin(growth))
+
+def test_matrix_endpoint():
+    result = simulate_invest_matrix(1000, "SPY", "yearly")
+    assert "error" not in result, result
+    assert all(row[0] == 1000 for row in result["values"]), "Selling on the buy date returns the amount"
+    for key in ("best", "worst"):
+        assert result[key]["sell"] > result[key]["buy"], f"{key}: {result[key]}"
+    assert result["worst"]["value"] <= min(v for row in result["values"] for v in row[1:])
+
+def test_canonical_symbol():
+    result = simulate_invest_matrix(1000, "btc", "yearly")
+    assert result.get("symbol") == "BTC-USD", f"Got {result.get('symbol')}"
+
+if __name__ == "__main__":
+    print("--- Starting Simulate Matrix Tests ---")
+    run_test("Rising Series", test_rising_series)
+    run_test("Matches Brute Force", test_matches_brute_force)
+    run_test("Matrix Endpoint", test_matrix_endpoint)
+    run_test("Canonical Symbol", test_canonical_symbol)
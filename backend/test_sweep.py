@@ -0,0 +1,69 @@
+import json
+import numpy as np
+from . import sweep
+from .sweep import expand_grid, stream_sweep
+
+def run_test(name, func):
+    print(f"Testing {name}...", end=" ")
+    try:
+        func()
+        print("✅ PASS")
+    except AssertionError as e:
+        print(f"❌ FAIL: {e}")
+    except Exception as e:
+        print(f"❌ ERROR: {e}")
+
+def test_expand_grid():
+    combos = expand_grid({"contribution": [100, 200], "start": ["2000-01-01"]})
+    assert combos == [
+        {"contribution": 100, "start": "2000-01-01"},
+        {"contribution": 200, "start": "2000-01-01"},
+    ], f"Got {combos}"
+
+def test_stream_sweep():
+    dates = np.arange(np.datetime64("2020-01-01"), np.datetime64("2020-12-31"))
+    prices = np.linspace(100, 200, len(dates))[:, None]
+    plan = {
+        "strategy": "dca",
+        "symbols": ["A"],
+        "missing": [],
+        "combos": expand_grid({"start": ["2020-01-01", "2020-07-01"], "contribution": [0, 100]}),
+        "base": {"initial_cash": 1000},
+        "dates": dates,
+        "prices": prices,
+    }
+    lines = [json.loads(line) for line in stream_sweep(plan, workers=2)]
+    assert lines[0]["type"] == "header" and lines[-1] == {"type": "done", "count": 4, "errors": 0, "workers": 2}
+
+    results = sorted(lines[1:-1], key=lambda r: r["index"])
+    assert [r["start"] for r in results] == ["2020-01-01", "2020-07-01", "2020-01-01", "2020-07-01"]
+    # Lump sum from Jan 1 rides the full 100 -> 200 move
+    assert abs(results[0]["stats"]["total_return"] - (prices[-1, 0] / prices[0, 0] - 1)) < 1e-9
+    assert results[2]["stats"]["total_contributed"] == 1000 + 12 * 100
+
+def test_failed_variant_row():
+    dates = np.arange(np.datetime64("2020-01-01"), np.datetime64("2020-03-01"))
+    plan = {
+        "strategy": "dca",
+        "symbols": ["A"],
+        "missing": [],
+        "combos": expand_grid({"contribution": [100, "bad"]}),
+        "base": {"initial_cash": 1000},
+        "dates": dates,
+        "prices": np.full((len(dates), 1), 100.0),
+    }
+    lines = [json.loads(line) for line in stream_sweep(plan, workers=2)]
+    failed = [r for r in lines if r["type"] == "result" and "error" in r]
+    assert failed == [{"type": "result", "index": 1, "params": {"contribution": "bad"}, "error": "Variant failed"}], f"Got {failed}"
+    assert lines[-1]["errors"] == 1
+
+    # The next sweep reuses the same pool
+    pool = sweep._pool
+    list(stream_sweep(plan, workers=1))
+    assert sweep._pool is pool
+
+if __name__ == "__main__":
+    print("--- Starting Sweep Tests ---")
+    run_test("Expand Grid", test_expand_grid)
+    run_test("Stream Sweep", test_stream_sweep)
+    run_test("Failed Variant Row", test_failed_variant_row)
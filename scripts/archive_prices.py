@@ -0,0 +1,196 @@
+import sys
+import os
+import time
+import argparse
+import random
+from collections import defaultdict
+
+# Add project root to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from psycopg2.extras import execute_values
+from backend.db_conn import get_db_connection
+from backend.price_archive import pack_year, unpack_year, archivable_before
+
+def archive_asset(cur, asset_id, before_year):
+    """
+    Moves every closed year (< before_year) of one asset from prices into
+    prices_archive. Years already archived are merged, hot rows winning.
+    Returns the number of daily rows moved.
+    """
+    cur.execute("""
+        SELECT date, close, adj_close, volume
+        FROM prices
+        WHERE asset_id = %s AND date < make_date(%s, 1, 1)
+        ORDER BY date
+    """, (asset_id, before_year))
+    rows = cur.fetchall()
+    if not rows:
+        return 0
+
+    by_year = defaultdict(dict)
+    for d, close, adj_close, volume in rows:
+        by_year[d.year][d] = (close, adj_close, volume or 0)
+
+    cur.execute("""
+        SELECT year, day_mask, close, adj_close, volume
+        FROM prices_archive
+        WHERE asset_id = %s AND year = ANY(%s)
+    """, (asset_id, list(by_year)))
+    for year, day_mask, close, adj_close, volume in cur.fetchall():
+        dates, c, a, v = unpack_year(year, day_mask, close, adj_close, volume)
+        for i, d in enumerate(dates.tolist()):
+            by_year[year].setdefault(d, (c[i], a[i], v[i]))
+
+    values = []
+    for year, days in sorted(by_year.items()):
+        dates = sorted(days)
+        packed = pack_year(
+            year,
+            dates,
+            [days[d][0] for d in dates],
+            [days[d][1] for d in dates],
+            [days[d][2] for d in dates],
+        )
+        values.append((
+            asset_id, year, packed["first_date"], packed["last_date"], packed["day_mask"],
+            packed["close"], packed["adj_close"], packed["volume"],
+        ))
+
+    execute_values(cur, """
+        INSERT INTO prices_archive (asset_id, year, first_date, last_date, day_mask, close, adj_close, volume)
+        VALUES %s
+        ON CONFLICT (asset_id, year) DO UPDATE SET
+            first_date = EXCLUDED.first_date,
+            last_date = EXCLUDED.last_date,
+            day_mask = EXCLUDED.day_mask,
+            close = EXCLUDED.close,
+            adj_close = EXCLUDED.adj_close,
+            volume = EXCLUDED.volume
+    """, values)
+    cur.execute("DELETE FROM prices WHERE asset_id = %s AND date < make_date(%s, 1, 1)", (asset_id, before_year))
+    return len(rows)
+
+def restore_asset(cur, asset_id):
+    """
+    Moves an asset's archived years back into prices.
+    """
+    cur.execute("""
+        SELECT year, day_mask, close, adj_close, volume
+        FROM prices_archive WHERE asset_id = %s
+    """, (asset_id,))
+    values = []
+    for year, day_mask, close, adj_close, volume in cur.fetchall():
+        dates, c, a, v = unpack_year(year, day_mask, close, adj_close, volume)
+        values.extend(
+            (asset_id, d, float(c[i]), float(a[i]), int(v[i]))
+            for i, d in enumerate(dates.tolist())
+        )
+    if values:
+        execute_values(cur, """
+            INSERT INTO prices (asset_id, date, close, adj_close, volume)
+            VALUES %s
+            ON CONFLICT (asset_id, date) DO NOTHING
+        """, values)
+    cur.execute("DELETE FROM prices_archive WHERE asset_id = %s", (asset_id,))
+    return len(values)
+
+def benchmark(samples=50):
+    """
+    Storage footprint of both layouts plus latency of full-history scans
+    through prices_all (the relation db_prices reads when the archive is on).
+    """
+    with get_db_connection() as conn:
+        cur = conn.cursor()
+        cur.execute("""
+            SELECT pg_total_relation_size('prices'), pg_total_relation_size('prices_archive'),
+                   pg_indexes_size('prices') + pg_indexes_size('prices_archive')
+        """)
+        hot_bytes, archive_bytes, index_bytes = cur.fetchone()
+
+        cur.execute("SELECT id FROM assets")
+        asset_ids = [r[0] for r in cur.fetchall()]
+        picks = random.Random(42).choices(asset_ids, k=samples) if asset_ids else []
+
+        timings = []
+        for aid in picks:
+            t0 = time.perf_counter()
+            cur.execute("SELECT date, adj_close FROM prices_all WHERE asset_id = %s ORDER BY date", (aid,))
+            cur.fetchall()
+            timings.append((time.perf_counter() - t0) * 1000)
+        conn.rollback()
+
+    timings.sort()
+    return {
+        "total_mb": (hot_bytes + archive_bytes) / 1e6,
+        "index_mb": index_bytes / 1e6,
+        "scan_p50_ms": timings[len(timings) // 2] if timings else 0.0,
+        "scan_p95_ms": timings[int(len(timings) * 0.95)] if timings else 0.0,
+    }
+
+def print_benchmark(before, after):
+    print("\n" + "=" * 52)
+    print(f"{'':18}{'before':>12}{'after':>12}{'change':>10}")
+    for key, label in [("total_mb", "Storage (MB)"), ("index_mb", "Indexes (MB)"),
+                       ("scan_p50_ms", "Scan p50 (ms)"), ("scan_p95_ms", "Scan p95 (ms)")]:
+        b, a = before[key], after[key]
+        change = f"{(a - b) / b * 100:+.0f}%" if b else "n/a"
+        print(f"{label:18}{b:12.2f}{a:12.2f}{change:>10}")
+    print("=" * 52)
+
+def vacuum_prices():
+    """
+    Deleted rows only give their space back after a full rewrite of prices.
+    """
+    print("  Running VACUUM FULL prices (locks the table)...")
+    with get_db_connection() as conn:
+        conn.autocommit = True
+        try:
+            conn.cursor().execute("VACUUM FULL prices")
+        finally:
+            conn.autocommit = False
+
+def main():
+    parser = argparse.ArgumentParser(description="Move closed years of price history into prices_archive.")
+    parser.add_argument("--keep-years", type=int, default=2, help="Recent years (incl. current) to keep in prices")
+    parser.add_argument("--symbols", help="Comma separated symbols (default: all assets)")
+    parser.add_argument("--restore", action="store_true", help="Move archived years back into prices")
+    parser.add_argument("--benchmark", action="store_true", help="Measure storage and scan latency before/after")
+    parser.add_argument("--vacuum", action="store_true", help="VACUUM FULL prices afterwards to reclaim space")
+    args = parser.parse_args()
+
+    before_year = archivable_before(args.keep_years)
+    before = benchmark() if args.benchmark else None
+
+    with get_db_connection() as conn:
+        cur = conn.cursor()
+        if args.symbols:
+            cur.execute("SELECT id, symbol FROM assets WHERE symbol = ANY(%s) ORDER BY symbol",
+                        ([s.strip().upper() for s in args.symbols.split(",")],))
+        else:
+            cur.execute("SELECT id, symbol FROM assets ORDER BY symbol")
+        assets = cur.fetchall()
+
+        action = "Restoring" if args.restore else f"Archiving years < {before_year} for"
+        print(f"🚀 {action} {len(assets)} assets...")
+        moved = 0
+        for asset_id, symbol in assets:
+            try:
+                n = restore_asset(cur, asset_id) if args.restore else archive_asset(cur, asset_id, before_year)
+                conn.commit()
+                moved += n
+                if n:
+                    print(f"  {symbol}: {n} rows")
+            except Exception as e:
+                conn.rollback()
+                print(f"❌ {symbol} failed: {e}")
+        print(f"✅ Moved {moved} daily rows.")
+
+    if args.vacuum:
+        vacuum_prices()
+
+    if before:
+        print_benchmark(before, benchmark())
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,22 @@
+import sys
+import os
+
+# Add project root to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from backend.db_aggregates import rebuild_all_aggregates
+
+def build():
+    """
+    One-off backfill of prices_weekly / prices_monthly from the daily prices.
+    The ingestion scripts keep them current afterwards.
+    """
+    print("🚀 Building weekly/monthly price aggregates...")
+    try:
+        count = rebuild_all_aggregates()
+        print(f"✅ Aggregates built for {count} assets.")
+    except Exception as e:
+        print(f"❌ Aggregate build failed: {e}")
+
+if __name__ == "__main__":
+    build()
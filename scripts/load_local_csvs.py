@@ -9,6 +9,7 @@ from dotenv import load_dotenv
 # Add project root to path for backend imports
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 from backend.db_conn import get_db_connection
+from backend.db_aggregates import refresh_price_aggregates
 
 load_dotenv()
 
@@ -89,6 +90,7 @@ def load_csvs_to_db():
                         ON CONFLICT (asset_id, date) DO NOTHING
                     """
                     execute_values(cur, query, values)
+                    refresh_price_aggregates(cur, asset_id, min(v[1] for v in values), max(v[1] for v in values))
                     conn.commit()
                     
                     print("✓")
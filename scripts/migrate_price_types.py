@@ -0,0 +1,180 @@
+import sys
+import os
+import time
+import random
+import argparse
+
+# Add project root to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from backend.db_conn import get_db_connection
+
+AGGREGATE_TABLES = ["prices_weekly", "prices_monthly"]
+VIEWS = ["prices_all"]
+
+def column_type(cur, table, column):
+    cur.execute("""
+        SELECT data_type FROM information_schema.columns
+        WHERE table_schema = 'public' AND table_name = %s AND column_name = %s
+    """, (table, column))
+    row = cur.fetchone()
+    return row[0] if row else None
+
+def migrate(cur):
+    """
+    Converts prices to the float-native, natural-key layout:
+      1. close / adj_close (and the aggregate tables) NUMERIC -> double precision
+      2. drops the unused SERIAL id surrogate key
+      3. replaces UNIQUE (asset_id, date) + idx_prices_asset_date with a single
+         PRIMARY KEY (asset_id, date) INCLUDE (adj_close). A backward scan of it
+         answers ORDER BY date DESC as-of lookups index-only.
+    Idempotent: steps that are already applied are skipped.
+    """
+    # Views over prices block ALTER COLUMN TYPE; keep their definitions to recreate them
+    saved_views = {}
+    for view in VIEWS:
+        cur.execute("SELECT to_regclass(%s) IS NOT NULL", (f"public.{view}",))
+        if cur.fetchone()[0]:
+            cur.execute("SELECT pg_get_viewdef(%s::regclass, true)", (f"public.{view}",))
+            saved_views[view] = cur.fetchone()[0]
+            cur.execute(f"DROP VIEW public.{view}")
+
+    if column_type(cur, "prices", "adj_close") == "numeric":
+        print("  Converting prices.close / adj_close to double precision (rewrites the table)...")
+        cur.execute("""
+            ALTER TABLE prices
+                ALTER COLUMN close TYPE double precision USING close::double precision,
+                ALTER COLUMN adj_close TYPE double precision USING adj_close::double precision
+        """)
+
+    for table in AGGREGATE_TABLES:
+        if column_type(cur, table, "adj_close") == "numeric":
+            print(f"  Converting {table} to double precision...")
+            cur.execute(f"""
+                ALTER TABLE {table}
+                    ALTER COLUMN open TYPE double precision USING open::double precision,
+                    ALTER COLUMN high TYPE double precision USING high::double precision,
+                    ALTER COLUMN low TYPE double precision USING low::double precision,
+                    ALTER COLUMN close TYPE double precision USING close::double precision,
+                    ALTER COLUMN adj_close TYPE double precision USING adj_close::double precision
+            """)
+
+    if column_type(cur, "prices", "id"):
+        print("  Dropping surrogate key prices.id...")
+        cur.execute("ALTER TABLE prices DROP COLUMN id")  # also drops the old prices_pkey
+
+    cur.execute("SELECT 1 FROM pg_constraint WHERE conname = 'prices_pkey' AND conrelid = 'prices'::regclass")
+    if not cur.fetchone():
+        print("  Creating PRIMARY KEY (asset_id, date) INCLUDE (adj_close)...")
+        cur.execute("ALTER TABLE prices ADD CONSTRAINT prices_pkey PRIMARY KEY (asset_id, date) INCLUDE (adj_close)")
+
+    # Now redundant with the covering primary key
+    cur.execute("ALTER TABLE prices DROP CONSTRAINT IF EXISTS prices_assetid_date_key")
+    cur.execute("DROP INDEX IF EXISTS idx_prices_asset_date")
+
+    for view, definition in saved_views.items():
+        cur.execute(f"CREATE VIEW public.{view} AS {definition}")
+
+def vacuum_analyze():
+    # Index-only scans need an up-to-date visibility map
+    with get_db_connection() as conn:
+        conn.autocommit = True
+        try:
+            conn.cursor().execute("VACUUM ANALYZE prices")
+        finally:
+            conn.autocommit = False
+
+def benchmark(samples=300):
+    """
+    Table/index size plus latency of the two hot read paths: the as-of lookup
+    behind get_price and a full-history scan behind get_price_history.
+    Timings include psycopg2 decoding and float() conversion, as in db_prices.
+    """
+    with get_db_connection() as conn:
+        cur = conn.cursor()
+        cur.execute("SELECT pg_table_size('prices'), pg_indexes_size('prices')")
+        table_bytes, index_bytes = cur.fetchone()
+
+        cur.execute("SELECT asset_id, MIN(date), MAX(date) FROM prices GROUP BY asset_id")
+        ranges = cur.fetchall()
+        rng = random.Random(42)
+        picks = [rng.choice(ranges) for _ in range(samples)] if ranges else []
+
+        asof = []
+        for asset_id, first, last in picks:
+            d = first + (last - first) * rng.random()
+            t0 = time.perf_counter()
+            cur.execute("""
+                SELECT adj_close FROM prices
+                WHERE asset_id = %s AND date <= %s
+                ORDER BY date DESC LIMIT 1
+            """, (asset_id, d))
+            row = cur.fetchone()
+            if row:
+                float(row[0])
+            asof.append((time.perf_counter() - t0) * 1000)
+
+        scans = []
+        for asset_id, _, last in picks[:max(1, samples // 10)]:
+            t0 = time.perf_counter()
+            cur.execute("SELECT date, adj_close FROM prices WHERE asset_id = %s AND date <= %s ORDER BY date", (asset_id, last))
+            [float(r[1]) for r in cur.fetchall() if r[1] is not None]
+            scans.append((time.perf_counter() - t0) * 1000)
+
+        plan = ""
+        if picks:
+            cur.execute("""
+                EXPLAIN SELECT adj_close FROM prices
+                WHERE asset_id = %s AND date <= %s
+                ORDER BY date DESC LIMIT 1
+            """, (picks[0][0], picks[0][2]))
+            plan = " / ".join(r[0].strip() for r in cur.fetchall()[1:2])
+        conn.rollback()
+
+    asof.sort()
+    scans.sort()
+    return {
+        "table_mb": table_bytes / 1e6,
+        "index_mb": index_bytes / 1e6,
+        "asof_p50_ms": asof[len(asof) // 2] if asof else 0.0,
+        "scan_p50_ms": scans[len(scans) // 2] if scans else 0.0,
+        "plan": plan,
+    }
+
+def print_benchmark(before, after):
+    print("\n" + "=" * 52)
+    print(f"{'':18}{'before':>12}{'after':>12}{'change':>10}")
+    for key, label in [("table_mb", "Table (MB)"), ("index_mb", "Indexes (MB)"),
+                       ("asof_p50_ms", "As-of p50 (ms)"), ("scan_p50_ms", "History p50 (ms)")]:
+        b, a = before[key], after[key]
+        change = f"{(a - b) / b * 100:+.0f}%" if b else "n/a"
+        print(f"{label:18}{b:12.3f}{a:12.3f}{change:>10}")
+    print("=" * 52)
+    print(f"As-of plan before: {before['plan']}")
+    print(f"As-of plan after:  {after['plan']}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert prices to double precision with a covering primary key.")
+    parser.add_argument("--benchmark", action="store_true", help="Measure size and read latency before/after")
+    args = parser.parse_args()
+
+    before = benchmark() if args.benchmark else None
+
+    print("🚀 Migrating prices layout...")
+    try:
+        with get_db_connection() as conn:
+            cur = conn.cursor()
+            migrate(cur)
+            conn.commit()
+    except Exception as e:
+        print(f"❌ Migration failed (rolled back): {e}")
+        return
+
+    vacuum_analyze()
+    print("✅ prices migrated.")
+
+    if before:
+        print_benchmark(before, benchmark())
+
+if __name__ == "__main__":
+    main()
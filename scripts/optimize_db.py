@@ -12,8 +12,17 @@ def optimize():
         with get_db_connection() as conn:
             with conn.cursor() as cur:
                 # 1. Index for Price lookups (Used in almost every simulation step)
-                print("  Creating index on prices(asset_id, date DESC)...")
-                cur.execute("CREATE INDEX IF NOT EXISTS idx_prices_asset_date ON prices(asset_id, date DESC);")
+                # Migrated tables (scripts/migrate_price_types.py) are served by the
+                # covering primary key instead; only legacy layouts need this index.
+                cur.execute("""
+                    SELECT 1 FROM information_schema.columns
+                    WHERE table_name = 'prices' AND column_name = 'id'
+                """)
+                if cur.fetchone():
+                    print("  Creating index on prices(asset_id, date DESC)...")
+                    cur.execute("CREATE INDEX IF NOT EXISTS idx_prices_asset_date ON prices(asset_id, date DESC);")
+                else:
+                    print("  prices uses the covering primary key, skipping idx_prices_asset_date...")
                 
                 # 2. Index for Transaction history (Speeds up portfolio value calculation)
                 print("  Creating index on transactions(portfolio_id)...")
@@ -16,6 +16,7 @@ load_dotenv()
 # Add project root to path for backend imports
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 from backend.db_conn import get_db_connection
+from backend.db_aggregates import refresh_price_aggregates
 
 BASE_DATA_DIR = Path("data")
 
@@ -243,6 +244,8 @@ class IncrementalRefresher:
                     volume = EXCLUDED.volume
             """
             execute_values(cur, upsert_query, values)
+            # Recompute only the weekly/monthly periods touched by this batch
+            refresh_price_aggregates(cur, asset_id, min(v[1] for v in values), max(v[1] for v in values))
             conn.commit()
             
             self.summary["days_added"] += len(values)
@@ -9,6 +9,11 @@ from psycopg2.extras import execute_values
 from pathlib import Path
 from dotenv import load_dotenv
 from datetime import datetime, timedelta
+import sys
+
+# Add project root to path for backend imports
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from backend.db_aggregates import refresh_price_aggregates
 
 # Load environment variables
 load_dotenv()
@@ -244,6 +249,8 @@ class StockRefresher:
                     volume = EXCLUDED.volume
             """
             execute_values(cur, upsert_query, values)
+            # Recompute only the weekly/monthly periods touched by this batch
+            refresh_price_aggregates(cur, asset_id, min(v[1] for v in values), max(v[1] for v in values))
             
             conn.commit()
             return True
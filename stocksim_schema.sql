@@ -35,17 +35,104 @@ CREATE TABLE IF NOT EXISTS public.assets (
 -- Name: prices; Type: TABLE; Schema: public
 --
 
+-- Natural key, float-native prices. The primary key carries adj_close so as-of
+-- lookups (asset_id = ? AND date <= ? ORDER BY date DESC LIMIT 1) are index-only
+-- backward scans. Older databases are converted by scripts/migrate_price_types.py.
 CREATE TABLE IF NOT EXISTS public.prices (
-    id SERIAL PRIMARY KEY,
     asset_id integer NOT NULL,
     date date NOT NULL,
-    close numeric,
-    adj_close numeric,
+    close double precision,
+    adj_close double precision,
     volume bigint,
-    CONSTRAINT prices_assetid_date_key UNIQUE (asset_id, date),
+    CONSTRAINT prices_pkey PRIMARY KEY (asset_id, date) INCLUDE (adj_close),
     CONSTRAINT prices_assetid_fkey FOREIGN KEY (asset_id) REFERENCES public.assets(id) ON DELETE CASCADE
 );
 
 --
 -- Indexes and Constraints (Implicitly created by SERIAL and UNIQUE above, but making sure)
---
\ No newline at end of file
+--
+
+--
+-- Name: prices_weekly / prices_monthly; Type: TABLE; Schema: public
+-- Derived per-period aggregates of prices (period_start = date_trunc('week'|'month', date)).
+-- Maintained incrementally by the ingestion scripts via backend/db_aggregates.py;
+-- rebuild with scripts/build_price_aggregates.py.
+--
+
+CREATE TABLE IF NOT EXISTS public.prices_weekly (
+    asset_id integer NOT NULL,
+    period_start date NOT NULL,
+    last_date date NOT NULL,
+    open double precision,
+    high double precision,
+    low double precision,
+    close double precision,
+    adj_close double precision,
+    volume bigint,
+    CONSTRAINT prices_weekly_pkey PRIMARY KEY (asset_id, period_start),
+    CONSTRAINT prices_weekly_assetid_fkey FOREIGN KEY (asset_id) REFERENCES public.assets(id) ON DELETE CASCADE
+);
+
+CREATE TABLE IF NOT EXISTS public.prices_monthly (
+    asset_id integer NOT NULL,
+    period_start date NOT NULL,
+    last_date date NOT NULL,
+    open double precision,
+    high double precision,
+    low double precision,
+    close double precision,
+    adj_close double precision,
+    volume bigint,
+    CONSTRAINT prices_monthly_pkey PRIMARY KEY (asset_id, period_start),
+    CONSTRAINT prices_monthly_assetid_fkey FOREIGN KEY (asset_id) REFERENCES public.assets(id) ON DELETE CASCADE
+);
+
+--
+-- Name: prices_archive; Type: TABLE; Schema: public
+-- Optional compact layout for closed years: one row per (asset_id, year).
+-- day_mask bit n (get_bit order) is set when make_date(year, 1, 1) + n has a price;
+-- the arrays hold the values of the set bits in date order.
+-- Populated by scripts/archive_prices.py.
+--
+
+CREATE TABLE IF NOT EXISTS public.prices_archive (
+    asset_id integer NOT NULL,
+    year smallint NOT NULL,
+    first_date date NOT NULL,
+    last_date date NOT NULL,
+    day_mask bytea NOT NULL,
+    close double precision[] NOT NULL,
+    adj_close double precision[] NOT NULL,
+    volume bigint[] NOT NULL,
+    CONSTRAINT prices_archive_pkey PRIMARY KEY (asset_id, year),
+    CONSTRAINT prices_archive_assetid_fkey FOREIGN KEY (asset_id) REFERENCES public.assets(id) ON DELETE CASCADE
+);
+
+--
+-- Name: prices_all; Type: VIEW; Schema: public
+-- Daily rows from prices plus unpacked archive years. If a year was reloaded into
+-- prices after archiving, the hot rows win.
+--
+
+CREATE OR REPLACE VIEW public.prices_all AS
+SELECT p.asset_id, p.date, p.close::double precision AS close, p.adj_close::double precision AS adj_close, p.volume
+FROM public.prices p
+UNION ALL
+SELECT a.asset_id, make_date(a.year, 1, 1) + v.day_offset AS date, v.close, v.adj_close, v.volume
+FROM public.prices_archive a
+CROSS JOIN LATERAL unnest(
+    -- Offsets of the set bits, zipped with the value arrays in date order
+    ARRAY(
+        SELECT s.day_offset
+        FROM generate_series(a.first_date - make_date(a.year, 1, 1), a.last_date - make_date(a.year, 1, 1)) AS s(day_offset)
+        WHERE get_bit(a.day_mask, s.day_offset) = 1
+        ORDER BY s.day_offset
+    ),
+    a.close, a.adj_close, a.volume
+) AS v(day_offset, close, adj_close, volume)
+WHERE NOT EXISTS (
+    SELECT 1 FROM public.prices h
+    WHERE h.asset_id = a.asset_id
+      AND h.date >= make_date(a.year, 1, 1)
+      AND h.date < make_date(a.year + 1, 1, 1)
+);